@@ -0,0 +1,288 @@
+import json
+import time
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+
+from database import fetch_all, fetch_one, run_write_async
+from pipeline import env_int
+
+logger = logging.getLogger("backend")
+
+# Average answer length (words) outside this range is flagged as something to work on
+CONCISE_ANSWER_WORDS = 15
+RAMBLING_ANSWER_WORDS = 150
+DETAILED_ANSWER_WORDS = 60
+
+
+def word_count(text: str) -> int:
+    return len(text.split())
+
+
+def assess(answers: int, answer_words: int, questions: int) -> Dict[str, List[str]]:
+    """Strengths and areas for improvement from running totals alone"""
+    strengths: List[str] = []
+    improvements: List[str] = []
+    if answers:
+        average = answer_words / answers
+        if average >= DETAILED_ANSWER_WORDS and average <= RAMBLING_ANSWER_WORDS:
+            strengths.append("Gives detailed, well-developed answers")
+        elif CONCISE_ANSWER_WORDS <= average < DETAILED_ANSWER_WORDS:
+            strengths.append("Keeps answers clear and concise")
+        if average < CONCISE_ANSWER_WORDS:
+            improvements.append("Expand answers with specific examples and outcomes")
+        if average > RAMBLING_ANSWER_WORDS:
+            improvements.append("Keep answers focused; aim for two minutes or less")
+    if questions and answers >= questions - 1 and answers >= 5:
+        strengths.append("Engages with every question")
+    elif questions >= 3 and answers < questions / 2:
+        improvements.append("Complete more of the interview to get fuller feedback")
+    return {"strengths": strengths, "areas_for_improvement": improvements}
+
+
+class SessionDelta:
+    """Turn counts for one session since the last flush"""
+
+    __slots__ = ("session_id", "user_id", "questions", "answers", "answer_words", "first_at", "last_at")
+
+    def __init__(self, session_id: str, at: float):
+        self.session_id = session_id
+        self.user_id: Optional[int] = None
+        self.questions = 0
+        self.answers = 0
+        self.answer_words = 0
+        self.first_at = at
+        self.last_at = at
+
+
+class InterviewAnalytics:
+    """Keeps `analytics` (per session) and `user_analytics` (per user) current.
+
+    Every recorded turn only bumps in-memory counters. A background task
+    folds the counters into both tables every `flush_interval_ms`, in one
+    writer transaction: each session row gets its running sums and derived
+    fields updated by primary key, and the owning user's rollup gets the
+    same deltas. Reading a dashboard is one primary-key lookup no matter
+    how many interviews the user has done.
+    """
+
+    def __init__(self, flush_interval_ms: int = env_int("ANALYTICS_FLUSH_INTERVAL_MS", 1000)):
+        self.flush_interval = max(1, flush_interval_ms) / 1000.0
+        self._pending: Dict[str, SessionDelta] = {}
+        self._owners: Dict[str, int] = {}
+        self._flusher: Optional[asyncio.Task] = None
+        self.turns = 0
+        self.flushes = 0
+        self.flushed_sessions = 0
+        self.flush_errors = 0
+
+    def _delta(self, session_id: str, at: float) -> SessionDelta:
+        delta = self._pending.get(session_id)
+        if delta is None:
+            delta = SessionDelta(session_id, at)
+            delta.user_id = self._owners.get(session_id)
+            self._pending[session_id] = delta
+        return delta
+
+    def attribute(self, session_id: str, user_id: Optional[int]):
+        """Tie a session to its signed-in user; otherwise the owner comes from user_sessions"""
+        if user_id is None:
+            return
+        if len(self._owners) >= 10000:
+            self._owners.clear()
+        self._owners[session_id] = user_id
+        delta = self._pending.get(session_id)
+        if delta is not None:
+            delta.user_id = user_id
+
+    def record_turn(self, session_id: str, role: str, content: str, at: Optional[float] = None):
+        at = at or time.time()
+        delta = self._delta(session_id, at)
+        if role == "assistant":
+            delta.questions += 1
+        elif role == "user":
+            delta.answers += 1
+            delta.answer_words += word_count(content)
+        delta.first_at = min(delta.first_at, at)
+        delta.last_at = max(delta.last_at, at)
+        self.turns += 1
+
+    @staticmethod
+    def _apply(conn, delta: SessionDelta):
+        row = conn.execute('''
+            SELECT user_id, total_questions, answers, answer_words, total_duration, started_at, last_turn_at
+            FROM analytics WHERE session_id = ?
+        ''', (delta.session_id,)).fetchone()
+        user_id = delta.user_id
+        if user_id is None and row is not None:
+            user_id = row["user_id"]
+        if user_id is None:
+            owner = conn.execute(
+                "SELECT user_id FROM user_sessions WHERE session_id = ? AND user_id IS NOT NULL ORDER BY id DESC LIMIT 1",
+                (delta.session_id,)
+            ).fetchone()
+            user_id = owner["user_id"] if owner else None
+
+        old_questions = row["total_questions"] if row else 0
+        old_answers = row["answers"] if row else 0
+        old_words = row["answer_words"] if row else 0
+        old_duration = row["total_duration"] if row else 0
+        started_at = min(row["started_at"], delta.first_at) if row and row["started_at"] else delta.first_at
+        last_turn_at = max(row["last_turn_at"] or 0, delta.last_at) if row else delta.last_at
+
+        questions = old_questions + delta.questions
+        answers = old_answers + delta.answers
+        answer_words = old_words + delta.answer_words
+        duration = int(last_turn_at - started_at)
+        assessment = assess(answers, answer_words, questions)
+        values = (user_id, questions, answers, answer_words, duration,
+                  answer_words // answers if answers else 0,
+                  json.dumps(assessment["strengths"]), json.dumps(assessment["areas_for_improvement"]),
+                  started_at, last_turn_at, time.time(), delta.session_id)
+        if row is None:
+            conn.execute('''
+                INSERT INTO analytics
+                (user_id, total_questions, answers, answer_words, total_duration, avg_answer_length,
+                 strengths, areas_for_improvement, started_at, last_turn_at, updated_at, session_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', values)
+        else:
+            conn.execute('''
+                UPDATE analytics SET
+                    user_id = ?, total_questions = ?, answers = ?, answer_words = ?, total_duration = ?,
+                    avg_answer_length = ?, strengths = ?, areas_for_improvement = ?,
+                    started_at = ?, last_turn_at = ?, updated_at = ?
+                WHERE session_id = ?
+            ''', values)
+
+        if user_id is None:
+            return
+        if row is None or row["user_id"] is None:
+            # First time this session counts for the user: roll in all of it
+            sessions, d_questions, d_answers, d_words, d_duration = 1, questions, answers, answer_words, duration
+        else:
+            sessions, d_questions, d_answers, d_words, d_duration = (
+                0, delta.questions, delta.answers, delta.answer_words, duration - old_duration)
+        conn.execute('''
+            INSERT INTO user_analytics
+            (user_id, sessions, questions, answers, answer_words, total_duration,
+             last_session_id, last_activity, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (user_id) DO UPDATE SET
+                sessions = sessions + excluded.sessions,
+                questions = questions + excluded.questions,
+                answers = answers + excluded.answers,
+                answer_words = answer_words + excluded.answer_words,
+                total_duration = total_duration + excluded.total_duration,
+                last_session_id = CASE WHEN excluded.last_activity >= last_activity
+                                       THEN excluded.last_session_id ELSE last_session_id END,
+                last_activity = MAX(last_activity, excluded.last_activity),
+                updated_at = excluded.updated_at
+        ''', (user_id, sessions, d_questions, d_answers, d_words, d_duration,
+              delta.session_id, last_turn_at, time.time()))
+
+    async def flush(self) -> int:
+        """Fold pending counters into the tables in one transaction; returns sessions written"""
+        if not self._pending:
+            return 0
+        deltas, self._pending = list(self._pending.values()), {}
+
+        def job(conn):
+            for delta in deltas:
+                self._apply(conn, delta)
+
+        try:
+            await run_write_async(job)
+        except Exception as e:
+            self.flush_errors += 1
+            logger.error(f"❌ Failed to update analytics for {len(deltas)} session(s): {e}")
+            for delta in deltas:
+                self._merge_back(delta)
+            return 0
+        self.flushes += 1
+        self.flushed_sessions += len(deltas)
+        return len(deltas)
+
+    def _merge_back(self, delta: SessionDelta):
+        current = self._pending.get(delta.session_id)
+        if current is None:
+            self._pending[delta.session_id] = delta
+            return
+        current.user_id = current.user_id or delta.user_id
+        current.questions += delta.questions
+        current.answers += delta.answers
+        current.answer_words += delta.answer_words
+        current.first_at = min(current.first_at, delta.first_at)
+        current.last_at = max(current.last_at, delta.last_at)
+
+    async def _flush_forever(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def start(self):
+        if self._flusher is None:
+            self._flusher = asyncio.ensure_future(self._flush_forever())
+
+    async def stop(self):
+        if self._flusher is not None:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+        await self.flush()
+
+    # ==================== READS ====================
+    async def session_report(self, session_id: str) -> Optional[Dict[str, Any]]:
+        row = await fetch_one("SELECT * FROM analytics WHERE session_id = ?", (session_id,))
+        if row is None:
+            return None
+        return {
+            "session_id": row["session_id"],
+            "user_id": row["user_id"],
+            "total_questions": row["total_questions"],
+            "answers": row["answers"],
+            "total_duration": row["total_duration"],
+            "avg_answer_length": row["avg_answer_length"],
+            "strengths": json.loads(row["strengths"] or "[]"),
+            "areas_for_improvement": json.loads(row["areas_for_improvement"] or "[]"),
+            "started_at": row["started_at"],
+            "last_turn_at": row["last_turn_at"],
+        }
+
+    async def user_dashboard(self, user_id: int, recent: int = 5) -> Dict[str, Any]:
+        """The user's rollup plus their latest sessions, read by index only"""
+        row = await fetch_one("SELECT * FROM user_analytics WHERE user_id = ?", (user_id,))
+        recent_rows = await fetch_all('''
+            SELECT session_id, total_questions, answers, total_duration, avg_answer_length, last_turn_at
+            FROM analytics WHERE user_id = ? ORDER BY last_turn_at DESC LIMIT ?
+        ''', (user_id, recent))
+        sessions = row["sessions"] if row else 0
+        questions = row["questions"] if row else 0
+        answers = row["answers"] if row else 0
+        answer_words = row["answer_words"] if row else 0
+        total_duration = row["total_duration"] if row else 0
+        return {
+            "user_id": user_id,
+            "sessions": sessions,
+            "total_questions": questions,
+            "total_answers": answers,
+            "total_duration": total_duration,
+            "avg_answer_length": answer_words // answers if answers else 0,
+            "avg_session_duration": total_duration // sessions if sessions else 0,
+            **assess(answers, answer_words, questions),
+            "last_session_id": row["last_session_id"] if row else None,
+            "last_activity": row["last_activity"] if row else None,
+            "recent_sessions": [dict(r) for r in recent_rows],
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending_sessions": len(self._pending),
+            "turns": self.turns,
+            "flushes": self.flushes,
+            "flushed_sessions": self.flushed_sessions,
+            "flush_errors": self.flush_errors,
+        }
@@ -1,10 +1,8 @@
 import sys
 import types
 import os
+import gc
 import hashlib
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 
 # ==================== PYTHON 3.13 COMPATIBILITY FIXES ====================
 try:
@@ -31,35 +29,51 @@ except ImportError:
 print("✅ Python 3.13 compatibility fixes applied successfully!")
 
 # ==================== NORMAL IMPORTS ====================
-import subprocess 
-import whisper
-import random
-import io
+import sqlite3
 import base64
 import json
-import tempfile
 import asyncio
 from datetime import datetime, timedelta
-from concurrent.futures import ThreadPoolExecutor
 from fastapi import FastAPI, HTTPException, Depends, UploadFile, File, Form, BackgroundTasks, status
 from pydantic import BaseModel
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from jose import jwt, JWTError
-import google.generativeai as genai
-from gtts import gTTS
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, AsyncIterator, Union
 import logging
-from pydub import AudioSegment
-import re
 import uuid
 from dotenv import load_dotenv
 import time
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
+from fastapi import Request, WebSocket, WebSocketDisconnect
 import traceback
 
 # ==================== DATABASE IMPORTS ====================
-from database import get_db_connection, init_database
+from database import (
+    init_database, db_writer, close_database,
+    fetch_one, execute_write_async, db_executor
+)
+
+# ==================== VOICE PIPELINE IMPORTS ====================
+from pipeline import StagedPipeline, StageOverloaded, env_int, executor_stats
+from voice import decode_upload, synthesize_speech, TTS_LANGUAGE, TTS_VOICE
+from visemes import extract_visemes
+from tts_cache import TTSCache
+from user_cache import UserPrincipalCache
+from email_outbox import EmailOutbox, SMTPSession
+from session_store import SessionStore, iter_transcript, transcript_page
+from llm_client import LLMClient, configure_gemini
+from circuit_breaker import CircuitOpenError
+from speculation import SpeculativePrefetcher
+from sentence_stream import SentenceSplitter, clean_question
+from exam_engine import ExamEngine, ExamError
+from proctoring import ProctoringIngestor
+from analytics import InterviewAnalytics
+from maintenance import DatabaseMaintenance
+from transcription import TranscriptionService
+from streaming_asr import StreamingTranscriber
+from metrics import REGISTRY, CONTENT_TYPE, FALLBACKS, STAGE_SECONDS, counter_callback, gauge_callback
+from flight_recorder import FlightRecorder, FlightRecorderMiddleware, ProfilerBusy, ProfilerSession, note, tag_session
 
 # ==================== CONFIGURATION ====================
 load_dotenv()
@@ -74,6 +88,12 @@ SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
 SMTP_USERNAME = os.getenv("SMTP_USERNAME", "")
 SMTP_PASSWORD = os.getenv("SMTP_PASSWORD", "")
 EMAIL_FROM = os.getenv("EMAIL_FROM", "noreply@arjunaai.com")
+# Set to false for a local relay such as fakes/smtp_server.py
+SMTP_USE_TLS = os.getenv("SMTP_USE_TLS", "true").lower() != "false"
+EMAIL_ENABLED = bool(SMTP_SERVER and ((SMTP_USERNAME and SMTP_PASSWORD) or not SMTP_USE_TLS))
+
+# Verified accounts allowed to use the /admin diagnostics; nobody when unset
+ADMIN_EMAILS = {email.strip().lower() for email in os.getenv("ADMIN_EMAILS", "").split(",") if email.strip()}
 
 # ==================== LOGGING ====================
 logging.basicConfig(
@@ -94,10 +114,61 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Keeps the slowest recent requests with their stage timings for /admin/slow-requests
+flight_recorder = FlightRecorder()
+profiler = ProfilerSession()
+app.add_middleware(FlightRecorderMiddleware, recorder=flight_recorder)
+
 # ==================== SERVICES ====================
-executor = ThreadPoolExecutor(max_workers=4)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# Verification mail is queued in the database and sent by a background worker
+email_outbox = EmailOutbox(
+    SMTPSession(SMTP_SERVER, SMTP_PORT, SMTP_USERNAME, SMTP_PASSWORD, use_tls=SMTP_USE_TLS),
+    sender=EMAIL_FROM
+)
+
+# Verified principals by token subject; invalidated on verification, password change and deletion
+user_cache = UserPrincipalCache()
+
+# Each stage of the /interview/ voice path gets its own sized pool and bounded queue
+interview_pipeline = StagedPipeline()
+interview_pipeline.add_stage("decode", env_int("PIPELINE_DECODE_WORKERS", 4), env_int("PIPELINE_DECODE_QUEUE", 16))
+# ASR concurrency is high on purpose: the transcription service batches across sessions
+interview_pipeline.add_stage("transcribe", env_int("PIPELINE_ASR_WORKERS", 32), env_int("PIPELINE_ASR_QUEUE", 64))
+interview_pipeline.add_stage("generate", env_int("PIPELINE_LLM_WORKERS", 16), env_int("PIPELINE_LLM_QUEUE", 32))
+interview_pipeline.add_stage("synthesize", env_int("PIPELINE_TTS_WORKERS", 8), env_int("PIPELINE_TTS_QUEUE", 32))
+# Viseme analysis is CPU-bound NumPy work, so it gets processes rather than threads
+interview_pipeline.add_stage("visemes", env_int("PIPELINE_VISEME_WORKERS", 2), env_int("PIPELINE_VISEME_QUEUE", 16), processes=True)
+
+# One warm Whisper model per ASR worker process, shared by every session
+transcription_service = TranscriptionService()
+
+# One cached Gemini model, a capped pool of calls, coalescing of identical prompts,
+# hedging past the p95 and a breaker that sends turns to the fallback questions
+llm_client = LLMClient()
+
+# Static prompts are synthesized once and then served from memory or disk;
+# generated questions go straight to gTTS and are never stored
+tts_cache = TTSCache(synthesize_speech)
+
+def synthesize_cached(text: str) -> bytes:
+    return tts_cache.synthesize(text, lang=TTS_LANGUAGE, voice=TTS_VOICE)
+
+@app.exception_handler(StageOverloaded)
+async def stage_overloaded_handler(request: Request, exc: StageOverloaded):
+    logger.warning(f"⚠️ {exc}")
+    return JSONResponse(
+        status_code=503,
+        content={"detail": f"Server busy ({exc.stage}), please retry shortly"},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+@app.exception_handler(ExamError)
+async def exam_error_handler(request: Request, exc: ExamError):
+    headers = {"Retry-After": str(exc.retry_after)} if exc.retry_after else None
+    return JSONResponse(status_code=exc.status_code, content={"detail": exc.detail}, headers=headers)
+
 # Password hashing
 def get_password_hash(password: str) -> str:
     """Simple password hashing using SHA256"""
@@ -113,21 +184,15 @@ def generate_verification_token() -> str:
     return hashlib.sha256(f"{uuid.uuid4()}{datetime.now().timestamp()}".encode()).hexdigest()
 
 async def send_verification_email(email: str, name: str, verification_token: str):
-    """Send verification email to user"""
+    """Queue a verification email for the background sender"""
     try:
-        if not all([SMTP_SERVER, SMTP_USERNAME, SMTP_PASSWORD]):
+        if not EMAIL_ENABLED:
             logger.warning("⚠️ Email configuration missing - verification emails disabled")
             return False
 
         # Create verification link
         verification_link = f"http://localhost:8000/verify-email?token={verification_token}"
         
-        # Create email message
-        message = MIMEMultipart()
-        message["From"] = EMAIL_FROM
-        message["To"] = email
-        message["Subject"] = "Verify Your Arjuna AI Account"
-        
         # Email body
         body = f"""
         <html>
@@ -144,19 +209,14 @@ async def send_verification_email(email: str, name: str, verification_token: str
         </html>
         """
         
-        message.attach(MIMEText(body, "html"))
+        # Delivery, retries and SMTP session reuse happen in the outbox worker
+        message_id = await email_outbox.enqueue(email, "Verify Your Arjuna AI Account", body)
         
-        # Send email
-        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-            server.starttls()
-            server.login(SMTP_USERNAME, SMTP_PASSWORD)
-            server.send_message(message)
-        
-        logger.info(f"✅ Verification email sent to: {email}")
+        logger.info(f"✅ Verification email queued for: {email} (outbox #{message_id})")
         return True
         
     except Exception as e:
-        logger.error(f"❌ Failed to send verification email: {e}")
+        logger.error(f"❌ Failed to queue verification email: {e}")
         return False
 
 def is_verification_token_expired(expires_at: str) -> bool:
@@ -171,9 +231,11 @@ def is_verification_token_expired(expires_at: str) -> bool:
 
 # AI Configuration (Separate from JWT Auth)
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+# Optional REST endpoint override, e.g. fakes/gemini_server.py for local runs
+GEMINI_API_ENDPOINT = os.getenv("GEMINI_API_ENDPOINT", "")
 if GEMINI_API_KEY:
     try:
-        genai.configure(api_key=GEMINI_API_KEY)
+        configure_gemini(GEMINI_API_KEY, GEMINI_API_ENDPOINT or None)
         GEMINI_AVAILABLE = True
         logger.info("✅ Gemini API configured")
     except Exception as e:
@@ -200,6 +262,29 @@ class InterviewResponse(BaseModel):
     session_id: str
     timestamp: str
 
+class ExamStartRequest(BaseModel):
+    language: str
+    difficulty: str = "medium"
+    num_questions: int = 10
+    use_question_bank: bool = True
+
+class ExamAnswerRequest(BaseModel):
+    session_id: str
+    question_number: int
+    user_answer: Optional[str] = None
+    time_taken: Optional[float] = None
+
+class CheatingEvent(BaseModel):
+    session_id: Optional[str] = None
+    detection_type: str
+    severity: str = "medium"
+    description: str = ""
+    timestamp: Optional[float] = None
+
+class CheatingEventBatch(BaseModel):
+    session_id: Optional[str] = None
+    events: List[CheatingEvent]
+
 class MockUser:
     def __init__(self, email, name, hashed_password, is_verified=True, user_id=None):
         self.email = email
@@ -215,12 +300,19 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
+_jwt_seconds = STAGE_SECONDS.labels("jwt_decode")
+
 def verify_token(token: str):
+    started = time.perf_counter()
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         return payload.get("sub")
     except JWTError:
         return None
+    finally:
+        elapsed = time.perf_counter() - started
+        _jwt_seconds.observe(elapsed)
+        note("jwt_decode", elapsed)
 
 async def get_current_user(token: str = Depends(oauth2_scheme)):
     """Get current user - CHECKS EMAIL VERIFICATION"""
@@ -228,10 +320,11 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
     if email is None:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
-    with get_db_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM users WHERE email = ?", (email,))
-        user_data = cursor.fetchone()
+    cached_user = user_cache.get(email)
+    if cached_user is not None:
+        return cached_user
+    
+    user_data = await fetch_one("SELECT * FROM users WHERE email = ?", (email,))
     
     if user_data is None:
         raise HTTPException(status_code=401, detail="User not found")
@@ -243,13 +336,15 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
             detail="Email not verified. Please check your email for verification link."
         )
     
-    return MockUser(
+    user = MockUser(
         email=user_data['email'],
         name=user_data['name'],
         hashed_password=user_data['hashed_password'],
         is_verified=user_data['is_verified'],
         user_id=user_data['id']
     )
+    user_cache.put(email, user)
+    return user
 
 async def get_current_user_optional(token: str = Depends(oauth2_scheme)):
     """Optional user dependency for endpoints that work with or without auth"""
@@ -258,10 +353,22 @@ async def get_current_user_optional(token: str = Depends(oauth2_scheme)):
     except HTTPException:
         return None
 
+async def require_admin(current_user: MockUser = Depends(get_current_user)):
+    """Verified user listed in ADMIN_EMAILS"""
+    if current_user.email.lower() not in ADMIN_EMAILS:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return current_user
+
+# Per-session and per-user interview analytics, maintained turn by turn
+analytics = InterviewAnalytics()
+
 # ==================== INTERVIEW MANAGER ====================
 class InterviewManager:
     def __init__(self):
-        self.conversations = {}
+        # Bounded, self-evicting per-session state (recent turns, question index),
+        # written behind to user_sessions so any worker can pick up any session
+        self.sessions = SessionStore()
+        self.system_prompt = "You are a professional AI interview coach conducting a behavioral interview."
         self.fallback_questions = [
             "Tell me about yourself and your background.",
             "What are your greatest strengths?",
@@ -274,72 +381,80 @@ class InterviewManager:
             "What are your salary expectations?",
             "Do you have any questions for me?"
         ]
-        self.current_question_index = {}
         
         self.welcome_message = "Welcome to your AI mock interview! I'm excited to learn more about you. Let's begin with a simple introduction."
+        self.closing_message = "That covers our main questions. Is there anything else you'd like to share about your experience?"
+        self.repeat_message = "I couldn't hear your answer clearly. Could you please repeat that?"
+
+    def static_prompts(self) -> List[str]:
+        """Every fixed line the interviewer can say, for TTS prewarming"""
+        return [self.welcome_message, *self.fallback_questions, self.closing_message, self.repeat_message]
 
     def initialize_conversation(self, session_id: str):
-        conv_id = f"session_{session_id}"
-        self.conversations[conv_id] = {
-            'messages': [
-                {"role": "system", "content": "You are a professional AI interview coach conducting a behavioral interview."}
-            ],
-            'last_activity': datetime.now(),
-            'has_greeted': False
-        }
-        self.current_question_index[session_id] = 0
+        self.sessions.create(session_id)
+
+    async def load_session(self, session_id: str):
+        """Make sure this worker holds the latest state for the session"""
+        await self.sessions.ensure(session_id)
 
     def get_fallback_question(self, session_id: str):
-        if session_id not in self.current_question_index:
-            self.current_question_index[session_id] = 0
+        record = self.sessions.get_or_create(session_id)
         
-        if self.current_question_index[session_id] < len(self.fallback_questions):
-            question = self.fallback_questions[self.current_question_index[session_id]]
-            self.current_question_index[session_id] += 1
+        if record.question_index < len(self.fallback_questions):
+            question = self.fallback_questions[record.question_index]
+            record.question_index += 1
+            self.sessions.mark_dirty(session_id)
             return question
-        return "That covers our main questions. Is there anything else you'd like to share about your experience?"
+        return self.closing_message
 
     def add_to_conversation(self, session_id: str, role: str, content: str):
-        conv_id = f"session_{session_id}"
-        if conv_id not in self.conversations:
-            self.initialize_conversation(session_id)
-        self.conversations[conv_id]['messages'].append({"role": role, "content": content})
-        self.conversations[conv_id]['last_activity'] = datetime.now()
+        self.sessions.add_turn(session_id, role, content)
+        analytics.record_turn(session_id, role, content)
 
     def get_conversation_history(self, session_id: str):
-        conv_id = f"session_{session_id}"
-        return self.conversations[conv_id]['messages'] if conv_id in self.conversations else []
+        if session_id not in self.sessions:
+            return []
+        return [{"role": "system", "content": self.system_prompt}] + [
+            turn.to_dict() for turn in self.sessions.recent_turns(session_id)
+        ]
 
     def reset_conversation(self, session_id: str):
-        conv_id = f"session_{session_id}"
-        if conv_id in self.conversations:
-            del self.conversations[conv_id]
-        if session_id in self.current_question_index:
-            del self.current_question_index[session_id]
+        self.sessions.remove(session_id)
 
     def mark_greeted(self, session_id: str):
-        conv_id = f"session_{session_id}"
-        if conv_id in self.conversations:
-            self.conversations[conv_id]['has_greeted'] = True
+        record = self.sessions.get(session_id)
+        if record is not None:
+            record.has_greeted = True
+            self.sessions.mark_dirty(session_id)
 
     def should_greet(self, session_id: str) -> bool:
-        conv_id = f"session_{session_id}"
-        if conv_id not in self.conversations:
+        record = self.sessions.get(session_id)
+        if record is None:
             return True
-        return not self.conversations[conv_id].get('has_greeted', False)
+        return not record.has_greeted
+
+    def turn_number(self, session_id: str) -> int:
+        record = self.sessions.get(session_id)
+        return record.turn_count if record is not None else 0
 
     async def generate_interview_question(self, user_answer: str, session_id: str = "default"):
-        if not GEMINI_AVAILABLE:
+        question = await self.ask_gemini(user_answer, session_id)
+        if question is None:
+            FALLBACKS.labels("turn").inc()
             return self.get_fallback_question(session_id)
+        return question
 
-        try:
-            conversation_history = self.get_conversation_history(session_id)
-            context = "\n".join([
-                f"{'Interviewer' if msg['role'] == 'assistant' else 'Candidate'}: {msg['content']}" 
-                for msg in conversation_history[-4:]
-            ])
+    def build_prompt(self, user_answer: str, session_id: str) -> str:
+        conversation_history = self.get_conversation_history(session_id)
+        if conversation_history and conversation_history[-1] == {"role": "user", "content": user_answer}:
+            # The answer is already recorded; it is quoted separately below
+            conversation_history = conversation_history[:-1]
+        context = "\n".join([
+            f"{'Interviewer' if msg['role'] == 'assistant' else 'Candidate'}: {msg['content']}" 
+            for msg in conversation_history[-4:]
+        ])
 
-            prompt = f"""You are a professional interviewer conducting a behavioral interview. 
+        return f"""You are a professional interviewer conducting a behavioral interview. 
 Based on the conversation context and the candidate's latest response, ask ONE clear, relevant follow-up question.
 
 Context:
@@ -349,33 +464,61 @@ Candidate's response: "{user_answer}"
 
 Your follow-up interview question:"""
 
-            loop = asyncio.get_event_loop()
-            model = genai.GenerativeModel('gemini-2.0-flash-exp')
-            
-            response = await asyncio.wait_for(
-                loop.run_in_executor(executor, lambda: model.generate_content(prompt)),
-                timeout=15.0
-            )
+    async def ask_gemini(self, user_answer: str, session_id: str = "default") -> Optional[str]:
+        """Gemini's follow-up question, or None; never advances the fallback questions"""
+        if not GEMINI_AVAILABLE:
+            return None
+
+        try:
+            text = await llm_client.generate(self.build_prompt(user_answer, session_id))
 
-            if response and response.text:
-                question = response.text.strip()
-                question = re.sub(r'^["\']+|["\']+$', '', question)
-                question = re.sub(r'^\d+\.\s*', '', question)
-                question = re.sub(r'^Question:\s*', '', question, flags=re.IGNORECASE)
+            if text:
+                question = clean_question(text)
 
                 if (question and len(question) > 10 and len(question.split()) <= 50):
                     logger.info(f"✅ Gemini generated question: {question}")
                     return question
 
             logger.warning("❌ Empty or invalid response from Gemini")
-            return self.get_fallback_question(session_id)
+            return None
 
+        except CircuitOpenError:
+            # Gemini is failing or slow right now; answer locally without waiting on it
+            return None
+        except asyncio.TimeoutError:
+            logger.warning(f"⚠️ Gemini missed the {llm_client.timeout:g}s turn budget, using fallback question")
+            return None
         except Exception as e:
             logger.error(f"❌ Gemini API error: {str(e)}")
-            return self.get_fallback_question(session_id)
+            return None
     
 interview_manager = InterviewManager()
 
+async def render_question(question: str):
+    """Audio and lip-sync events for a question"""
+    audio = await interview_pipeline.run("synthesize", synthesize_cached, question)
+    visemes = await interview_pipeline.run("visemes", extract_visemes, audio, question)
+    return audio, visemes
+
+async def speculate_follow_up(partial: str, session_id: str) -> Optional[str]:
+    return await interview_pipeline.run("generate", interview_manager.ask_gemini, partial, session_id)
+
+# Follow-ups generated and voiced from partial transcripts while the answer streams in
+prefetcher = SpeculativePrefetcher(speculate_follow_up, render_question)
+
+async def generate_exam_items(prompt: str) -> str:
+    """Raw Gemini reply for a question-bank top-up; off the request path, so it gets a longer budget"""
+    return await llm_client.generate(prompt, timeout=env_int("EXAM_TOPUP_TIMEOUT_S", 30))
+
+# Proctoring detections are coalesced and rate-limited in memory, then group-committed
+proctoring = ProctoringIngestor()
+
+# Adaptive exams served from the indexed question bank; Gemini only tops it up
+exam_engine = ExamEngine(generate_exam_items if GEMINI_AVAILABLE else None, proctoring.cheating_score)
+
+# Hourly purge of expired tokens, idle sessions and settled mail
+maintenance = DatabaseMaintenance()
+
 # ==================== API ENDPOINTS ====================
 @app.get("/")
 async def root():
@@ -394,30 +537,30 @@ async def register(user: UserRegister, background_tasks: BackgroundTasks):
     try:
         logger.info(f"🔧 Starting registration for: {user.email}")
         
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT * FROM users WHERE email = ?", (user.email,))
-            existing_user = cursor.fetchone()
-            
-            if existing_user:
-                logger.warning(f"❌ Email already registered: {user.email}")
-                raise HTTPException(status_code=400, detail="Email already registered")
-            
-            hashed_password = get_password_hash(user.password)
-            verification_token = generate_verification_token()
-            token_expires = (datetime.now() + timedelta(hours=24)).isoformat()
-            
-            logger.info(f"🔧 Generated token for: {user.email}")
+        existing_user = await fetch_one("SELECT id FROM users WHERE email = ?", (user.email,))
             
-            # Try to insert user
-            cursor.execute('''
+        if existing_user:
+            logger.warning(f"❌ Email already registered: {user.email}")
+            raise HTTPException(status_code=400, detail="Email already registered")
+        
+        hashed_password = get_password_hash(user.password)
+        verification_token = generate_verification_token()
+        token_expires = (datetime.now() + timedelta(hours=24)).isoformat()
+        
+        logger.info(f"🔧 Generated token for: {user.email}")
+        
+        # Try to insert user
+        try:
+            result = await execute_write_async('''
                 INSERT INTO users (email, name, hashed_password, is_verified, verification_token, verification_token_expires)
                 VALUES (?, ?, ?, FALSE, ?, ?)
             ''', (user.email, user.name, hashed_password, verification_token, token_expires))
-            conn.commit()
-            
-            user_id = cursor.lastrowid
-            logger.info(f"✅ User registered in database: {user.email} (ID: {user_id})")
+        except sqlite3.IntegrityError:
+            # Lost a race with a concurrent registration for the same email
+            raise HTTPException(status_code=400, detail="Email already registered")
+        
+        user_id = result.lastrowid
+        logger.info(f"✅ User registered in database: {user.email} (ID: {user_id})")
         
         # Send verification email
         logger.info(f"🔧 Sending verification email to: {user.email}")
@@ -443,23 +586,19 @@ async def register(user: UserRegister, background_tasks: BackgroundTasks):
 async def register_quick(user: UserRegister):
     """Quick registration without email verification for testing"""
     try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT * FROM users WHERE email = ?", (user.email,))
-            existing_user = cursor.fetchone()
-            
-            if existing_user:
-                raise HTTPException(status_code=400, detail="Email already registered")
+        existing_user = await fetch_one("SELECT id FROM users WHERE email = ?", (user.email,))
             
-            hashed_password = get_password_hash(user.password)
-            
-            cursor.execute('''
-                INSERT INTO users (email, name, hashed_password, is_verified)
-                VALUES (?, ?, ?, TRUE)
-            ''', (user.email, user.name, hashed_password))
-            conn.commit()
-            
-            user_id = cursor.lastrowid
+        if existing_user:
+            raise HTTPException(status_code=400, detail="Email already registered")
+        
+        hashed_password = get_password_hash(user.password)
+        
+        result = await execute_write_async('''
+            INSERT INTO users (email, name, hashed_password, is_verified)
+            VALUES (?, ?, ?, TRUE)
+        ''', (user.email, user.name, hashed_password))
+        
+        user_id = result.lastrowid
         
         return {
             "message": "Quick registration successful! You can now login.",
@@ -475,79 +614,75 @@ async def register_quick(user: UserRegister):
 async def verify_email_get(token: str):
     """GET endpoint for email verification (for clickable links in emails)"""
     try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT * FROM users 
-                WHERE verification_token = ? AND is_verified = FALSE
-            ''', (token,))
-            user_data = cursor.fetchone()
-            
-            if not user_data:
-                # Return HTML error page
-                html_content = """
-                <html>
-                    <body style="font-family: Arial, sans-serif; text-align: center; padding: 50px;">
-                        <h2 style="color: #ff4444;">❌ Verification Failed</h2>
-                        <p>Invalid or expired verification token.</p>
-                        <p>Please try registering again or request a new verification email.</p>
-                        <a href="http://localhost:3000" style="background-color: #4CAF50; color: white; padding: 10px 20px; text-decoration: none; border-radius: 5px;">Return to App</a>
-                    </body>
-                </html>
-                """
-                return HTMLResponse(content=html_content, status_code=400)
-            
-            # Check token expiration
-            if is_verification_token_expired(user_data['verification_token_expires']):
-                # Generate new token
-                new_token = generate_verification_token()
-                new_expires = (datetime.now() + timedelta(hours=24)).isoformat()
-                
-                cursor.execute('''
-                    UPDATE users 
-                    SET verification_token = ?, verification_token_expires = ?
-                    WHERE id = ?
-                ''', (new_token, new_expires, user_data['id']))
-                conn.commit()
-                
-                # Try to resend email
-                await send_verification_email(user_data['email'], user_data['name'], new_token)
-                
-                html_content = f"""
-                <html>
-                    <body style="font-family: Arial, sans-serif; text-align: center; padding: 50px;">
-                        <h2 style="color: #ff8800;">⚠️ Token Expired</h2>
-                        <p>Your verification token has expired.</p>
-                        <p>A new verification email has been sent to {user_data['email']}.</p>
-                        <p>Please check your inbox for the new link.</p>
-                        <a href="http://localhost:3000" style="background-color: #4CAF50; color: white; padding: 10px 20px; text-decoration: none; border-radius: 5px;">Return to App</a>
-                    </body>
-                </html>
-                """
-                return HTMLResponse(content=html_content, status_code=400)
+        user_data = await fetch_one('''
+            SELECT * FROM users 
+            WHERE verification_token = ? AND is_verified = FALSE
+        ''', (token,))
+        
+        if not user_data:
+            # Return HTML error page
+            html_content = """
+            <html>
+                <body style="font-family: Arial, sans-serif; text-align: center; padding: 50px;">
+                    <h2 style="color: #ff4444;">❌ Verification Failed</h2>
+                    <p>Invalid or expired verification token.</p>
+                    <p>Please try registering again or request a new verification email.</p>
+                    <a href="http://localhost:3000" style="background-color: #4CAF50; color: white; padding: 10px 20px; text-decoration: none; border-radius: 5px;">Return to App</a>
+                </body>
+            </html>
+            """
+            return HTMLResponse(content=html_content, status_code=400)
+        
+        # Check token expiration
+        if is_verification_token_expired(user_data['verification_token_expires']):
+            # Generate new token
+            new_token = generate_verification_token()
+            new_expires = (datetime.now() + timedelta(hours=24)).isoformat()
             
-            # Mark as verified and clear token
-            cursor.execute('''
+            await execute_write_async('''
                 UPDATE users 
-                SET is_verified = TRUE, verification_token = NULL, verification_token_expires = NULL
+                SET verification_token = ?, verification_token_expires = ?
                 WHERE id = ?
-            ''', (user_data['id'],))
-            conn.commit()
+            ''', (new_token, new_expires, user_data['id']))
             
-            logger.info(f"✅ Email verified via GET: {user_data['email']}")
+            # Try to resend email
+            await send_verification_email(user_data['email'], user_data['name'], new_token)
             
-            # Return success HTML page
             html_content = f"""
             <html>
                 <body style="font-family: Arial, sans-serif; text-align: center; padding: 50px;">
-                    <h2 style="color: #4CAF50;">✅ Email Verified Successfully!</h2>
-                    <p>Your email {user_data['email']} has been verified.</p>
-                    <p>You can now login to your Arjuna AI account.</p>
-                    <a href="http://localhost:3000/login" style="background-color: #4CAF50; color: white; padding: 10px 20px; text-decoration: none; border-radius: 5px;">Go to Login</a>
+                    <h2 style="color: #ff8800;">⚠️ Token Expired</h2>
+                    <p>Your verification token has expired.</p>
+                    <p>A new verification email has been sent to {user_data['email']}.</p>
+                    <p>Please check your inbox for the new link.</p>
+                    <a href="http://localhost:3000" style="background-color: #4CAF50; color: white; padding: 10px 20px; text-decoration: none; border-radius: 5px;">Return to App</a>
                 </body>
             </html>
             """
-            return HTMLResponse(content=html_content)
+            return HTMLResponse(content=html_content, status_code=400)
+        
+        # Mark as verified and clear token
+        await execute_write_async('''
+            UPDATE users 
+            SET is_verified = TRUE, verification_token = NULL, verification_token_expires = NULL
+            WHERE id = ?
+        ''', (user_data['id'],))
+        
+        user_cache.on_user_verified(user_data['email'])
+        logger.info(f"✅ Email verified via GET: {user_data['email']}")
+        
+        # Return success HTML page
+        html_content = f"""
+        <html>
+            <body style="font-family: Arial, sans-serif; text-align: center; padding: 50px;">
+                <h2 style="color: #4CAF50;">✅ Email Verified Successfully!</h2>
+                <p>Your email {user_data['email']} has been verified.</p>
+                <p>You can now login to your Arjuna AI account.</p>
+                <a href="http://localhost:3000/login" style="background-color: #4CAF50; color: white; padding: 10px 20px; text-decoration: none; border-radius: 5px;">Go to Login</a>
+            </body>
+        </html>
+        """
+        return HTMLResponse(content=html_content)
             
     except Exception as e:
         logger.error(f"❌ Email verification error: {e}")
@@ -567,35 +702,32 @@ async def verify_email_get(token: str):
 async def verify_email_post(request: VerifyEmailRequest):
     """POST endpoint for email verification (for API calls)"""
     try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT * FROM users 
-                WHERE verification_token = ? AND is_verified = FALSE
-            ''', (request.token,))
-            user_data = cursor.fetchone()
-            
-            if not user_data:
-                raise HTTPException(status_code=400, detail="Invalid or expired verification token")
-            
-            # Check token expiration
-            if is_verification_token_expired(user_data['verification_token_expires']):
-                raise HTTPException(status_code=400, detail="Verification token expired")
-            
-            # Mark as verified and clear token
-            cursor.execute('''
-                UPDATE users 
-                SET is_verified = TRUE, verification_token = NULL, verification_token_expires = NULL
-                WHERE id = ?
-            ''', (user_data['id'],))
-            conn.commit()
-            
-            logger.info(f"✅ Email verified via POST: {user_data['email']}")
-            
-            return {
-                "message": "Email verified successfully! You can now login.",
-                "status": "success"
-            }
+        user_data = await fetch_one('''
+            SELECT * FROM users 
+            WHERE verification_token = ? AND is_verified = FALSE
+        ''', (request.token,))
+        
+        if not user_data:
+            raise HTTPException(status_code=400, detail="Invalid or expired verification token")
+        
+        # Check token expiration
+        if is_verification_token_expired(user_data['verification_token_expires']):
+            raise HTTPException(status_code=400, detail="Verification token expired")
+        
+        # Mark as verified and clear token
+        await execute_write_async('''
+            UPDATE users 
+            SET is_verified = TRUE, verification_token = NULL, verification_token_expires = NULL
+            WHERE id = ?
+        ''', (user_data['id'],))
+        
+        user_cache.on_user_verified(user_data['email'])
+        logger.info(f"✅ Email verified via POST: {user_data['email']}")
+        
+        return {
+            "message": "Email verified successfully! You can now login.",
+            "status": "success"
+        }
             
     except HTTPException:
         raise
@@ -607,27 +739,23 @@ async def verify_email_post(request: VerifyEmailRequest):
 async def resend_verification(email: str, background_tasks: BackgroundTasks):
     """Resend verification email"""
     try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT * FROM users 
-                WHERE email = ? AND is_verified = FALSE
-            ''', (email,))
-            user_data = cursor.fetchone()
-            
-            if not user_data:
-                raise HTTPException(status_code=400, detail="User not found or already verified")
-            
-            # Generate new token
-            new_token = generate_verification_token()
-            new_expires = (datetime.now() + timedelta(hours=24)).isoformat()
-            
-            cursor.execute('''
-                UPDATE users 
-                SET verification_token = ?, verification_token_expires = ?
-                WHERE id = ?
-            ''', (new_token, new_expires, user_data['id']))
-            conn.commit()
+        user_data = await fetch_one('''
+            SELECT * FROM users 
+            WHERE email = ? AND is_verified = FALSE
+        ''', (email,))
+        
+        if not user_data:
+            raise HTTPException(status_code=400, detail="User not found or already verified")
+        
+        # Generate new token
+        new_token = generate_verification_token()
+        new_expires = (datetime.now() + timedelta(hours=24)).isoformat()
+        
+        await execute_write_async('''
+            UPDATE users 
+            SET verification_token = ?, verification_token_expires = ?
+            WHERE id = ?
+        ''', (new_token, new_expires, user_data['id']))
             
         # Send new verification email
         email_sent = await send_verification_email(user_data['email'], user_data['name'], new_token)
@@ -647,10 +775,7 @@ async def resend_verification(email: str, background_tasks: BackgroundTasks):
 @app.post("/token")
 async def login(form_data: OAuth2PasswordRequestForm = Depends()):
     """Login endpoint - CHECKS EMAIL VERIFICATION"""
-    with get_db_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM users WHERE email = ?", (form_data.username,))
-        user_data = cursor.fetchone()
+    user_data = await fetch_one("SELECT * FROM users WHERE email = ?", (form_data.username,))
     
     if not user_data:
         raise HTTPException(status_code=401, detail="Invalid credentials")
@@ -665,11 +790,10 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()):
             detail="Email not verified. Please check your email for verification link."
         )
     
-    # Update last login
-    with get_db_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute("UPDATE users SET last_login = CURRENT_TIMESTAMP WHERE email = ?", (form_data.username,))
-        conn.commit()
+    # Update last login without holding up the response
+    db_writer.submit(lambda conn: conn.execute(
+        "UPDATE users SET last_login = CURRENT_TIMESTAMP WHERE id = ?", (user_data['id'],)
+    ))
     
     access_token = create_access_token(data={"sub": user_data['email']})
     return {
@@ -693,29 +817,35 @@ async def auto_greeting(request: dict, current_user: Optional[MockUser] = Depend
         # Generate unique session ID if default
         if session_id == "default":
             session_id = f"session_{uuid.uuid4().hex}_{int(datetime.now().timestamp())}"
+        tag_session(session_id)
         
         # Create user session only for authenticated users
         if current_user:
-            with get_db_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    INSERT OR REPLACE INTO user_sessions 
-                    (user_id, session_id, is_active, start_time, conversation_history)
-                    VALUES (?, ?, TRUE, CURRENT_TIMESTAMP, '[]')
-                ''', (current_user.id, session_id))
-                conn.commit()
+            # session_id is unique, so a repeated greeting claims the row instead of adding one
+            await execute_write_async('''
+                INSERT INTO user_sessions
+                (user_id, session_id, is_active, start_time, last_activity)
+                VALUES (?, ?, TRUE, CURRENT_TIMESTAMP, ?)
+                ON CONFLICT (session_id) DO UPDATE SET
+                    user_id = excluded.user_id, is_active = TRUE, last_activity = excluded.last_activity
+            ''', (current_user.id, session_id, time.time()))
         
         # Get welcome message
+        analytics.attribute(session_id, current_user.id if current_user else None)
         interview_manager.initialize_conversation(session_id)
         welcome_message = interview_manager.welcome_message
         
         interview_manager.mark_greeted(session_id)
         interview_manager.add_to_conversation(session_id, "assistant", welcome_message)
         
+        # Prewarmed at startup, so this is a cache hit rather than a gTTS round trip
+        welcome_audio = await interview_pipeline.run("synthesize", synthesize_cached, welcome_message)
+        
         logger.info(f"✅ Auto-greeting sent: {session_id} for user: {user_email}")
         
         return {
             "text": welcome_message,
+            "audio": base64.b64encode(welcome_audio).decode("utf-8"),
             "session_id": session_id,
             "user_authenticated": current_user is not None
         }
@@ -724,6 +854,378 @@ async def auto_greeting(request: dict, current_user: Optional[MockUser] = Depend
         logger.error(f"❌ Auto-greeting error: {e}")
         return {"error": str(e)}
 
+async def respond_to_answer(session_id: str, transcript: str) -> InterviewResponse:
+    """Turn a transcribed answer into the next spoken question with visemes"""
+    await interview_manager.load_session(session_id)
+    prefetched = None
+    if transcript:
+        turn = interview_manager.turn_number(session_id)
+        # Recorded first so the write-behind flush overlaps the LLM call
+        interview_manager.add_to_conversation(session_id, "user", transcript)
+        prefetched = await prefetcher.claim(session_id, turn, transcript)
+    else:
+        prefetcher.discard(session_id)
+
+    if prefetched is not None:
+        question, audio, visemes = prefetched
+    else:
+        if transcript:
+            question = await interview_pipeline.run("generate", interview_manager.generate_interview_question, transcript, session_id)
+        else:
+            question = interview_manager.repeat_message
+        audio, visemes = await render_question(question)
+
+    interview_manager.add_to_conversation(session_id, "assistant", question)
+
+    return InterviewResponse(
+        transcript=transcript,
+        question=question,
+        audio=base64.b64encode(audio).decode("utf-8"),
+        visemes=visemes,
+        session_id=session_id,
+        timestamp=datetime.now().isoformat()
+    )
+
+@app.post("/interview/", response_model=InterviewResponse)
+async def interview(
+    file: UploadFile = File(...),
+    session_id: str = Form("default"),
+    current_user: Optional[MockUser] = Depends(get_current_user_optional)
+):
+    """Voice interview turn: decode -> transcribe -> generate -> synthesize -> visemes"""
+    tag_session(session_id)
+    # The decode stage admits the upload before any of it is read
+    pcm = await interview_pipeline.run("decode", decode_upload, file.file, file.filename)
+    if pcm is None:
+        raise HTTPException(status_code=400, detail="Empty audio upload")
+
+    transcript = await interview_pipeline.run("transcribe", transcription_service.transcribe, pcm)
+    logger.info(f"🎤 Transcript for {session_id}: {transcript}")
+    analytics.attribute(session_id, current_user.id if current_user else None)
+
+    return await respond_to_answer(session_id, transcript)
+
+# ==================== STREAMED TURNS (SSE) ====================
+MAX_QUESTION_WORDS = 50
+
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def stream_question(session_id: str, transcript: str) -> AsyncIterator[str]:
+    """The follow-up question sentence by sentence as Gemini writes it, else the fallback whole"""
+    if not transcript:
+        yield interview_manager.repeat_message
+        return
+
+    if GEMINI_AVAILABLE:
+        splitter = SentenceSplitter()
+        words = 0
+        stream = llm_client.stream(interview_manager.build_prompt(transcript, session_id))
+        try:
+            async for chunk in stream:
+                for sentence in splitter.feed(chunk):
+                    sentence = clean_question(sentence)
+                    if sentence:
+                        words += len(sentence.split())
+                        yield sentence
+                    if words > MAX_QUESTION_WORDS:
+                        return
+            for sentence in splitter.flush():
+                sentence = clean_question(sentence)
+                if sentence:
+                    words += len(sentence.split())
+                    yield sentence
+        except CircuitOpenError:
+            pass
+        except asyncio.TimeoutError:
+            logger.warning(f"⚠️ Gemini stream stalled past {llm_client.timeout:g}s")
+        except Exception as e:
+            logger.error(f"❌ Gemini streaming error: {str(e)}")
+        finally:
+            await stream.aclose()
+        if words:
+            return
+
+    FALLBACKS.labels("stream").inc()
+    yield interview_manager.get_fallback_question(session_id)
+
+async def stream_turn(session_id: str, turn: int, transcript: str) -> AsyncIterator[str]:
+    """SSE body: transcript, then one sentence event (text, audio, visemes) per sentence, then done"""
+    started = time.perf_counter()
+    yield sse_event("transcript", {"text": transcript, "session_id": session_id})
+
+    spoken: List[str] = []
+
+    def sentence_event(text: str, audio: bytes, visemes: List[Dict[str, Any]]) -> str:
+        spoken.append(text)
+        return sse_event("sentence", {
+            "index": len(spoken) - 1,
+            "text": text,
+            "audio": base64.b64encode(audio).decode("utf-8"),
+            "visemes": visemes,
+            "elapsed_ms": int((time.perf_counter() - started) * 1000),
+        })
+
+    prefetched = await prefetcher.claim(session_id, turn, transcript) if transcript else None
+    if prefetched is not None:
+        yield sentence_event(*prefetched)
+    else:
+        # Each sentence starts rendering as soon as it is complete; events still go out in order
+        renders = []
+        sentences = stream_question(session_id, transcript)
+        try:
+            async for sentence in sentences:
+                renders.append((sentence, asyncio.ensure_future(render_question(sentence))))
+                while renders and renders[0][1].done():
+                    sentence, render = renders.pop(0)
+                    yield sentence_event(sentence, *render.result())
+            for sentence, render in renders:
+                yield sentence_event(sentence, *(await render))
+            renders = []
+        except StageOverloaded as e:
+            yield sse_event("error", {"detail": str(e), "retry_after": e.retry_after})
+        except Exception as e:
+            # Keep what was already spoken and still close the turn with done
+            logger.error(f"❌ Streamed turn failed for {session_id}: {e}")
+            yield sse_event("error", {"detail": "Could not render the rest of the question"})
+        finally:
+            for _, render in renders:
+                render.cancel()
+            await sentences.aclose()
+
+    question = " ".join(spoken)
+    if question:
+        interview_manager.add_to_conversation(session_id, "assistant", question)
+    yield sse_event("done", {
+        "question": question,
+        "session_id": session_id,
+        "timestamp": datetime.now().isoformat(),
+        "total_ms": int((time.perf_counter() - started) * 1000),
+    })
+
+@app.post("/interview/stream")
+async def interview_sse(
+    file: UploadFile = File(...),
+    session_id: str = Form("default"),
+    current_user: Optional[MockUser] = Depends(get_current_user_optional)
+):
+    """Voice interview turn streamed as server-sent events, one spoken sentence at a time"""
+    tag_session(session_id)
+    # Admitted by the decode stage before any of it is read; overload before
+    # the stream starts still surfaces as a plain 503
+    pcm = await interview_pipeline.run("decode", decode_upload, file.file, file.filename)
+    if pcm is None:
+        raise HTTPException(status_code=400, detail="Empty audio upload")
+
+    transcript = await interview_pipeline.run("transcribe", transcription_service.transcribe, pcm)
+    logger.info(f"🎤 Transcript for {session_id}: {transcript}")
+    analytics.attribute(session_id, current_user.id if current_user else None)
+
+    await interview_manager.load_session(session_id)
+    turn = interview_manager.turn_number(session_id)
+    if transcript:
+        interview_manager.add_to_conversation(session_id, "user", transcript)
+    else:
+        prefetcher.discard(session_id)
+
+    return StreamingResponse(
+        stream_turn(session_id, turn, transcript),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.websocket("/ws/interview")
+async def interview_stream(websocket: WebSocket, session_id: str = "default", token: Optional[str] = None):
+    """Streaming interview turn.
+
+    Send 16 kHz mono PCM16 audio as binary frames while the candidate speaks,
+    then {"type": "end"} when they stop. The server pushes "partial" transcripts
+    during recording, then "transcript" and a "response" shaped like InterviewResponse.
+    A transcript missing segments that failed to transcribe is flagged "degraded";
+    malformed frames and answers with nothing transcribed get an "error" instead.
+    """
+    if token:
+        try:
+            analytics.attribute(session_id, (await get_current_user(token)).id)
+        except HTTPException:
+            await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+            return
+    await websocket.accept()
+    # Speculation is keyed by turn, so this worker needs the session's current state
+    await interview_manager.load_session(session_id)
+
+    async def send_partial(text: str):
+        await websocket.send_json({"type": "partial", "text": text})
+        prefetcher.speculate(session_id, interview_manager.turn_number(session_id), text)
+
+    async def transcribe(pcm):
+        return await interview_pipeline.run("transcribe", transcription_service.transcribe, pcm)
+
+    transcriber = StreamingTranscriber(transcribe, send_partial)
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            if message.get("bytes"):
+                await transcriber.feed(message["bytes"])
+                continue
+
+            try:
+                command = json.loads(message.get("text") or "{}")
+            except ValueError:
+                await websocket.send_json({"type": "error", "detail": "Malformed command frame"})
+                continue
+            if not isinstance(command, dict):
+                await websocket.send_json({"type": "error", "detail": "Command frames must be JSON objects"})
+                continue
+            if command.get("type") == "end":
+                ended_at = time.perf_counter()
+                try:
+                    transcript = await transcriber.finish()
+                    if transcriber.lost_segments and not transcript:
+                        # Nothing usable survived; ask for the answer again rather than "repeat that"
+                        error = transcriber.last_error
+                        await websocket.send_json({
+                            "type": "error",
+                            "detail": "Could not transcribe the answer",
+                            "retry_after": error.retry_after if isinstance(error, StageOverloaded) else None
+                        })
+                        continue
+                    await websocket.send_json({
+                        "type": "transcript",
+                        "text": transcript,
+                        "degraded": transcriber.lost_segments > 0,
+                        "lost_segments": transcriber.lost_segments,
+                        "latency_ms": int((time.perf_counter() - ended_at) * 1000)
+                    })
+                    logger.info(f"🎤 Streamed transcript for {session_id}: {transcript}")
+                    response = await respond_to_answer(session_id, transcript)
+                    await websocket.send_json({"type": "response", **response.dict()})
+                except StageOverloaded as e:
+                    await websocket.send_json({"type": "error", "detail": str(e), "retry_after": e.retry_after})
+                except WebSocketDisconnect:
+                    raise
+                except Exception as e:
+                    # A TTS, viseme or database failure loses this turn, not the socket
+                    logger.error(f"❌ Websocket turn failed for {session_id}: {e}")
+                    await websocket.send_json({"type": "error", "detail": "Could not answer this turn, please try again"})
+                finally:
+                    transcriber.reset()
+            elif command.get("type") == "reset":
+                transcriber.reset()
+                prefetcher.discard(session_id)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        transcriber.reset()
+        prefetcher.discard(session_id)
+
+# ==================== ADAPTIVE EXAM ====================
+@app.post("/exam/start")
+async def exam_start(request: ExamStartRequest, current_user: Optional[MockUser] = Depends(get_current_user_optional)):
+    """Open an adaptive exam and serve its first question from the bank"""
+    result = await exam_engine.start(
+        request.language,
+        request.difficulty,
+        request.num_questions,
+        user_id=current_user.id if current_user else None,
+        refresh_bank=not request.use_question_bank
+    )
+    logger.info(f"📝 Exam started: {result['session_id']} ({request.language}, {request.difficulty})")
+    return result
+
+@app.post("/exam/submit-answer")
+async def exam_submit_answer(request: ExamAnswerRequest, current_user: Optional[MockUser] = Depends(get_current_user_optional)):
+    """Score an answer and return the next adaptive question, or the results"""
+    tag_session(request.session_id)
+    await exam_engine.require_owner(request.session_id, current_user.id if current_user else None)
+    return await exam_engine.submit(request.session_id, request.question_number, request.user_answer, request.time_taken)
+
+MAX_CHEATING_BATCH = 200
+
+@app.post("/exam/cheating-detected", status_code=202)
+async def exam_cheating_detected(request: Union[CheatingEventBatch, CheatingEvent], current_user: Optional[MockUser] = Depends(get_current_user_optional)):
+    """Record the caller's proctoring detections, one or a batch; buffered, not written per event"""
+    events = request.events if isinstance(request, CheatingEventBatch) else [request]
+    if len(events) > MAX_CHEATING_BATCH:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_CHEATING_BATCH} events per batch")
+
+    default_session = request.session_id if isinstance(request, CheatingEventBatch) else None
+    if any(not (event.session_id or default_session) for event in events):
+        raise HTTPException(status_code=422, detail="session_id is required")
+    user_id = current_user.id if current_user else None
+    for session_id in {event.session_id or default_session for event in events}:
+        await exam_engine.require_owner(session_id, user_id)
+
+    outcomes: Dict[str, int] = {}
+    for event in events:
+        outcome = proctoring.ingest(event.session_id or default_session, event.detection_type,
+                                    event.severity, event.description, event.timestamp)
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+    return {"received": len(events), **outcomes}
+
+@app.get("/exam/{session_id}/proctoring")
+async def exam_proctoring_summary(session_id: str, current_user: Optional[MockUser] = Depends(get_current_user_optional)):
+    """Per-type proctoring totals for an exam, from the running aggregates"""
+    await exam_engine.require_owner(session_id, current_user.id if current_user else None)
+    return await proctoring.summary(session_id)
+
+# ==================== ANALYTICS ====================
+@app.get("/api/analytics/me")
+async def my_analytics(current_user: MockUser = Depends(get_current_user)):
+    """Interview dashboard for the signed-in user, from the materialized rollup"""
+    return await analytics.user_dashboard(current_user.id)
+
+@app.get("/api/analytics/session/{session_id}")
+async def session_analytics(session_id: str, current_user: MockUser = Depends(get_current_user)):
+    """Running analytics for one of the user's interview sessions"""
+    report = await analytics.session_report(session_id)
+    if report is None or report["user_id"] != current_user.id:
+        raise HTTPException(status_code=404, detail="No analytics for this session")
+    return report
+
+# ==================== TRANSCRIPTS ====================
+async def require_session_owner(session_id: str, user: MockUser):
+    """404 unless the session belongs to the user, whether claimed at greeting or attributed by analytics"""
+    row = await fetch_one('''
+        SELECT COALESCE(s.user_id, a.user_id) AS owner FROM user_sessions s
+        LEFT JOIN analytics a ON a.session_id = s.session_id
+        WHERE s.session_id = ?
+    ''', (session_id,))
+    if row is None or row["owner"] != user.id:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+@app.get("/api/sessions/{session_id}/turns")
+async def session_turns(session_id: str, after: int = -1, limit: int = 100,
+                        current_user: MockUser = Depends(get_current_user)):
+    """One page of a transcript; pass next_after back as `after` for the next page"""
+    await require_session_owner(session_id, current_user)
+    # Turns still buffered in the write-behind store should be on the page too
+    await interview_manager.sessions.flush()
+    turns = await transcript_page(session_id, after, limit)
+    return {
+        "session_id": session_id,
+        "turns": turns,
+        "next_after": turns[-1]["seq"] if turns else None,
+    }
+
+@app.get("/api/sessions/{session_id}/export")
+async def export_session(session_id: str, current_user: MockUser = Depends(get_current_user)):
+    """Whole transcript as NDJSON, streamed page by page rather than built in memory"""
+    await require_session_owner(session_id, current_user)
+    await interview_manager.sessions.flush()
+
+    async def lines():
+        async for turn in iter_transcript(session_id):
+            yield json.dumps(turn) + "\n"
+
+    return StreamingResponse(
+        lines(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{session_id}.ndjson"'}
+    )
+
 # Protected endpoint example
 @app.get("/api/protected-data")
 async def protected_data(current_user: MockUser = Depends(get_current_user)):
@@ -734,26 +1236,116 @@ async def protected_data(current_user: MockUser = Depends(get_current_user)):
         "user_id": current_user.id
     }
 
+@app.get("/api/stats")
+async def service_stats():
+    """Counters for the voice pipeline, auth path and caches"""
+    return {
+        "pipeline": interview_pipeline.stats(),
+        "pools": {
+            "llm": executor_stats(llm_client.executor),
+            "smtp": executor_stats(email_outbox.executor),
+            "db_read": executor_stats(db_executor),
+        },
+        "transcription": transcription_service.stats(),
+        "tts_cache": tts_cache.stats(),
+        "user_cache": user_cache.stats(),
+        "email_outbox": email_outbox.stats(),
+        "llm": llm_client.stats(),
+        "speculation": prefetcher.stats(),
+        "sessions": interview_manager.sessions.stats(),
+        "exams": exam_engine.stats(),
+        "proctoring": proctoring.stats(),
+        "analytics": analytics.stats(),
+        "maintenance": maintenance.stats(),
+        "flight_recorder": flight_recorder.stats(),
+        "profiler": profiler.stats()
+    }
+
+# ==================== METRICS ====================
+# Latency histograms are recorded where the work happens (see metrics.py);
+# everything below is read from component counters when Prometheus scrapes.
+def _queue_depths() -> Dict[tuple, int]:
+    depths = {("pipeline_" + name,): stage["queued"] for name, stage in interview_pipeline.stats().items()}
+    depths[("llm_pool",)] = executor_stats(llm_client.executor)["queued"]
+    depths[("smtp_pool",)] = executor_stats(email_outbox.executor)["queued"]
+    depths[("db_read_pool",)] = executor_stats(db_executor)["queued"]
+    depths[("db_writer",)] = db_writer.queued()
+    depths[("transcription",)] = transcription_service.stats()["queued"]
+    return depths
+
+def _cache_lookups() -> Dict[tuple, int]:
+    return {
+        ("tts", "memory_hit"): tts_cache.memory_hits,
+        ("tts", "disk_hit"): tts_cache.disk_hits,
+        ("tts", "miss"): tts_cache.misses,
+        ("tts", "bypass"): tts_cache.bypassed,
+        ("user", "hit"): user_cache.hits,
+        ("user", "miss"): user_cache.misses,
+        ("speculation", "hit"): prefetcher.hits,
+        ("speculation", "miss"): prefetcher.misses,
+    }
+
+gauge_callback("arjuna_live_sessions", "Interview sessions held in memory by the InterviewManager",
+               lambda: len(interview_manager.sessions))
+gauge_callback("arjuna_queue_depth", "Work items waiting for a worker", _queue_depths, ["queue"])
+gauge_callback("arjuna_llm_active_calls", "Gemini requests currently in flight", lambda: llm_client.active)
+gauge_callback("arjuna_llm_breaker_open", "1 while the Gemini circuit breaker is not closed",
+               lambda: int(llm_client.breaker.state != llm_client.breaker.CLOSED))
+counter_callback("arjuna_cache_lookups_total", "Cache lookups by outcome", _cache_lookups, ["cache", "result"])
+counter_callback("arjuna_llm_short_circuited_total", "Gemini calls refused by the open circuit breaker",
+                 lambda: llm_client.breaker.short_circuited)
+counter_callback("arjuna_slow_requests_total", "Requests slower than the flight recorder threshold",
+                 lambda: flight_recorder.slow)
+counter_callback("arjuna_pipeline_rejected_total", "Requests turned away by a full pipeline stage",
+                 lambda: {(name,): stage.rejected for name, stage in interview_pipeline.stages.items()}, ["stage"])
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Stage latencies, fallbacks, timeouts, cache hits and queue depths in Prometheus text format"""
+    return Response(REGISTRY.expose(), media_type=CONTENT_TYPE)
+
+# ==================== DIAGNOSTICS ====================
+# Per process: with WORKERS > 1 each call sees the worker that served it
+@app.get("/admin/slow-requests")
+async def slow_requests(limit: int = 50, path: Optional[str] = None, admin: MockUser = Depends(require_admin)):
+    """Recent requests over SLOW_REQUEST_MS with their stage breakdown, newest first"""
+    return {**flight_recorder.stats(), "recent": flight_recorder.recent(max(1, limit), path)}
+
+@app.delete("/admin/slow-requests", status_code=204)
+async def clear_slow_requests(admin: MockUser = Depends(require_admin)):
+    flight_recorder.clear()
+
+@app.post("/admin/profile")
+async def record_profile(seconds: float = 10.0, interval_ms: float = 10.0, include_idle: bool = False,
+                         admin: MockUser = Depends(require_admin)):
+    """Sample every thread for `seconds` and return the stacks in collapsed (flamegraph) form"""
+    try:
+        result = await profiler.profile(seconds, interval_ms / 1000.0, include_idle)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    filename = f"arjuna-{datetime.now().strftime('%Y%m%d-%H%M%S')}.folded"
+    return PlainTextResponse(result.collapsed(), headers={
+        "Content-Disposition": f'attachment; filename="{filename}"',
+        "X-Profile-Samples": str(result.samples),
+    })
+
 # Check user status
 @app.get("/check-user/{email}")
 async def check_user(email: str):
     """Check if user exists and verification status"""
     try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT id, email, name, is_verified FROM users WHERE email = ?", (email,))
-            user_data = cursor.fetchone()
-            
-            if user_data:
-                return {
-                    "exists": True,
-                    "user_id": user_data['id'],
-                    "email": user_data['email'],
-                    "name": user_data['name'],
-                    "is_verified": bool(user_data['is_verified'])
-                }
-            else:
-                return {"exists": False}
+        user_data = await fetch_one("SELECT id, email, name, is_verified FROM users WHERE email = ?", (email,))
+        
+        if user_data:
+            return {
+                "exists": True,
+                "user_id": user_data['id'],
+                "email": user_data['email'],
+                "name": user_data['name'],
+                "is_verified": bool(user_data['is_verified'])
+            }
+        else:
+            return {"exists": False}
     except Exception as e:
         return {"error": str(e)}
 
@@ -767,32 +1359,83 @@ async def test_email_config():
         "smtp_username": "✅ Configured" if SMTP_USERNAME else "❌ Missing",
         "smtp_password": "✅ Configured" if SMTP_PASSWORD else "❌ Missing",
         "email_from": EMAIL_FROM,
-        "email_verification_enabled": bool(SMTP_USERNAME and SMTP_PASSWORD)
+        "smtp_use_tls": SMTP_USE_TLS,
+        "email_verification_enabled": EMAIL_ENABLED,
+        "outbox": await email_outbox.counts()
     }
     return config_status
 
 # ==================== STARTUP ====================
+async def start_component(name: str, start) -> bool:
+    """Run one startup step; a failure is logged and does not stop the steps after it"""
+    try:
+        result = start()
+        if asyncio.iscoroutine(result):
+            await result
+        return True
+    except Exception as e:
+        logger.error(f"❌ {name} failed to start: {e}")
+        return False
+
 @app.on_event("startup")
 async def startup_event():
     """Initialize application on startup"""
-    try:
-        init_database()
-        
+    # Nothing works without the schema, so a failure here fails startup
+    init_database()
+
+    # Independent components: one that cannot start (say, no Whisper model)
+    # must not leave sessions unpersisted, mail unsent or the exam bank empty
+    steps = [
+        ("Whisper pool", transcription_service.start),
+        ("Pipeline process pools", interview_pipeline.warm),
+        ("Session store", interview_manager.sessions.start),
+        ("Question bank", exam_engine.load),
+        ("Proctoring", proctoring.start),
+        ("Analytics", analytics.start),
+        ("Maintenance", maintenance.start),
+        ("TTS prewarm", lambda: interview_pipeline.spawn(
+            "synthesize", tts_cache.prewarm, interview_manager.static_prompts(), TTS_LANGUAGE, TTS_VOICE)),
+    ]
+    if EMAIL_ENABLED:
+        steps.insert(2, ("Email outbox", email_outbox.start))
+    failed = [name for name, start in steps if not await start_component(name, start)]
+
+    # Everything imported so far lives for the whole process; keep it out of
+    # full GC passes, which otherwise stall the event loop for ~100 ms
+    gc.freeze()
+
+    if failed:
+        logger.warning(f"⚠️ Arjuna AI Backend started without: {', '.join(failed)}")
+    else:
         logger.info("🚀 Arjuna AI Backend Started")
-        logger.info(f"🤖 Gemini: {'✅ Available' if GEMINI_AVAILABLE else '⚠️ Fallback'}")
-        logger.info(f"📧 Email Verification: {'✅ Enabled' if SMTP_USERNAME and SMTP_PASSWORD else '⚠️ Disabled - configure SMTP settings'}")
-        logger.info("🗄️ Database: SQLite initialized and verified")
-        
-    except Exception as e:
-        logger.error(f"❌ Startup initialization failed: {e}")
+    logger.info(f"🤖 Gemini: {'✅ Available' if GEMINI_AVAILABLE else '⚠️ Fallback'}")
+    logger.info(f"📧 Email Verification: {'✅ Enabled' if EMAIL_ENABLED else '⚠️ Disabled - configure SMTP settings'}")
+    logger.info("🗄️ Database: SQLite initialized and verified")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release worker pools on shutdown"""
+    await transcription_service.stop()
+    await email_outbox.stop()
+    await interview_manager.sessions.stop()
+    await exam_engine.stop()
+    await proctoring.stop()
+    await analytics.stop()
+    await maintenance.stop()
+    interview_pipeline.shutdown()
+    llm_client.shutdown()
+    close_database()
 
 # ==================== RUN SERVER ====================
 if __name__ == "__main__":
     import uvicorn
+    # Interview state is shared through the database, so workers need no stickiness;
+    # more than one worker requires the app as an import string
+    workers = env_int("WORKERS", 1)
     uvicorn.run(
-        app,
+        "backend:app" if workers > 1 else app,
         host="0.0.0.0",
         port=8000,
         log_level="info",
-        workers=1
+        workers=workers
     )
\ No newline at end of file
@@ -0,0 +1,136 @@
+# Event-loop lag benchmark for the async data-access layer.
+#
+# Drives a paced, mixed auth/DB workload through the FastAPI app in-process
+# while a ticker coroutine measures how late the event loop wakes up. The
+# load is open-loop (a fixed request rate) so the lag reflects blocking
+# calls on the loop rather than plain CPU saturation. A slow writer
+# job is injected periodically to show that a stalled disk write no longer
+# blocks unrelated requests.
+#
+#   cd Backend && python benchmarks/event_loop_lag.py --clients 32 --rps 300 --seconds 10
+import os
+import sys
+import json
+import time
+import argparse
+import asyncio
+import gc
+import logging
+import random
+import tempfile
+import statistics
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def measure_lag(stop: asyncio.Event, interval: float, warmup: float, samples: list):
+    """Record how far past `interval` each sleep actually wakes up"""
+    begin = time.perf_counter() + warmup
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        if started >= begin and not stop.is_set():
+            samples.append(max(0.0, time.perf_counter() - started - interval))
+
+
+async def client_loop(client, worker_id: int, stop: asyncio.Event, counts: dict, pace: float):
+    email = f"bench{worker_id}@example.com"
+    await client.post("/register-quick", json={"name": f"Bench {worker_id}", "email": email, "password": "secret"})
+    # Stagger clients across the time slice so the offered load is smooth, not bursty
+    await asyncio.sleep(5 * pace * random.random())
+    n = 0
+    while not stop.is_set():
+        n += 1
+        started = time.perf_counter()
+        response = await client.post("/token", data={"username": email, "password": "secret"})
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        await client.get("/api/protected-data", headers=headers)
+        await client.get(f"/check-user/{email}")
+        await client.post("/api/auto-greeting", json={"session": "default"}, headers=headers)
+        await client.post("/register-quick", json={"name": "New", "email": f"new{worker_id}_{n}@example.com", "password": "x"})
+        counts["requests"] += 5
+        # Five requests per iteration; sleep off the rest of this client's time slice
+        await asyncio.sleep(max(0.0, 5 * pace - (time.perf_counter() - started)))
+
+
+async def slow_writes(stop: asyncio.Event, db_writer, stall_s: float):
+    """Simulate a slow disk: every second the writer stalls for stall_s"""
+    while not stop.is_set():
+        db_writer.submit(lambda conn: time.sleep(stall_s))
+        await asyncio.sleep(1.0)
+
+
+async def run(args):
+    import httpx
+    import database
+
+    workdir = tempfile.mkdtemp(prefix="arjuna-bench-")
+    os.chdir(workdir)
+    database.DB_PATH = os.path.join(workdir, "bench.db")
+
+    import backend
+    logging.getLogger().setLevel(logging.WARNING)
+    database.init_database()
+    gc.freeze()  # same as backend's startup hook
+    # Only the database path is under test; keep TTS off the network
+    backend.tts_cache._synthesize = lambda text, **kwargs: b"\x00" * 1024
+
+    stop = asyncio.Event()
+    lag_samples, counts = [], {"requests": 0}
+    transport = httpx.ASGITransport(app=backend.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        tasks = [asyncio.ensure_future(measure_lag(stop, args.interval_ms / 1000.0, args.warmup, lag_samples))]
+        tasks.append(asyncio.ensure_future(slow_writes(stop, database.db_writer, args.stall_ms / 1000.0)))
+        pace = args.clients / float(args.rps)
+        tasks += [asyncio.ensure_future(client_loop(client, i, stop, counts, pace)) for i in range(args.clients)]
+        await asyncio.sleep(args.warmup + args.seconds)
+        stop.set()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    database.close_database()
+
+    lag_ms = [s * 1000 for s in lag_samples]
+    report = {
+        "clients": args.clients,
+        "target_rps": args.rps,
+        "seconds": args.seconds,
+        "requests": counts["requests"],
+        "throughput_rps": round(counts["requests"] / (args.warmup + args.seconds), 1),
+        "loop_lag_ms": {
+            "mean": round(statistics.mean(lag_ms), 3) if lag_ms else 0.0,
+            "p50": round(percentile(lag_ms, 50), 3),
+            "p99": round(percentile(lag_ms, 99), 3),
+            "max": round(max(lag_ms), 3) if lag_ms else 0.0,
+        },
+        "budget_ms": args.budget_ms,
+    }
+    report["passed"] = report["loop_lag_ms"]["p99"] <= args.budget_ms
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure event-loop lag under mixed DB load")
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--rps", type=float, default=300.0, help="total offered request rate")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--warmup", type=float, default=1.0, help="seconds of load before lag is recorded")
+    parser.add_argument("--interval-ms", type=float, default=1.0)
+    parser.add_argument("--stall-ms", type=float, default=50.0, help="simulated slow disk write per second")
+    parser.add_argument("--budget-ms", type=float, default=5.0, help="p99 loop lag that counts as a pass")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    print(json.dumps(report, indent=2))
+    sys.exit(0 if report["passed"] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,367 @@
+# End-to-end load test for backend.py against in-process fakes.
+#
+# Boots the FastAPI app in this process with google.generativeai, whisper,
+# gTTS and smtplib swapped for fakes/inprocess.py, then runs closed-loop
+# virtual users through the real user journey: register -> verify (token
+# from the fake mailbox) -> token -> auto-greeting -> N voice interview turns
+# -> adaptive exam with a proctoring batch -> dashboard. Each fake's latency
+# (log-normal median and spread) and error rate are flags, so runs can model
+# a slow or flaky provider. The report has throughput, p50/p95/p99 per
+# endpoint, event-loop lag and the server's own /api/stats. Reports can be
+# saved as baselines and later runs compared against them; a regression past
+# the tolerance exits non-zero so it can gate a deploy.
+#
+#   cd Backend && python benchmarks/loadtest.py --users 16 --seconds 30
+#   python benchmarks/loadtest.py --save-baseline benchmarks/baselines/default.json
+#   python benchmarks/loadtest.py --baseline benchmarks/baselines/default.json --tolerance 25
+import io
+import os
+import re
+import sys
+import json
+import time
+import wave
+import random
+import argparse
+import asyncio
+import logging
+import platform
+import tempfile
+import statistics
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BACKEND_DIR)
+
+from event_loop_lag import measure_lag, percentile
+
+LANGUAGES = ["Python", "Java", "JavaScript", "C++"]
+DETECTIONS = ["multiple_faces", "phone_detected", "looking_away", "tab_switch"]
+
+
+def upload_wav(seconds: float = 2.0, sample_rate: int = 16000) -> bytes:
+    """A short voiced recording; WAV so decoding needs no ffmpeg"""
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    pcm = (0.2 * np.sin(2 * np.pi * 220 * t) * 32767).astype(np.int16)
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as out:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(sample_rate)
+        out.writeframes(pcm.tobytes())
+    return buffer.getvalue()
+
+
+class Recorder:
+    """Latency samples and failures per endpoint, plus completed journeys"""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.statuses: Dict[str, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+        self.journeys = 0
+        self.failed_journeys = 0
+        self.failures: Dict[str, int] = defaultdict(int)
+
+    async def call(self, name: str, send, expect=(200,)):
+        started = time.perf_counter()
+        try:
+            response = await send()
+        except Exception as e:
+            self.samples[name].append(time.perf_counter() - started)
+            self.errors[name] += 1
+            raise JourneyError(f"{name}: {type(e).__name__}") from e
+        self.samples[name].append(time.perf_counter() - started)
+        self.statuses[name][response.status_code] += 1
+        if response.status_code not in expect:
+            self.errors[name] += 1
+            raise JourneyError(f"{name}: HTTP {response.status_code}")
+        return response
+
+    def endpoints(self, elapsed: float) -> Dict[str, Dict[str, Any]]:
+        report = {}
+        for name in sorted(self.samples):
+            ms = [s * 1000 for s in self.samples[name]]
+            report[name] = {
+                "count": len(ms),
+                "errors": self.errors[name],
+                "error_rate": round(self.errors[name] / len(ms), 4),
+                "rps": round(len(ms) / elapsed, 2),
+                "mean_ms": round(statistics.mean(ms), 2),
+                "p50_ms": round(percentile(ms, 50), 2),
+                "p95_ms": round(percentile(ms, 95), 2),
+                "p99_ms": round(percentile(ms, 99), 2),
+                "max_ms": round(max(ms), 2),
+                "statuses": {str(code): n for code, n in sorted(self.statuses[name].items())},
+            }
+        return report
+
+
+class JourneyError(Exception):
+    pass
+
+
+async def wait_for_token(mailbox, email: str, timeout: float) -> str:
+    """The verification token from the newest mail to `email`, as the user would click it"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        body = mailbox.latest(email)
+        if body is not None:
+            match = re.search(r"verify-email\?token=([\w\-]+)", body)
+            if match:
+                return match.group(1)
+        await asyncio.sleep(0.01)
+    raise JourneyError("verification mail never arrived")
+
+
+async def journey(client, recorder: Recorder, mailbox, user_id: int, n: int, args, rng: random.Random, audio: bytes):
+    async def think():
+        if args.think_ms:
+            await asyncio.sleep(rng.uniform(0.5, 1.5) * args.think_ms / 1000.0)
+
+    email = f"load{user_id}_{n}@example.com"
+    await recorder.call("POST /register", lambda: client.post(
+        "/register", json={"name": f"Load {user_id}", "email": email, "password": "secret"}))
+    token = await wait_for_token(mailbox, email, args.mail_timeout)
+    await recorder.call("GET /verify-email", lambda: client.get("/verify-email", params={"token": token}))
+    response = await recorder.call("POST /token", lambda: client.post(
+        "/token", data={"username": email, "password": "secret"}))
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    await think()
+
+    response = await recorder.call("POST /api/auto-greeting", lambda: client.post(
+        "/api/auto-greeting", json={"session": "default"}, headers=headers))
+    session_id = response.json()["session_id"]
+    path = "/interview/stream" if args.stream else "/interview/"
+    for _ in range(args.turns):
+        await think()
+        await recorder.call(f"POST {path}", lambda: client.post(
+            path, files={"file": ("answer.wav", audio, "audio/wav")}, data={"session_id": session_id},
+            headers=headers))
+
+    if args.exam_questions:
+        await think()
+        response = await recorder.call("POST /exam/start", lambda: client.post("/exam/start", json={
+            "language": rng.choice(LANGUAGES), "difficulty": rng.choice(["easy", "medium", "hard"]),
+            "num_questions": args.exam_questions}, headers=headers))
+        exam = response.json()
+        exam_id = exam["session_id"]
+        await recorder.call("POST /exam/cheating-detected", lambda: client.post("/exam/cheating-detected", json={
+            "session_id": exam_id,
+            "events": [{"detection_type": rng.choice(DETECTIONS), "severity": "low"} for _ in range(5)]},
+            headers=headers), expect=(202,))
+        for number in range(1, exam["total_questions"] + 1):
+            await think()
+            await recorder.call("POST /exam/submit-answer", lambda: client.post(
+                "/exam/submit-answer", json={"session_id": exam_id, "question_number": number,
+                                             "user_answer": rng.choice("ABCD"), "time_taken": 10.0},
+                headers=headers))
+        await recorder.call("GET /exam/{session_id}/proctoring", lambda: client.get(
+            f"/exam/{exam_id}/proctoring", headers=headers))
+
+    await recorder.call("GET /api/analytics/me", lambda: client.get("/api/analytics/me", headers=headers))
+
+
+async def virtual_user(client, recorder: Recorder, mailbox, user_id: int, stop: asyncio.Event, args, audio: bytes):
+    rng = random.Random(args.seed * 1000 + user_id)
+    await asyncio.sleep(args.ramp * user_id / max(1, args.users))
+    n = 0
+    while not stop.is_set():
+        n += 1
+        try:
+            await journey(client, recorder, mailbox, user_id, n, args, rng, audio)
+            recorder.journeys += 1
+        except JourneyError as e:
+            recorder.failed_journeys += 1
+            recorder.failures[str(e)] += 1
+            await asyncio.sleep(0.1)
+
+
+def profiles_from_args(args) -> Dict[str, Any]:
+    from fakes.inprocess import LatencyProfile
+    return {
+        service: LatencyProfile(getattr(args, f"{service}_ms"), getattr(args, f"{service}_spread"),
+                                getattr(args, f"{service}_errors"), seed=args.seed + i)
+        for i, service in enumerate(("genai", "whisper", "tts", "smtp"))
+    }
+
+
+async def run(args) -> Dict[str, Any]:
+    import httpx
+
+    workdir = tempfile.mkdtemp(prefix="arjuna-load-")
+    os.chdir(workdir)
+    os.environ.update({
+        "GEMINI_API_KEY": "fake",
+        "SMTP_SERVER": "fake-smtp",
+        "SMTP_USE_TLS": "false",
+        "WHISPER_MODEL": "fake",
+        "DB_MAINTENANCE_DELAY_S": str(24 * 3600),
+    })
+    from fakes import inprocess
+    profiles = profiles_from_args(args)
+    inprocess.install(profiles)
+
+    import database
+    database.DB_PATH = os.path.join(workdir, "load.db")
+    import backend
+    logging.getLogger("backend").setLevel(logging.INFO if args.verbose else logging.WARNING)
+    await backend.startup_event()
+
+    recorder = Recorder()
+    stop = asyncio.Event()
+    lag_samples: List[float] = []
+    audio = upload_wav(args.audio_seconds)
+    transport = httpx.ASGITransport(app=backend.app)
+    started = time.perf_counter()
+    async with httpx.AsyncClient(transport=transport, base_url="http://load", timeout=120.0) as client:
+        ticker = asyncio.ensure_future(measure_lag(stop, args.interval_ms / 1000.0, args.ramp, lag_samples))
+        users = [asyncio.ensure_future(virtual_user(client, recorder, inprocess.mailbox, i, stop, args, audio))
+                 for i in range(args.users)]
+        await asyncio.sleep(args.ramp + args.seconds)
+        stop.set()
+        # Let journeys in flight finish their current request, not the whole journey
+        await asyncio.wait(users, timeout=args.drain)
+        for task in users:
+            task.cancel()
+        await asyncio.gather(ticker, *users, return_exceptions=True)
+        elapsed = time.perf_counter() - started
+        server_stats = (await client.get("/api/stats")).json()
+    await backend.shutdown_event()
+
+    lag_ms = [s * 1000 for s in lag_samples]
+    requests = sum(len(samples) for samples in recorder.samples.values())
+    return {
+        "name": args.name,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "scenario": {
+            "users": args.users, "seconds": args.seconds, "ramp": args.ramp, "turns": args.turns,
+            "exam_questions": args.exam_questions, "think_ms": args.think_ms, "stream": args.stream,
+            "seed": args.seed, "fakes": {service: p.to_dict() for service, p in profiles.items()},
+        },
+        "elapsed_s": round(elapsed, 2),
+        "requests": requests,
+        "throughput_rps": round(requests / elapsed, 2),
+        "journeys": recorder.journeys,
+        "failed_journeys": recorder.failed_journeys,
+        "journey_failures": dict(recorder.failures),
+        "endpoints": recorder.endpoints(elapsed),
+        "loop_lag_ms": {
+            "mean": round(statistics.mean(lag_ms), 3) if lag_ms else 0.0,
+            "p50": round(percentile(lag_ms, 50), 3),
+            "p95": round(percentile(lag_ms, 95), 3),
+            "p99": round(percentile(lag_ms, 99), 3),
+            "max": round(max(lag_ms), 3) if lag_ms else 0.0,
+        },
+        "fake_calls": inprocess.stats(),
+        "server_stats": server_stats,
+    }
+
+
+# ==================== BASELINES ====================
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance_pct: float, slack_ms: float) -> List[str]:
+    """Regressions of `report` against `baseline`, as readable lines; empty means it passed.
+
+    A latency regresses when it exceeds the baseline by more than the
+    tolerance plus an absolute slack, so fast endpoints do not flap on
+    sub-millisecond noise.
+    """
+    factor = 1 + tolerance_pct / 100.0
+    problems = []
+    for name, base in baseline.get("endpoints", {}).items():
+        current = report["endpoints"].get(name)
+        if current is None:
+            problems.append(f"{name}: no longer exercised")
+            continue
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            limit = base[key] * factor + slack_ms
+            if current[key] > limit:
+                problems.append(f"{name}: {key} {current[key]:.1f} > {limit:.1f} (baseline {base[key]:.1f})")
+        if current["error_rate"] > base["error_rate"] + 0.01:
+            problems.append(f"{name}: error rate {current['error_rate']:.2%} (baseline {base['error_rate']:.2%})")
+    if report["throughput_rps"] < baseline["throughput_rps"] / factor:
+        problems.append(f"throughput {report['throughput_rps']:.1f} rps (baseline {baseline['throughput_rps']:.1f})")
+    base_lag = baseline.get("loop_lag_ms", {}).get("p99")
+    if base_lag is not None and report["loop_lag_ms"]["p99"] > base_lag * factor + slack_ms:
+        problems.append(f"loop lag p99 {report['loop_lag_ms']['p99']:.1f} ms (baseline {base_lag:.1f})")
+    return problems
+
+
+def save_json(path: str, payload: Dict[str, Any]):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="End-to-end load test against in-process fakes")
+    parser.add_argument("--name", default="default", help="scenario name recorded in the report")
+    parser.add_argument("--users", type=int, default=16, help="concurrent virtual users")
+    parser.add_argument("--seconds", type=float, default=30.0)
+    parser.add_argument("--ramp", type=float, default=2.0, help="seconds over which users start")
+    parser.add_argument("--drain", type=float, default=10.0, help="seconds to let in-flight requests finish")
+    parser.add_argument("--turns", type=int, default=4, help="interview turns per journey")
+    parser.add_argument("--exam-questions", type=int, default=5, help="0 skips the exam")
+    parser.add_argument("--think-ms", type=float, default=200.0, help="mean pause between user actions")
+    parser.add_argument("--audio-seconds", type=float, default=2.0)
+    parser.add_argument("--stream", action="store_true", help="use /interview/stream instead of /interview/")
+    parser.add_argument("--interval-ms", type=float, default=5.0, help="event-loop lag probe interval")
+    parser.add_argument("--seed", type=int, default=1)
+    for service, median, spread, errors in (("genai", 600, 0.4, 0.01), ("whisper", 300, 0.3, 0.0),
+                                            ("tts", 250, 0.3, 0.0), ("smtp", 80, 0.5, 0.02)):
+        parser.add_argument(f"--{service}-ms", type=float, default=median, help=f"median {service} latency")
+        parser.add_argument(f"--{service}-spread", type=float, default=spread, help="log-normal sigma")
+        parser.add_argument(f"--{service}-errors", type=float, default=errors, help="failure probability")
+    parser.add_argument("--mail-timeout", type=float, default=15.0)
+    parser.add_argument("--output", help="write the full report here")
+    parser.add_argument("--save-baseline", help="write the report as a baseline to this path")
+    parser.add_argument("--baseline", help="compare against this baseline; exit 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=20.0, help="allowed regression in percent")
+    parser.add_argument("--slack-ms", type=float, default=5.0, help="absolute latency slack per percentile")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args(argv)
+    # run() moves into a scratch directory, so pin the user's paths first
+    for option in ("output", "save_baseline", "baseline"):
+        if getattr(args, option):
+            setattr(args, option, os.path.abspath(getattr(args, option)))
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    report = asyncio.run(run(args))
+    if args.output:
+        save_json(args.output, report)
+    if args.save_baseline:
+        save_json(args.save_baseline, {key: value for key, value in report.items() if key != "server_stats"})
+
+    summary = {key: report[key] for key in ("requests", "throughput_rps", "journeys", "failed_journeys", "loop_lag_ms")}
+    summary["endpoints"] = {name: {key: e[key] for key in ("count", "errors", "p50_ms", "p95_ms", "p99_ms")}
+                            for name, e in report["endpoints"].items()}
+    print(json.dumps(summary, indent=2))
+
+    if baseline is not None:
+        problems = compare(report, baseline, args.tolerance, args.slack_ms)
+        if problems:
+            print("❌ Regressions against " + args.baseline)
+            for problem in problems:
+                print("  - " + problem)
+            return 1
+        print("✅ Within tolerance of " + args.baseline)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
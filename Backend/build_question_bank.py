@@ -0,0 +1,285 @@
+# Offline bulk generation of the adaptive-exam question bank. Fills every
+# (language, difficulty) band up to --per-band items by asking Gemini (or the
+# local fake) for batches of MCQs in the routes/interview.js JSON shape, with
+# bounded concurrency. Items are validated and normalized, near-duplicates
+# are dropped with a MinHash LSH index, and accepted items are written with
+# executemany in large transactions. The database is the source of truth for
+# progress; a checkpoint file written after every commit carries the run's
+# counters and prompt cursors, so an interrupted run resumes where it stopped.
+#
+#   cd Backend && python build_question_bank.py --fake --per-band 500
+#   GEMINI_API_KEY=... python build_question_bank.py --languages Python Java --per-band 1000
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from database import DB_PATH, connect, init_database
+from dedupe import MinHashIndex
+from exam_engine import (
+    DIFFICULTIES, INSERT_QUESTION_SQL, fingerprint, mcq_prompt,
+    normalize_mcq, parse_mcq_json, question_params
+)
+from llm_client import LLMClient, configure_gemini
+from circuit_breaker import CircuitOpenError
+
+logger = logging.getLogger("backend")
+
+LANGUAGES = ["Python", "Java", "JavaScript", "C++"]
+# Rotated through per call so concurrent prompts differ (identical ones would coalesce)
+FOCUS_AREAS = [
+    "core syntax", "built-in types", "functions and scope", "standard library collections",
+    "object-oriented design", "error handling", "memory and performance", "concurrency",
+    "common pitfalls", "idiomatic style", "testing and debugging", "algorithms and complexity",
+]
+MAX_ATTEMPTS = 3
+
+Band = Tuple[str, str]
+
+
+def dedupe_text(row: Dict[str, Any]) -> str:
+    return row["question"] + " " + " ".join(row["options"])
+
+
+class Checkpoint:
+    """Run counters and prompt cursors, replaced atomically after every commit"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.state: Dict[str, Any] = {"stats": {}, "calls": {}, "cursor": {}}
+
+    def load(self) -> bool:
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path, "r", encoding="utf-8") as f:
+            self.state.update(json.load(f))
+        return True
+
+    def save(self):
+        self.state["updated_at"] = time.time()
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp, self.path)
+
+
+class BankBuilder:
+    def __init__(self, conn, client: LLMClient, languages: List[str], difficulties: List[str],
+                 per_band: int, batch_size: int, concurrency: int, commit_every: int,
+                 threshold: float, checkpoint: Checkpoint, timeout: float, max_calls_factor: int = 4):
+        self.conn = conn
+        self.client = client
+        self.bands: List[Band] = [(language, difficulty) for language in languages for difficulty in difficulties]
+        self.per_band = per_band
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.commit_every = commit_every
+        self.checkpoint = checkpoint
+        self.timeout = timeout
+        self.indexes = {language: MinHashIndex(threshold) for language in languages}
+        self.fingerprints = set()
+        self.topics: Dict[str, set] = {language: set() for language in languages}
+        self.have: Dict[Band, int] = {band: 0 for band in self.bands}
+        self.inflight: Dict[Band, int] = {band: 0 for band in self.bands}
+        self.pending: List[Dict[str, Any]] = []
+        # Enough calls to fill each band even if most of a batch is rejected
+        self.max_calls = max(1, -(-per_band // batch_size)) * max_calls_factor
+        self.stats = {"calls": 0, "failed_calls": 0, "generated": 0, "rejected": 0,
+                      "duplicates": 0, "near_duplicates": 0, "inserted": 0, "transactions": 0}
+        self.stats.update(checkpoint.state.get("stats", {}))
+        self.calls: Dict[str, int] = dict(checkpoint.state.get("calls", {}))
+        self.cursor: Dict[str, int] = dict(checkpoint.state.get("cursor", {}))
+        self.started_at = time.monotonic()
+
+    @staticmethod
+    def band_key(band: Band) -> str:
+        return f"{band[0]}/{band[1]}"
+
+    def load_existing(self):
+        """Index what the bank already holds so reruns and resumes never insert duplicates"""
+        languages = {language.lower(): language for language in self.indexes}
+        rows = self.conn.execute("SELECT id, language, difficulty, topic, question, options FROM question_bank").fetchall()
+        for row in rows:
+            language = languages.get(row["language"].lower())
+            if language is None:
+                continue
+            self.fingerprints.add(fingerprint(row["language"], row["question"]))
+            self.indexes[language].add(row["id"], row["question"] + " " + " ".join(json.loads(row["options"])))
+            self.topics[language].add(row["topic"])
+            band = (language, row["difficulty"])
+            if band in self.have:
+                self.have[band] += 1
+        logger.info(f"🔧 Indexed {len(rows)} existing questions")
+
+    def _next_band(self) -> Optional[Band]:
+        """The band furthest from its target once in-flight calls are counted"""
+        best, best_deficit = None, 0
+        for band in self.bands:
+            if self.calls.get(self.band_key(band), 0) >= self.max_calls:
+                continue
+            deficit = self.per_band - self.have[band] - self.inflight[band] * self.batch_size
+            if deficit > best_deficit:
+                best, best_deficit = band, deficit
+        return best
+
+    async def _generate(self, band: Band) -> str:
+        key = self.band_key(band)
+        cursor = self.cursor.get(key, 0)
+        self.cursor[key] = cursor + 1
+        self.calls[key] = self.calls.get(key, 0) + 1
+        language, difficulty = band
+        focus = f"{FOCUS_AREAS[cursor % len(FOCUS_AREAS)]} (set {cursor + 1})"
+        prompt = mcq_prompt(language, difficulty, self.batch_size, sorted(self.topics[language]), focus)
+
+        for attempt in range(MAX_ATTEMPTS):
+            self.stats["calls"] += 1
+            try:
+                return await self.client.generate(prompt, timeout=self.timeout)
+            except CircuitOpenError as e:
+                self.stats["failed_calls"] += 1
+                await asyncio.sleep(e.retry_in + 0.1)
+            except Exception as e:
+                self.stats["failed_calls"] += 1
+                logger.warning(f"⚠️ {key} generation failed (attempt {attempt + 1}): {e!r}")
+                await asyncio.sleep(2 ** attempt)
+        return ""
+
+    def _accept(self, band: Band, text: str):
+        language, difficulty = band
+        raw_items = parse_mcq_json(text)
+        self.stats["generated"] += len(raw_items)
+        for raw in raw_items:
+            row = normalize_mcq(raw, language, difficulty, source="bulk")
+            if row is None:
+                self.stats["rejected"] += 1
+                continue
+            if row["fingerprint"] in self.fingerprints:
+                self.stats["duplicates"] += 1
+                continue
+            if self.indexes[language].add_if_new(row["fingerprint"], dedupe_text(row)) is not None:
+                self.stats["near_duplicates"] += 1
+                continue
+            self.fingerprints.add(row["fingerprint"])
+            self.topics[language].add(row["topic"])
+            self.pending.append(row)
+            accepted_band = (language, row["difficulty"])
+            self.have[accepted_band] = self.have.get(accepted_band, 0) + 1
+
+    def flush(self):
+        """Commit pending items in one transaction, then record progress"""
+        if self.pending:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                before = self.conn.total_changes
+                self.conn.executemany(INSERT_QUESTION_SQL, [question_params(row) for row in self.pending])
+                inserted = self.conn.total_changes - before
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.stats["inserted"] += inserted
+            self.stats["transactions"] += 1
+            self.pending = []
+            rate = self.stats["inserted"] / max(time.monotonic() - self.started_at, 1e-6)
+            logger.info(f"✅ Committed {inserted} questions "
+                        f"({self.stats['inserted']} this run, {rate:.1f}/s, "
+                        f"{self.stats['near_duplicates'] + self.stats['duplicates']} duplicates, "
+                        f"{self.stats['rejected']} rejected)")
+        self.checkpoint.state.update(stats=self.stats, calls=self.calls, cursor=self.cursor,
+                                     have={self.band_key(band): count for band, count in self.have.items()})
+        self.checkpoint.save()
+
+    async def _worker(self):
+        while True:
+            band = self._next_band()
+            if band is None:
+                return
+            self.inflight[band] += 1
+            try:
+                text = await self._generate(band)
+            finally:
+                self.inflight[band] -= 1
+            self._accept(band, text)
+            if len(self.pending) >= self.commit_every:
+                self.flush()
+
+    async def run(self):
+        try:
+            await asyncio.gather(*(self._worker() for _ in range(self.concurrency)))
+        finally:
+            # Also reached on Ctrl-C (cancellation), so accepted items are never lost
+            self.flush()
+        short = {self.band_key(band): self.per_band - count for band, count in self.have.items() if count < self.per_band}
+        if short:
+            logger.warning(f"⚠️ Call budget exhausted before these bands filled: {short}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Bulk-generate and dedupe the adaptive exam question bank")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--languages", nargs="+", default=LANGUAGES)
+    parser.add_argument("--difficulties", nargs="+", default=list(DIFFICULTIES), choices=DIFFICULTIES)
+    parser.add_argument("--per-band", type=int, default=250, help="target items per language and difficulty")
+    parser.add_argument("--batch-size", type=int, default=10, help="questions requested per call")
+    parser.add_argument("--concurrency", type=int, default=8, help="calls in flight at once")
+    parser.add_argument("--commit-every", type=int, default=500, help="items per transaction")
+    parser.add_argument("--threshold", type=float, default=0.8, help="MinHash similarity treated as a duplicate")
+    parser.add_argument("--timeout", type=float, default=60.0, help="seconds per generation call")
+    parser.add_argument("--checkpoint", default=None, help="defaults to <db>.questions.checkpoint.json")
+    parser.add_argument("--fresh", action="store_true", help="ignore an existing checkpoint")
+    parser.add_argument("--fake", action="store_true", help="generate against fakes/gemini_server.py")
+    parser.add_argument("--fake-latency-ms", type=float, default=200.0)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    load_dotenv()
+
+    fake = None
+    if args.fake:
+        from fakes.gemini_server import FakeGeminiServer
+        fake = FakeGeminiServer(latency_ms=args.fake_latency_ms, jitter_ms=args.fake_latency_ms / 2, mcq=True).start()
+        configure_gemini("fake", fake.endpoint)
+    elif os.getenv("GEMINI_API_KEY"):
+        configure_gemini(os.getenv("GEMINI_API_KEY"), os.getenv("GEMINI_API_ENDPOINT") or None)
+    else:
+        logger.error("❌ GEMINI_API_KEY is not set (or pass --fake)")
+        return 2
+
+    init_database(args.db)
+    checkpoint = Checkpoint(args.checkpoint or f"{args.db}.questions.checkpoint.json")
+    if not args.fresh and checkpoint.load():
+        logger.info(f"🔧 Resuming from {checkpoint.path}")
+
+    conn = connect(args.db)
+    conn.isolation_level = None  # transactions are managed explicitly in flush()
+    client = LLMClient(timeout_s=args.timeout, max_concurrency=args.concurrency)
+    # Batches of questions legitimately take longer than an interview turn
+    client.breaker.slow_call_s = args.timeout
+    builder = BankBuilder(conn, client, args.languages, args.difficulties, args.per_band, args.batch_size,
+                          max(1, args.concurrency), max(1, args.commit_every), args.threshold, checkpoint,
+                          args.timeout)
+    try:
+        builder.load_existing()
+        asyncio.run(builder.run())
+    except KeyboardInterrupt:
+        logger.warning(f"⚠️ Interrupted; progress saved to {checkpoint.path}")
+        return 130
+    finally:
+        client.shutdown()
+        conn.close()
+        if fake is not None:
+            fake.stop()
+
+    print(json.dumps({"stats": builder.stats,
+                      "bands": {builder.band_key(band): count for band, count in builder.have.items()}}, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
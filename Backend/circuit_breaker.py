@@ -0,0 +1,129 @@
+import time
+import threading
+from collections import deque
+from typing import Any, Dict
+
+from pipeline import env_int
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose breaker is open"""
+
+    def __init__(self, name: str, retry_in: float):
+        super().__init__(f"{name} circuit open, retry in {retry_in:.1f}s")
+        self.name = name
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """Closed / open / half-open breaker driven by errors and slow calls.
+
+    Every call outcome lands in a sliding window; a call counts as bad if
+    it failed, timed out or took longer than `slow_call_s`. The breaker
+    opens when the bad ratio over the window crosses `failure_ratio`, or
+    straight away after `consecutive_failures` errors in a row. After
+    `open_s` a single probe is let through: success closes the breaker,
+    anything else opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        slow_call_s: float,
+        window: int = env_int("BREAKER_WINDOW", 20),
+        min_calls: int = env_int("BREAKER_MIN_CALLS", 8),
+        failure_ratio: float = 0.5,
+        consecutive_failures: int = env_int("BREAKER_CONSECUTIVE_FAILURES", 5),
+        open_s: float = env_int("BREAKER_OPEN_S", 30),
+    ):
+        self.name = name
+        self.slow_call_s = slow_call_s
+        self.min_calls = max(1, min_calls)
+        self.failure_ratio = failure_ratio
+        self.consecutive_failures = max(1, consecutive_failures)
+        self.open_s = open_s
+        self._outcomes: deque = deque(maxlen=max(1, window))
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._failure_streak = 0
+        self.opened = 0
+        self.short_circuited = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.open_s:
+                return self.HALF_OPEN
+            return self._state
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may go through now"""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return
+            elapsed = time.monotonic() - self._opened_at
+            if self._state == self.OPEN and elapsed >= self.open_s:
+                self._state = self.HALF_OPEN
+            if self._state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return
+            self.short_circuited += 1
+            raise CircuitOpenError(self.name, max(0.0, self.open_s - elapsed))
+
+    def record_success(self, latency_s: float):
+        if latency_s > self.slow_call_s:
+            self._record(bad=True, error=False)
+        else:
+            self._record(bad=False, error=False)
+
+    def record_failure(self):
+        self._record(bad=True, error=True)
+
+    def record_abandoned(self):
+        """The caller dropped the call; it says nothing about the dependency"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def _record(self, bad: bool, error: bool):
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._probe_in_flight = False
+                if bad:
+                    self._open()
+                else:
+                    self._state = self.CLOSED
+                    self._outcomes.clear()
+                    self._failure_streak = 0
+                return
+            if self._state == self.OPEN:
+                return
+
+            self._outcomes.append(bad)
+            self._failure_streak = self._failure_streak + 1 if error else 0
+            bad_calls = sum(self._outcomes)
+            if (self._failure_streak >= self.consecutive_failures or
+                    (len(self._outcomes) >= self.min_calls and bad_calls / len(self._outcomes) >= self.failure_ratio)):
+                self._open()
+
+    def _open(self):
+        self._state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._probe_in_flight = False
+        self._outcomes.clear()
+        self._failure_streak = 0
+        self.opened += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "opened": self.opened,
+            "short_circuited": self.short_circuited,
+            "window_bad": sum(self._outcomes),
+            "window_calls": len(self._outcomes),
+        }
@@ -1,71 +1,267 @@
+import os
+import queue
+import asyncio
 import sqlite3
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import Future, ThreadPoolExecutor
 from contextlib import contextmanager
+from typing import Any, Callable, Optional
 import logging
 
+from flight_recorder import timed
+from metrics import STAGE_SECONDS
+from migrations import run_migrations
+
 logger = logging.getLogger("backend")
 
 DB_PATH = "arjuna_interviews.db"
 
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+DB_CACHE_SIZE_KB = int(os.getenv("DB_CACHE_SIZE_KB", "16384"))
+DB_MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", str(128 * 1024 * 1024)))
+DB_STATEMENT_CACHE = int(os.getenv("DB_STATEMENT_CACHE", "256"))
+DB_WRITE_BATCH = int(os.getenv("DB_WRITE_BATCH", "64"))
+DB_EXECUTOR_WORKERS = int(os.getenv("DB_EXECUTOR_WORKERS", str(DB_POOL_SIZE)))
+
+WriteResult = namedtuple("WriteResult", ["lastrowid", "rowcount"])
+
+_read_seconds = STAGE_SECONDS.labels("db_read")
+_write_seconds = STAGE_SECONDS.labels("db_write")
+
+def connect(path: str = None) -> sqlite3.Connection:
+    """Open a tuned connection: WAL journal, relaxed fsync, big page cache, mmap reads"""
+    conn = sqlite3.connect(
+        path or DB_PATH,
+        timeout=DB_BUSY_TIMEOUT_MS / 1000.0,
+        check_same_thread=False,
+        cached_statements=DB_STATEMENT_CACHE,
+    )
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA cache_size=-{DB_CACHE_SIZE_KB}")
+    conn.execute(f"PRAGMA mmap_size={DB_MMAP_SIZE}")
+    conn.execute(f"PRAGMA busy_timeout={DB_BUSY_TIMEOUT_MS}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    return conn
+
+# ==================== CONNECTION POOL ====================
+class ConnectionPool:
+    """Fixed-size pool of long-lived read connections.
+
+    Connections are opened lazily and reused, so the per-connection
+    statement cache stays warm across requests.
+    """
+
+    def __init__(self, path: str = None, size: int = DB_POOL_SIZE):
+        self.path = path
+        self.size = max(1, size)
+        self._idle = queue.LifoQueue()
+        self._opened = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout: float = DB_BUSY_TIMEOUT_MS / 1000.0) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._opened < self.size:
+                self._opened += 1
+                try:
+                    return connect(self.path)
+                except Exception:
+                    self._opened -= 1
+                    raise
+        try:
+            return self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise sqlite3.OperationalError("database connection pool exhausted")
+
+    def release(self, conn: sqlite3.Connection):
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put(conn)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+        with self._lock:
+            self._opened = 0
+
+# ==================== SINGLE WRITER ====================
+class DatabaseWriter:
+    """Serializes every write through one connection on one thread.
+
+    Queued jobs are drained in groups and committed together; each job
+    runs in its own savepoint, so a failing job only rolls back itself.
+    """
+
+    def __init__(self, path: str = None, batch_size: int = DB_WRITE_BATCH):
+        self.path = path
+        self.batch_size = max(1, batch_size)
+        self._jobs = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+                    self._thread.start()
+
+    def submit(self, fn: Callable[[sqlite3.Connection], Any]) -> Future:
+        """Queue fn(conn) for the writer thread; the future resolves after commit"""
+        self._ensure_started()
+        future = Future()
+        self._jobs.put((fn, future))
+        return future
+
+    def _run(self):
+        conn = connect(self.path)
+        conn.isolation_level = None  # transactions are managed explicitly below
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                break
+            batch = [job]
+            while len(batch) < self.batch_size:
+                try:
+                    job = self._jobs.get_nowait()
+                except queue.Empty:
+                    break
+                if job is None:
+                    self._jobs.put(None)
+                    break
+                batch.append(job)
+            self._run_batch(conn, batch)
+        conn.close()
+
+    def _run_batch(self, conn: sqlite3.Connection, batch):
+        results = []
+        started = time.perf_counter()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for fn, future in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                conn.execute("SAVEPOINT job")
+                try:
+                    results.append((future, fn(conn), None))
+                    conn.execute("RELEASE job")
+                except Exception as e:
+                    conn.execute("ROLLBACK TO job")
+                    conn.execute("RELEASE job")
+                    results.append((future, None, e))
+            conn.execute("COMMIT")
+            # One sample per group commit: the fsync-bound cost every job in it shares
+            _write_seconds.observe(time.perf_counter() - started)
+        except Exception as e:
+            logger.error(f"❌ Database write batch failed: {e}")
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            for fn, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for future, result, error in results:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def queued(self) -> int:
+        """Jobs waiting for the writer thread"""
+        return self._jobs.qsize()
+
+    def close(self):
+        if self._thread is not None:
+            self._jobs.put(None)
+            self._thread.join(timeout=5)
+            self._thread = None
+
+db_pool = ConnectionPool()
+db_writer = DatabaseWriter()
+
 @contextmanager
 def get_db_connection():
-    """Database connection context manager"""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
+    """Database connection context manager (pooled, read-mostly)"""
+    conn = db_pool.acquire()
     try:
         yield conn
     finally:
-        conn.close()
+        db_pool.release(conn)
+
+def execute_write(sql: str, params: tuple = ()) -> WriteResult:
+    """Run one write statement on the writer thread and wait for its commit"""
+    def job(conn):
+        cursor = conn.execute(sql, params)
+        return WriteResult(cursor.lastrowid, cursor.rowcount)
+    return db_writer.submit(job).result()
+
+def run_write(fn: Callable[[sqlite3.Connection], Any]) -> Any:
+    """Run a read-modify-write function on the writer thread and wait for its commit"""
+    return db_writer.submit(fn).result()
+
+# ==================== ASYNC API ====================
+# Reads run on a dedicated executor sized to the pool, writes on the writer
+# thread, so the event loop never touches sqlite3 directly.
+db_executor = ThreadPoolExecutor(max_workers=DB_EXECUTOR_WORKERS, thread_name_prefix="db-read")
 
-def init_database():
-    """Initialize SQLite database with proper schema"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    # Users table with email verification
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            email TEXT UNIQUE NOT NULL,
-            name TEXT NOT NULL,
-            hashed_password TEXT NOT NULL,
-            is_verified BOOLEAN DEFAULT FALSE,
-            verification_token TEXT,
-            verification_token_expires TIMESTAMP,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            last_login TIMESTAMP
-        )
-    ''')
-    
-    # Analytics table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS analytics (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            session_id TEXT NOT NULL,
-            total_questions INTEGER DEFAULT 0,
-            total_duration INTEGER DEFAULT 0,
-            avg_answer_length INTEGER DEFAULT 0,
-            strengths TEXT,
-            areas_for_improvement TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users (id)
-        )
-    ''')
-    
-    # Session tracking table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS user_sessions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            session_id TEXT NOT NULL,
-            start_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            end_time TIMESTAMP,
-            is_active BOOLEAN DEFAULT TRUE,
-            conversation_history TEXT DEFAULT '[]',
-            FOREIGN KEY (user_id) REFERENCES users (id)
-        )
-    ''')
-    
-    conn.commit()
-    conn.close()
-    logger.info("✅ Database initialized successfully with unified schema")
\ No newline at end of file
+def _fetch(sql: str, params: tuple, many: bool):
+    started = time.perf_counter()
+    with get_db_connection() as conn:
+        cursor = conn.execute(sql, params)
+        rows = cursor.fetchall() if many else cursor.fetchone()
+    _read_seconds.observe(time.perf_counter() - started)
+    return rows
+
+async def fetch_one(sql: str, params: tuple = ()) -> Optional[sqlite3.Row]:
+    """Async SELECT returning the first row or None"""
+    loop = asyncio.get_running_loop()
+    with timed("db_read"):
+        return await loop.run_in_executor(db_executor, _fetch, sql, params, False)
+
+async def fetch_all(sql: str, params: tuple = ()) -> list:
+    """Async SELECT returning every row"""
+    loop = asyncio.get_running_loop()
+    with timed("db_read"):
+        return await loop.run_in_executor(db_executor, _fetch, sql, params, True)
+
+async def execute_write_async(sql: str, params: tuple = ()) -> WriteResult:
+    """Async version of execute_write"""
+    def job(conn):
+        cursor = conn.execute(sql, params)
+        return WriteResult(cursor.lastrowid, cursor.rowcount)
+    with timed("db_write"):
+        return await asyncio.wrap_future(db_writer.submit(job))
+
+async def run_write_async(fn: Callable[[sqlite3.Connection], Any]) -> Any:
+    """Async version of run_write"""
+    with timed("db_write"):
+        return await asyncio.wrap_future(db_writer.submit(fn))
+
+def close_database():
+    """Flush pending writes and close pooled connections"""
+    db_writer.close()
+    db_executor.shutdown(wait=True)
+    db_pool.close()
+
+def init_database(path: str = None):
+    """Bring the schema up to date by applying any pending migrations"""
+    conn = connect(path)
+    try:
+        applied = run_migrations(conn)
+    finally:
+        conn.close()
+    if applied:
+        logger.info(f"🔧 Applied schema migrations: {', '.join(str(version) for version in applied)}")
+    logger.info("✅ Database initialized successfully with unified schema")
@@ -0,0 +1,86 @@
+import re
+import hashlib
+from typing import Dict, Hashable, List, Optional, Set, Tuple
+
+import numpy as np
+
+# Mersenne prime 2**31 - 1: hashes and coefficients stay below it, so a*h + b fits in uint64
+_PRIME = np.uint64((1 << 31) - 1)
+
+
+def shingles(text: str, size: int = 3) -> Set[str]:
+    """Word n-grams of the normalized text; short texts fall back to their words"""
+    words = re.findall(r"[a-z0-9+#]+", text.lower())
+    if len(words) < size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def _hash31(shingle: str) -> int:
+    return int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "little") % ((1 << 31) - 1)
+
+
+class MinHashIndex:
+    """Near-duplicate index: MinHash signatures bucketed by LSH banding.
+
+    Each text is reduced to `num_perm` minimum hashes over its word
+    shingles; two texts agree on a given minimum with probability equal to
+    their Jaccard similarity. Signatures are split into `bands` bands and
+    any shared band makes two texts candidates, which are then confirmed
+    by the fraction of equal minimums against `threshold`. Lookups cost
+    O(bands) bucket probes instead of a scan of everything indexed.
+    """
+
+    def __init__(self, threshold: float = 0.8, num_perm: int = 128, bands: int = 32,
+                 shingle_size: int = 3, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, (1 << 31) - 1, size=num_perm).astype(np.uint64)
+        self._b = rng.randint(0, (1 << 31) - 1, size=num_perm).astype(np.uint64)
+        self._buckets: List[Dict[bytes, List[Hashable]]] = [{} for _ in range(bands)]
+        self._signatures: Dict[Hashable, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def signature(self, text: str) -> np.ndarray:
+        hashes = np.array([_hash31(s) for s in shingles(text, self.shingle_size)] or [0], dtype=np.uint64)
+        return ((np.outer(self._a, hashes) + self._b[:, None]) % _PRIME).min(axis=1)
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def query(self, text: str, signature: Optional[np.ndarray] = None) -> Optional[Tuple[Hashable, float]]:
+        """The most similar indexed key at or above the threshold, with its estimated similarity"""
+        signature = self.signature(text) if signature is None else signature
+        best = None
+        seen = set()
+        for band, key in enumerate(self._band_keys(signature)):
+            for candidate in self._buckets[band].get(key, ()):
+                if candidate in seen:
+                    continue
+                seen.add(candidate)
+                similarity = float(np.mean(self._signatures[candidate] == signature))
+                if similarity >= self.threshold and (best is None or similarity > best[1]):
+                    best = (candidate, similarity)
+        return best
+
+    def add(self, key: Hashable, text: str, signature: Optional[np.ndarray] = None):
+        signature = self.signature(text) if signature is None else signature
+        self._signatures[key] = signature
+        for band, band_key in enumerate(self._band_keys(signature)):
+            self._buckets[band].setdefault(band_key, []).append(key)
+
+    def add_if_new(self, key: Hashable, text: str) -> Optional[Tuple[Hashable, float]]:
+        """Index the text unless it near-duplicates something already indexed; returns that match"""
+        signature = self.signature(text)
+        match = self.query(text, signature)
+        if match is None:
+            self.add(key, text, signature)
+        return match
@@ -0,0 +1,247 @@
+import time
+import socket
+import asyncio
+import smtplib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+from typing import List, Optional
+
+from database import execute_write_async, run_write_async, fetch_all
+from metrics import STAGE_SECONDS, TIMEOUTS
+from pipeline import env_int
+
+logger = logging.getLogger("backend")
+
+_smtp_seconds = STAGE_SECONDS.labels("smtp")
+
+
+# ==================== SMTP SESSION ====================
+class SMTPSession:
+    """One authenticated SMTP connection reused across sends.
+
+    The connection is opened lazily, probed with NOOP after it has been
+    idle for a while, and reopened once if the server dropped it.
+    """
+
+    def __init__(self, host: str, port: int, username: str = "", password: str = "",
+                 use_tls: bool = True, timeout: float = 30.0, idle_probe_s: float = 30.0):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.timeout = timeout
+        self.idle_probe_s = idle_probe_s
+        self._smtp: Optional[smtplib.SMTP] = None
+        self._last_used = 0.0
+        self.connects = 0
+
+    def _connect(self):
+        self.close()
+        smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.use_tls:
+            smtp.starttls()
+        if self.username and self.password:
+            smtp.login(self.username, self.password)
+        self._smtp = smtp
+        self.connects += 1
+
+    def _ensure(self):
+        if self._smtp is None:
+            self._connect()
+        elif time.monotonic() - self._last_used > self.idle_probe_s:
+            try:
+                if self._smtp.noop()[0] != 250:
+                    self._connect()
+            except smtplib.SMTPException:
+                self._connect()
+
+    def send(self, message: MIMEMultipart):
+        self._ensure()
+        try:
+            self._smtp.send_message(message)
+        except smtplib.SMTPServerDisconnected:
+            self._connect()
+            self._smtp.send_message(message)
+        self._last_used = time.monotonic()
+
+    def close(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except Exception:
+                pass
+            self._smtp = None
+
+
+# ==================== OUTBOX ====================
+class EmailOutbox:
+    """Persistent outbox drained by a background sender.
+
+    Handlers only insert a row into email_outbox. The sender claims due
+    rows in batches, delivers them over one reused SMTP session on its own
+    thread, and reschedules failures with exponential backoff until
+    `max_attempts` is reached.
+    """
+
+    def __init__(
+        self,
+        session: SMTPSession,
+        sender: str,
+        batch_size: int = env_int("EMAIL_BATCH_SIZE", 20),
+        max_attempts: int = env_int("EMAIL_MAX_ATTEMPTS", 6),
+        backoff_base_s: int = env_int("EMAIL_BACKOFF_BASE_S", 5),
+        backoff_max_s: int = env_int("EMAIL_BACKOFF_MAX_S", 900),
+        poll_interval_s: int = env_int("EMAIL_POLL_INTERVAL_S", 10),
+        claim_timeout_s: int = 300,
+    ):
+        self.session = session
+        self.sender = sender
+        self.batch_size = max(1, batch_size)
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_base = backoff_base_s
+        self.backoff_max = backoff_max_s
+        self.poll_interval = poll_interval_s
+        self.claim_timeout = claim_timeout_s
+        # smtplib is blocking, so all SMTP I/O lives on this one thread
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="smtp")
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+
+    async def enqueue(self, recipient: str, subject: str, html_body: str) -> int:
+        """Persist a message for delivery and nudge the sender"""
+        result = await execute_write_async('''
+            INSERT INTO email_outbox (recipient, subject, html_body, status, attempts, next_attempt_at, created_at)
+            VALUES (?, ?, ?, 'pending', 0, ?, CURRENT_TIMESTAMP)
+        ''', (recipient, subject, html_body, time.time()))
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return result.lastrowid
+
+    def start(self):
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.executor, self.session.close)
+        self.executor.shutdown(wait=False)
+
+    async def _run(self):
+        while True:
+            try:
+                sent_any = await self.drain_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ Email outbox error: {e}")
+                sent_any = False
+            if sent_any:
+                continue
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def _claim(self, conn) -> List[tuple]:
+        now = time.time()
+        rows = conn.execute('''
+            SELECT id, recipient, subject, html_body, attempts FROM email_outbox
+            WHERE (status = 'pending' AND next_attempt_at <= ?)
+               OR (status = 'sending' AND claimed_at < ?)
+            ORDER BY next_attempt_at
+            LIMIT ?
+        ''', (now, now - self.claim_timeout, self.batch_size)).fetchall()
+        conn.executemany(
+            "UPDATE email_outbox SET status = 'sending', claimed_at = ? WHERE id = ?",
+            [(now, row['id']) for row in rows]
+        )
+        return [tuple(row) for row in rows]
+
+    def _deliver(self, rows: List[tuple]) -> List[tuple]:
+        """Send a claimed batch over the shared session; runs on the SMTP thread"""
+        outcomes = []
+        for row_id, recipient, subject, html_body, attempts in rows:
+            message = MIMEMultipart()
+            message["From"] = self.sender
+            message["To"] = recipient
+            message["Subject"] = subject
+            message.attach(MIMEText(html_body, "html"))
+            started = time.perf_counter()
+            try:
+                self.session.send(message)
+                outcomes.append((row_id, attempts, None))
+            except Exception as e:
+                if isinstance(e, (socket.timeout, TimeoutError)):
+                    TIMEOUTS.labels("smtp").inc()
+                outcomes.append((row_id, attempts, str(e)))
+            _smtp_seconds.observe(time.perf_counter() - started)
+        return outcomes
+
+    def _record(self, conn, outcomes: List[tuple]):
+        now = time.time()
+        for row_id, attempts, error in outcomes:
+            attempts += 1
+            if error is None:
+                conn.execute(
+                    "UPDATE email_outbox SET status = 'sent', attempts = ?, sent_at = CURRENT_TIMESTAMP, last_error = NULL WHERE id = ?",
+                    (attempts, row_id)
+                )
+            elif attempts >= self.max_attempts:
+                conn.execute(
+                    "UPDATE email_outbox SET status = 'failed', attempts = ?, last_error = ? WHERE id = ?",
+                    (attempts, error, row_id)
+                )
+            else:
+                delay = min(self.backoff_max, self.backoff_base * (2 ** (attempts - 1)))
+                conn.execute(
+                    "UPDATE email_outbox SET status = 'pending', attempts = ?, last_error = ?, next_attempt_at = ? WHERE id = ?",
+                    (attempts, error, now + delay, row_id)
+                )
+
+    async def drain_once(self) -> bool:
+        """Claim, send and record one batch; returns False when nothing was due"""
+        rows = await run_write_async(self._claim)
+        if not rows:
+            return False
+        loop = asyncio.get_running_loop()
+        outcomes = await loop.run_in_executor(self.executor, self._deliver, rows)
+        await run_write_async(lambda conn: self._record(conn, outcomes))
+
+        for _, attempts, error in outcomes:
+            if error is None:
+                self.sent += 1
+            elif attempts + 1 >= self.max_attempts:
+                self.failed += 1
+                logger.error(f"❌ Email gave up after {attempts + 1} attempts: {error}")
+            else:
+                self.retried += 1
+                logger.warning(f"⚠️ Email send failed, will retry: {error}")
+        logger.info(f"📧 Outbox batch: {sum(1 for o in outcomes if o[2] is None)}/{len(outcomes)} sent")
+        return True
+
+    async def counts(self) -> dict:
+        rows = await fetch_all("SELECT status, COUNT(*) AS n FROM email_outbox GROUP BY status")
+        return {row['status']: row['n'] for row in rows}
+
+    def stats(self) -> dict:
+        return {
+            "sent": self.sent,
+            "retried": self.retried,
+            "failed": self.failed,
+            "smtp_connects": self.session.connects,
+        }
@@ -0,0 +1,699 @@
+import os
+import re
+import json
+import math
+import time
+import uuid
+import bisect
+import asyncio
+import hashlib
+import logging
+import sqlite3
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from database import fetch_all, fetch_one, run_write_async
+from pipeline import env_int
+
+logger = logging.getLogger("backend")
+
+SEED_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "question_seed.json")
+
+# Item difficulty (irt_b) bands on the ability scale, and where each one starts
+DIFFICULTIES = ("easy", "medium", "hard")
+BAND_EDGES = (-0.5, 0.5)
+BAND_RANGES = {"easy": (-2.5, -0.5), "medium": (-0.5, 0.5), "hard": (0.5, 2.5)}
+START_ABILITY = {"easy": -1.0, "medium": 0.0, "hard": 1.0}
+ABILITY_LIMIT = 4.0
+
+EXAM_MAX_QUESTIONS = env_int("EXAM_MAX_QUESTIONS", 50)
+EXAM_MAX_SESSIONS = env_int("EXAM_MAX_SESSIONS", 5000)
+# Exam owners remembered after their sessions are evicted, for proctoring checks
+EXAM_OWNER_CACHE = env_int("EXAM_OWNER_CACHE", 50000)
+# Gemini tops a band up in the background once it holds fewer items than this
+EXAM_BANK_MIN_PER_BAND = env_int("EXAM_BANK_MIN_PER_BAND", 20)
+EXAM_TOPUP_BATCH = env_int("EXAM_TOPUP_BATCH", 5)
+EXAM_TOPUP_COOLDOWN_S = env_int("EXAM_TOPUP_COOLDOWN_S", 60)
+# Nearest candidates considered when steering away from the last topic
+EXAM_TOPIC_WINDOW = env_int("EXAM_TOPIC_WINDOW", 6)
+
+_OPTION_LABEL = re.compile(r'^\s*\(?([A-Da-d])[\).:\-]\s*')
+LETTERS = "ABCD"
+
+
+def band_for(b: float) -> str:
+    """Difficulty label for an item difficulty or ability"""
+    if b < BAND_EDGES[0]:
+        return "easy"
+    if b > BAND_EDGES[1]:
+        return "hard"
+    return "medium"
+
+
+def fingerprint(language: str, question: str) -> str:
+    """Identity of a question for exact-duplicate checks: language plus normalized wording"""
+    words = re.findall(r"[a-z0-9+#]+", question.lower())
+    return hashlib.sha1(f"{language.lower()}|{' '.join(words)}".encode("utf-8")).hexdigest()
+
+
+def provisional_b(difficulty: str, item_fingerprint: str) -> float:
+    """Uncalibrated difficulty: a stable spot inside the labelled band, so items do not all tie"""
+    lo, hi = BAND_RANGES[difficulty]
+    return lo + (hi - lo) * (0.05 + 0.9 * int(item_fingerprint[:8], 16) / 0xFFFFFFFF)
+
+
+def normalize_mcq(raw: Dict[str, Any], language: str, difficulty: Optional[str] = None,
+                  source: str = "seed") -> Optional[Dict[str, Any]]:
+    """Validate a generated or seeded multiple-choice item into a question_bank row.
+
+    Accepts the shape routes/interview.js asks Gemini for (question, four
+    options, a correctAnswer letter, explanation, difficulty). Option
+    labels are rewritten to "A) ..." form. Returns None if the item is
+    unusable.
+    """
+    if not isinstance(raw, dict):
+        return None
+    question = str(raw.get("question") or "").strip()
+    options = raw.get("options")
+    if len(question) < 10 or not isinstance(options, list) or len(options) != len(LETTERS):
+        return None
+
+    texts = [_OPTION_LABEL.sub("", str(option)).strip() for option in options]
+    if not all(texts) or len({text.lower() for text in texts}) != len(texts):
+        return None
+
+    answer = str(raw.get("correctAnswer") or raw.get("correct_answer") or "").strip()
+    label = _OPTION_LABEL.match(answer + ")") if len(answer) == 1 else _OPTION_LABEL.match(answer)
+    if label:
+        answer = label.group(1).upper()
+    elif answer.lower() in [text.lower() for text in texts]:
+        answer = LETTERS[[text.lower() for text in texts].index(answer.lower())]
+    else:
+        return None
+
+    difficulty = str(raw.get("difficulty") or difficulty or "medium").lower()
+    if difficulty not in DIFFICULTIES:
+        return None
+    item_fingerprint = fingerprint(language, question)
+    try:
+        irt_b = float(raw["irt_b"]) if raw.get("irt_b") is not None else provisional_b(difficulty, item_fingerprint)
+        irt_a = float(raw.get("irt_a") or 1.0)
+    except (TypeError, ValueError):
+        return None
+
+    topic = re.sub(r"\s+", "-", str(raw.get("topic") or "general").strip().lower()) or "general"
+    return {
+        "language": language,
+        "difficulty": difficulty,
+        "topic": topic,
+        "question": question,
+        "options": [f"{LETTERS[i]}) {text}" for i, text in enumerate(texts)],
+        "correct_answer": answer,
+        "explanation": str(raw.get("explanation") or "").strip(),
+        "irt_a": min(max(irt_a, 0.2), 3.0),
+        "irt_b": min(max(irt_b, -3.0), 3.0),
+        "source": source,
+        "fingerprint": item_fingerprint,
+    }
+
+
+def parse_mcq_json(text: str) -> List[Dict[str, Any]]:
+    """Items from a model reply: a JSON array or object, possibly wrapped in prose or fences"""
+    match = re.search(r"\[[\s\S]*\]|\{[\s\S]*\}", text or "")
+    if match is None:
+        return []
+    try:
+        parsed = json.loads(match.group(0))
+    except ValueError:
+        return []
+    items = parsed if isinstance(parsed, list) else [parsed]
+    return [item for item in items if isinstance(item, dict)]
+
+
+INSERT_QUESTION_SQL = '''
+    INSERT OR IGNORE INTO question_bank
+    (language, difficulty, topic, question, options, correct_answer, explanation,
+     irt_a, irt_b, source, fingerprint)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+
+def question_params(row: Dict[str, Any]) -> tuple:
+    """INSERT_QUESTION_SQL parameters for a normalized item"""
+    return (row["language"], row["difficulty"], row["topic"], row["question"], json.dumps(row["options"]),
+            row["correct_answer"], row["explanation"], row["irt_a"], row["irt_b"], row["source"],
+            row["fingerprint"])
+
+
+def insert_questions(conn, rows: List[Dict[str, Any]]) -> List[Tuple[int, Dict[str, Any]]]:
+    """INSERT OR IGNORE normalized items; returns (id, row) for the ones that were new"""
+    inserted = []
+    for row in rows:
+        cursor = conn.execute(INSERT_QUESTION_SQL, question_params(row))
+        if cursor.rowcount == 1:
+            inserted.append((cursor.lastrowid, row))
+    return inserted
+
+
+def mcq_prompt(language: str, band: str, count: int, topics: List[str] = (), focus: Optional[str] = None) -> str:
+    """Ask Gemini for a batch of items in the JSON shape routes/interview.js uses, plus a topic"""
+    hint = f" (for example: {', '.join(topics[:8])})" if topics else ""
+    focus_line = f"\nFocus this batch on: {focus}." if focus else ""
+    return f"""Generate {count} different {band} level multiple choice questions about {language}.
+Cover a mix of topics{hint}.{focus_line}
+Return ONLY a valid JSON array, each element in this exact format:
+{{
+  "question": "question text",
+  "options": ["A) option1", "B) option2", "C) option3", "D) option4"],
+  "correctAnswer": "A",
+  "explanation": "brief explanation",
+  "difficulty": "{band}",
+  "topic": "one or two word topic"
+}}"""
+
+
+# ==================== ABILITY ESTIMATION ====================
+def estimate_ability(responses: List[Tuple[float, float, bool]], prior_mean: float = 0.0,
+                     prior_sd: float = 1.0) -> float:
+    """MAP ability under the 2PL model with a normal prior, by Newton-Raphson.
+
+    `responses` are (a, b, correct) triples. The prior keeps the estimate
+    finite while every answer so far is right (or wrong).
+    """
+    theta = prior_mean
+    precision = 1.0 / (prior_sd * prior_sd)
+    for _ in range(20):
+        gradient = -(theta - prior_mean) * precision
+        hessian = -precision
+        for a, b, correct in responses:
+            p = 1.0 / (1.0 + math.exp(-a * (theta - b)))
+            gradient += a * ((1.0 if correct else 0.0) - p)
+            hessian -= a * a * p * (1.0 - p)
+        step = gradient / hessian
+        theta = min(max(theta - step, -ABILITY_LIMIT), ABILITY_LIMIT)
+        if abs(step) < 1e-4:
+            break
+    return theta
+
+
+# ==================== QUESTION BANK ====================
+class BankItem:
+    __slots__ = ("id", "language", "difficulty", "topic", "question", "options",
+                 "correct_answer", "explanation", "a", "b")
+
+    def __init__(self, item_id: int, row: Dict[str, Any]):
+        self.id = item_id
+        self.language = row["language"]
+        self.difficulty = row["difficulty"]
+        self.topic = row["topic"]
+        self.question = row["question"]
+        options = row["options"]
+        self.options = json.loads(options) if isinstance(options, str) else list(options)
+        self.correct_answer = row["correct_answer"]
+        self.explanation = row["explanation"] or ""
+        self.a = row["irt_a"]
+        self.b = row["irt_b"]
+
+    def public(self) -> Dict[str, Any]:
+        """What the client sees before answering: no correct answer"""
+        return {
+            "id": self.id,
+            "question": self.question,
+            "options": self.options,
+            "topic": self.topic,
+            "difficulty": self.difficulty,
+        }
+
+
+class QuestionBank:
+    """In-memory view of question_bank, one list per language sorted by irt_b.
+
+    The item closest to the current ability is the most informative one,
+    so selection is a bisect on the difficulty list plus a short outward
+    walk past items already asked.
+    """
+
+    def __init__(self):
+        self._b: Dict[str, List[float]] = {}
+        self._items: Dict[str, List[BankItem]] = {}
+        self._by_id: Dict[int, BankItem] = {}
+        self._bands: Dict[Tuple[str, str], int] = {}
+        self.max_id = 0
+
+    @staticmethod
+    def key(language: str) -> str:
+        return language.strip().lower()
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def add(self, item: BankItem):
+        if item.id in self._by_id:
+            return
+        key = self.key(item.language)
+        b_list = self._b.setdefault(key, [])
+        index = bisect.bisect_right(b_list, item.b)
+        b_list.insert(index, item.b)
+        self._items.setdefault(key, []).insert(index, item)
+        self._by_id[item.id] = item
+        band = (key, band_for(item.b))
+        self._bands[band] = self._bands.get(band, 0) + 1
+        self.max_id = max(self.max_id, item.id)
+
+    def get(self, item_id: Optional[int]) -> Optional[BankItem]:
+        return self._by_id.get(item_id)
+
+    def count(self, language: str, band: str) -> int:
+        return self._bands.get((self.key(language), band), 0)
+
+    def topics(self, language: str) -> List[str]:
+        return sorted({item.topic for item in self._items.get(self.key(language), [])})
+
+    def has_language(self, language: str) -> bool:
+        return bool(self._items.get(self.key(language)))
+
+    def select(self, language: str, theta: float, asked: set, avoid_topic: Optional[str] = None) -> Optional[BankItem]:
+        """The unasked item nearest theta, preferring one off the previous topic"""
+        key = self.key(language)
+        b_list = self._b.get(key)
+        if not b_list:
+            return None
+        items = self._items[key]
+        lo = bisect.bisect_left(b_list, theta) - 1
+        hi = lo + 1
+        first = None
+        seen = 0
+        while (lo >= 0 or hi < len(items)) and seen < EXAM_TOPIC_WINDOW:
+            if hi >= len(items) or (lo >= 0 and theta - b_list[lo] <= b_list[hi] - theta):
+                item, lo = items[lo], lo - 1
+            else:
+                item, hi = items[hi], hi + 1
+            if item.id in asked:
+                continue
+            if avoid_topic is None or item.topic != avoid_topic:
+                return item
+            if first is None:
+                first = item
+            seen += 1
+        return first
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "items": len(self._by_id),
+            "by_language": {key: len(items) for key, items in self._items.items()},
+        }
+
+
+# ==================== SESSIONS ====================
+class ExamSession:
+    __slots__ = ("session_id", "user_id", "language", "start_difficulty", "num_questions",
+                 "ability", "asked", "responses", "correct", "current", "last_topic",
+                 "completed", "started_at", "cheating_score")
+
+    def __init__(self, session_id: str, user_id: Optional[int], language: str,
+                 start_difficulty: str, num_questions: int, started_at: Optional[float] = None):
+        self.session_id = session_id
+        self.user_id = user_id
+        self.language = language
+        self.start_difficulty = start_difficulty
+        self.num_questions = num_questions
+        self.ability = START_ABILITY[start_difficulty]
+        self.asked: set = set()
+        self.responses: List[Tuple[float, float, bool]] = []
+        self.correct = 0
+        self.current: Optional[BankItem] = None
+        self.last_topic: Optional[str] = None
+        self.completed = False
+        self.started_at = started_at or time.time()
+        self.cheating_score = 0.0
+
+    @property
+    def answered(self) -> int:
+        return len(self.responses)
+
+    def results(self) -> Dict[str, Any]:
+        total = self.answered
+        return {
+            "exam_complete": True,
+            "session_id": self.session_id,
+            "score": round(100.0 * self.correct / total, 1) if total else 0.0,
+            "correct_answers": self.correct,
+            "total_questions": total,
+            "ability": round(self.ability, 3),
+            "final_difficulty": band_for(self.ability),
+            "cheating_score": self.cheating_score,
+            "duration_seconds": int(time.time() - self.started_at),
+        }
+
+
+class ExamError(Exception):
+    """A request the engine cannot serve; carries the HTTP status to answer with"""
+
+    def __init__(self, status_code: int, detail: str, retry_after: Optional[int] = None):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class ExamEngine:
+    """Adaptive exams served from the in-memory question bank.
+
+    Each answer re-estimates the candidate's ability and the next item is
+    the unasked one nearest that ability. Sessions live in a bounded map
+    and every start and answer is committed to exam_sessions / exam_answers
+    before it is acknowledged, so another worker (or this one after
+    eviction) rehydrates them from the database. A cached session is
+    checked against its row before each answer, since with several
+    workers the previous answer may have been served elsewhere. Gemini is never on the request path: when a
+    band runs low, `generate` is used in the background to top it up.
+    """
+
+    def __init__(
+        self,
+        generate: Optional[Callable[[str], Awaitable[str]]] = None,
+        cheating_score: Optional[Callable[[str], Awaitable[float]]] = None,
+        max_sessions: int = EXAM_MAX_SESSIONS,
+        min_per_band: int = EXAM_BANK_MIN_PER_BAND,
+    ):
+        self.bank = QuestionBank()
+        self._generate = generate
+        self._cheating_score = cheating_score
+        self.max_sessions = max(1, max_sessions)
+        self.min_per_band = min_per_band
+        self._sessions: "OrderedDict[str, ExamSession]" = OrderedDict()
+        self._owners: "OrderedDict[str, Optional[int]]" = OrderedDict()
+        self._topping: Dict[Tuple[str, str], asyncio.Task] = {}
+        self._last_top_up: Dict[Tuple[str, str], float] = {}
+        self.started = 0
+        self.answered = 0
+        self.completed = 0
+        self.rehydrated = 0
+        self.resynced = 0
+        self.evicted = 0
+        self.selections = 0
+        self.select_ms_total = 0.0
+        self.select_ms_max = 0.0
+        self.top_ups = 0
+        self.top_up_items = 0
+        self.top_up_rejected = 0
+        self.top_up_failures = 0
+
+    # ---------- bank ----------
+    async def load(self, seed_path: str = SEED_PATH):
+        """Seed the bank (idempotent) and load every item into memory"""
+        if os.path.exists(seed_path):
+            with open(seed_path, "r", encoding="utf-8") as f:
+                seed = json.load(f)
+            rows = [normalize_mcq(raw, raw.get("language", ""), source="seed") for raw in seed]
+            rows = [row for row in rows if row is not None and row["language"]]
+            inserted = await run_write_async(lambda conn: insert_questions(conn, rows))
+            if inserted:
+                logger.info(f"🔧 Seeded {len(inserted)} exam questions")
+        await self.refresh()
+        logger.info(f"✅ Question bank loaded: {len(self.bank)} items")
+
+    async def refresh(self):
+        """Pick up items added since the last load, e.g. by another worker's top-up"""
+        rows = await fetch_all("SELECT * FROM question_bank WHERE id > ? ORDER BY id", (self.bank.max_id,))
+        for row in rows:
+            self.bank.add(BankItem(row["id"], row))
+
+    def _maybe_top_up(self, language: str, band: str, force: bool = False):
+        if self._generate is None or (not force and self.bank.count(language, band) >= self.min_per_band):
+            return
+        key = (self.bank.key(language), band)
+        if key in self._topping or time.monotonic() - self._last_top_up.get(key, -1e9) < EXAM_TOPUP_COOLDOWN_S:
+            return
+        self._last_top_up[key] = time.monotonic()
+        task = asyncio.ensure_future(self._top_up(language, band, force))
+        self._topping[key] = task
+        task.add_done_callback(lambda _: self._topping.pop(key, None))
+
+    async def _top_up(self, language: str, band: str, force: bool = False):
+        try:
+            await self.refresh()
+            if not force and self.bank.count(language, band) >= self.min_per_band:
+                return
+            self.top_ups += 1
+            text = await self._generate(mcq_prompt(language, band, EXAM_TOPUP_BATCH, self.bank.topics(language)))
+            raw_items = parse_mcq_json(text)
+            rows = [normalize_mcq(raw, language, band, source="gemini") for raw in raw_items]
+            rows = [row for row in rows if row is not None]
+            self.top_up_rejected += len(raw_items) - len(rows)
+            inserted = await run_write_async(lambda conn: insert_questions(conn, rows)) if rows else []
+            for item_id, row in inserted:
+                self.bank.add(BankItem(item_id, row))
+            self.top_up_items += len(inserted)
+            logger.info(f"⚡ Question bank top-up for {language}/{band}: {len(inserted)} new of {len(raw_items)} generated")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.top_up_failures += 1
+            logger.warning(f"⚠️ Question bank top-up for {language}/{band} failed: {e}")
+
+    # ---------- sessions ----------
+    def _remember_owner(self, session_id: str, user_id: Optional[int]):
+        self._owners[session_id] = user_id
+        self._owners.move_to_end(session_id)
+        while len(self._owners) > EXAM_OWNER_CACHE:
+            self._owners.popitem(last=False)
+
+    async def require_owner(self, session_id: str, user_id: Optional[int]):
+        """404 unless the exam exists and was started by `user_id` (None for a guest exam).
+
+        Owners are cached, so proctoring ingestion only reads the database
+        for an exam this process has never seen.
+        """
+        if session_id in self._owners:
+            owner = self._owners[session_id]
+            self._owners.move_to_end(session_id)
+        else:
+            row = await fetch_one("SELECT user_id FROM exam_sessions WHERE session_id = ?", (session_id,))
+            if row is None:
+                raise ExamError(404, "Exam session not found")
+            owner = row["user_id"]
+            self._remember_owner(session_id, owner)
+        if owner != user_id:
+            raise ExamError(404, "Exam session not found")
+
+    def _remember(self, session: ExamSession):
+        self._remember_owner(session.session_id, session.user_id)
+        self._sessions[session.session_id] = session
+        self._sessions.move_to_end(session.session_id)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+            self.evicted += 1
+
+    async def _session(self, session_id: str, fresh: bool = False) -> ExamSession:
+        """The session from memory, else from the database.
+
+        With `fresh`, a cached session is used only if its row still agrees
+        with it; otherwise it is rebuilt from what the other workers wrote.
+        """
+        session = self._sessions.get(session_id)
+        if session is not None and fresh and not await self._in_sync(session):
+            session = None
+            self.resynced += 1
+        if session is not None:
+            self._sessions.move_to_end(session_id)
+            return session
+        session = await self._rehydrate(session_id)
+        if session is None:
+            raise ExamError(404, "Exam session not found")
+        self._remember(session)
+        self.rehydrated += 1
+        return session
+
+    @staticmethod
+    async def _in_sync(session: ExamSession) -> bool:
+        row = await fetch_one('''
+            SELECT completed, current_question_id,
+                   (SELECT COUNT(*) FROM exam_answers WHERE session_id = ?) AS answered
+            FROM exam_sessions WHERE session_id = ?
+        ''', (session.session_id, session.session_id))
+        current_id = session.current.id if session.current is not None else None
+        return (row is not None and row["answered"] == session.answered
+                and bool(row["completed"]) == session.completed and row["current_question_id"] == current_id)
+
+    async def _rehydrate(self, session_id: str) -> Optional[ExamSession]:
+        row = await fetch_one("SELECT * FROM exam_sessions WHERE session_id = ?", (session_id,))
+        if row is None:
+            return None
+        session = ExamSession(session_id, row["user_id"], row["language"], row["start_difficulty"],
+                              row["num_questions"], row["started_at"])
+        answers = await fetch_all('''
+            SELECT a.question_id, a.is_correct, q.irt_a, q.irt_b, q.topic
+            FROM exam_answers a JOIN question_bank q ON q.id = a.question_id
+            WHERE a.session_id = ? ORDER BY a.question_number
+        ''', (session_id,))
+        for answer in answers:
+            session.asked.add(answer["question_id"])
+            session.responses.append((answer["irt_a"], answer["irt_b"], bool(answer["is_correct"])))
+            session.correct += 1 if answer["is_correct"] else 0
+            session.last_topic = answer["topic"]
+        session.ability = row["ability"]
+        session.completed = bool(row["completed"])
+        if not session.completed:
+            if self.bank.get(row["current_question_id"]) is None:
+                await self.refresh()
+            session.current = self.bank.get(row["current_question_id"])
+            if session.current is not None:
+                session.asked.add(session.current.id)
+        return session
+
+    def _next_item(self, session: ExamSession) -> Optional[BankItem]:
+        started = time.perf_counter()
+        item = self.bank.select(session.language, session.ability, session.asked, session.last_topic)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.selections += 1
+        self.select_ms_total += elapsed_ms
+        self.select_ms_max = max(self.select_ms_max, elapsed_ms)
+        self._maybe_top_up(session.language, band_for(session.ability))
+        if item is not None:
+            session.asked.add(item.id)
+        session.current = item
+        return item
+
+    async def _persist(self, fn: Callable, session_id: str):
+        """Commit a session write; on failure the cached copy, which ran ahead of it, is dropped"""
+        try:
+            await run_write_async(fn)
+        except Exception as e:
+            self._sessions.pop(session_id, None)
+            if not isinstance(e, sqlite3.IntegrityError):
+                logger.error(f"❌ Failed to persist exam {session_id}: {e}")
+            raise
+
+    async def start(self, language: str, difficulty: str, num_questions: int, user_id: Optional[int] = None,
+              refresh_bank: bool = False) -> Dict[str, Any]:
+        """Open an exam and return its first question.
+
+        `refresh_bank` asks for freshly generated items even when the band is
+        full: they are added in the background (at most once per cooldown)
+        and served once they land, never awaited here.
+        """
+        difficulty = difficulty.lower()
+        if difficulty not in DIFFICULTIES:
+            raise ExamError(400, f"difficulty must be one of {', '.join(DIFFICULTIES)}")
+        if not 1 <= num_questions <= EXAM_MAX_QUESTIONS:
+            raise ExamError(400, f"num_questions must be between 1 and {EXAM_MAX_QUESTIONS}")
+        if refresh_bank:
+            self._maybe_top_up(language, difficulty, force=True)
+        if not self.bank.has_language(language):
+            self._maybe_top_up(language, difficulty)
+            raise ExamError(503, f"No {language} questions in the bank yet", retry_after=EXAM_TOPUP_COOLDOWN_S)
+
+        session = ExamSession(f"exam_{uuid.uuid4().hex}", user_id, language, difficulty, num_questions)
+        item = self._next_item(session)
+        self._remember(session)
+
+        def job(conn):
+            conn.execute('''
+                INSERT INTO exam_sessions
+                (session_id, user_id, language, start_difficulty, num_questions, ability, current_question_id, started_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (session.session_id, user_id, language, difficulty, num_questions, session.ability,
+                  item.id, session.started_at))
+        await self._persist(job, session.session_id)
+        self.started += 1
+
+        return {
+            "session_id": session.session_id,
+            "question": item.public(),
+            "question_number": 1,
+            "total_questions": num_questions,
+            "current_difficulty": band_for(session.ability),
+        }
+
+    async def submit(self, session_id: str, question_number: int, user_answer: Optional[str],
+                     time_taken: Optional[float] = None) -> Dict[str, Any]:
+        """Score an answer, update the ability estimate and return the next question or the results"""
+        session = await self._session(session_id, fresh=True)
+        if session.completed:
+            await self._score_proctoring(session)
+            return session.results()
+        if question_number != session.answered + 1 or session.current is None:
+            raise ExamError(409, f"Expected an answer to question {session.answered + 1}")
+
+        item = session.current
+        letter = (user_answer or "").strip()[:1].upper()
+        is_correct = letter == item.correct_answer
+        session.responses.append((item.a, item.b, is_correct))
+        session.correct += 1 if is_correct else 0
+        session.last_topic = item.topic
+        session.ability = estimate_ability(session.responses, START_ABILITY[session.start_difficulty])
+
+        next_item = None
+        if session.answered < session.num_questions:
+            next_item = self._next_item(session)
+        session.completed = next_item is None
+        if session.completed:
+            session.current = None
+
+        ability, completed = session.ability, session.completed
+        next_id = next_item.id if next_item is not None else None
+
+        def job(conn):
+            # A plain INSERT, so a second answer to the same question fails instead of overwriting
+            conn.execute('''
+                INSERT INTO exam_answers
+                (session_id, question_number, question_id, user_answer, is_correct, time_taken, ability_after, answered_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (session_id, question_number, item.id, letter, is_correct, time_taken, ability, time.time()))
+            conn.execute('''
+                UPDATE exam_sessions
+                SET ability = ?, current_question_id = ?, completed = ?, finished_at = ?
+                WHERE session_id = ?
+            ''', (ability, next_id, completed, time.time() if completed else None, session_id))
+        try:
+            await self._persist(job, session_id)
+        except sqlite3.IntegrityError:
+            raise ExamError(409, f"Question {question_number} was already answered")
+        self.answered += 1
+        self.completed += 1 if completed else 0
+
+        feedback = {
+            "is_correct": is_correct,
+            "correct_answer": item.correct_answer,
+            "explanation": item.explanation,
+        }
+        if completed:
+            await self._score_proctoring(session)
+            return {**session.results(), **feedback}
+        return {
+            **feedback,
+            "exam_complete": False,
+            "session_id": session_id,
+            "question": next_item.public(),
+            "question_number": session.answered + 1,
+            "total_questions": session.num_questions,
+            "current_difficulty": band_for(session.ability),
+        }
+
+    async def _score_proctoring(self, session: ExamSession):
+        if self._cheating_score is not None:
+            session.cheating_score = await self._cheating_score(session.session_id)
+
+    async def stop(self):
+        for task in list(self._topping.values()):
+            task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.bank.stats(),
+            "sessions": len(self._sessions),
+            "started": self.started,
+            "answered": self.answered,
+            "completed": self.completed,
+            "rehydrated": self.rehydrated,
+            "resynced": self.resynced,
+            "evicted": self.evicted,
+            "select_ms_avg": round(self.select_ms_total / self.selections, 4) if self.selections else 0.0,
+            "select_ms_max": round(self.select_ms_max, 4),
+            "top_ups": self.top_ups,
+            "top_ups_running": len(self._topping),
+            "top_up_items": self.top_up_items,
+            "top_up_rejected": self.top_up_rejected,
+            "top_up_failures": self.top_up_failures,
+        }
@@ -0,0 +1,241 @@
+# Local fake of the Gemini REST API (generateContent and streamGenerateContent), a stand-in for
+# the real service in tests, load runs and offline development. Latency and
+# failure rate are configurable so timeouts and fallbacks can be exercised.
+# With --mcq it answers question-bank prompts with synthetic multiple-choice
+# items, including some near-duplicates and malformed entries.
+#
+#   cd Backend && python -m fakes.gemini_server --port 8765 --latency-ms 300
+#   GEMINI_API_KEY=fake GEMINI_API_ENDPOINT=http://127.0.0.1:8765 python backend.py
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+DEFAULT_QUESTIONS = [
+    "That sounds like a demanding project. Can you walk me through how you approached that problem?",
+    "Thanks for being candid. What would you do differently if you faced that situation again?",
+    "Interesting result. How did you measure whether that worked?",
+    "Teamwork clearly mattered there. What did you learn about working with your team from that experience?",
+]
+
+MCQ_CONCEPTS = [
+    "variable scope", "integer division", "string slicing", "list copying", "hash lookups",
+    "recursion depth", "exception handling", "iterator exhaustion", "operator precedence",
+    "boolean short-circuiting", "integer overflow", "reference equality", "closures",
+    "default arguments", "sorting stability", "memory allocation", "thread safety",
+    "immutable values", "type conversion", "loop bounds",
+]
+MCQ_TOPICS = ["syntax", "types", "functions", "collections", "memory", "concurrency", "errors", "algorithms"]
+
+
+class McqFactory:
+    """Synthetic question-bank batches, with some near-duplicates and malformed items"""
+
+    def __init__(self, duplicate_rate: float = 0.1, malformed_rate: float = 0.05, seed: int = 0):
+        self.duplicate_rate = duplicate_rate
+        self.malformed_rate = malformed_rate
+        self._issued: Dict[str, List[dict]] = {}
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+
+    def answer(self, prompt: str) -> str:
+        """A JSON array of synthetic items shaped like a question-bank prompt asks for"""
+        match = re.search(r"Generate (\d+) different (\w+) level multiple choice questions about (.+?)\.", prompt)
+        count, band, language = (int(match.group(1)), match.group(2), match.group(3)) if match else (1, "medium", "Python")
+        items = []
+        with self._lock:
+            issued = self._issued.setdefault(language, [])
+            for _ in range(count):
+                roll = self._random.random()
+                if roll < self.duplicate_rate and issued:
+                    # Same item reworded slightly, as a model repeating itself would
+                    item = dict(self._random.choice(issued))
+                    item["question"] = item["question"].replace("Consider", "Think about", 1).rstrip("?") + " here?"
+                elif roll < self.duplicate_rate + self.malformed_rate:
+                    item = {"question": "Incomplete item", "options": ["A) yes", "B) no"], "correctAnswer": "E"}
+                else:
+                    start, step, times = (self._random.randint(0, 99), self._random.randint(2, 9),
+                                          self._random.randint(3, 40))
+                    concept = self._random.choice(MCQ_CONCEPTS)
+                    answer = start + step * times
+                    wrong = self._random.sample([answer + d for d in (-step, step, 2 * step, -1, 1, 10)], 3)
+                    choices = [answer] + wrong
+                    self._random.shuffle(choices)
+                    item = {
+                        "question": f"Consider {concept} in {language}: a counter starts at {start} and a loop "
+                                    f"adds {step} to it {times} times. What is its final value?",
+                        "options": [f"{'ABCD'[i]}) {value}" for i, value in enumerate(choices)],
+                        "correctAnswer": "ABCD"[choices.index(answer)],
+                        "explanation": f"{start} + {step} * {times} = {answer}.",
+                        "difficulty": band,
+                        "topic": self._random.choice(MCQ_TOPICS),
+                    }
+                    issued.append(item)
+                items.append(item)
+        return "```json\n" + json.dumps(items, indent=2) + "\n```"
+
+
+class _GeminiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status: int, payload: dict):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the client gave up waiting
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _stream(self, text: str, chunk_delay: float):
+        """Reply as the REST transport streams: one JSON array, a few words per element"""
+        words = text.split(" ")
+        pieces = [" ".join(words[i:i + 3]) + (" " if i + 3 < len(words) else "") for i in range(0, len(words), 3)]
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for i, piece in enumerate(pieces):
+                element = {"candidates": [{"content": {"parts": [{"text": piece}], "role": "model"}, "index": 0}]}
+                if i == len(pieces) - 1:
+                    element["candidates"][0]["finishReason"] = "STOP"
+                self._write_chunk((("[" if i == 0 else ",") + json.dumps(element)).encode("utf-8"))
+                time.sleep(chunk_delay)
+            self._write_chunk(b"]")
+            self._write_chunk(b"")
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the client gave up waiting
+
+    def do_POST(self):
+        server: "FakeGeminiServer" = self.server
+        length = int(self.headers.get("Content-Length") or 0)
+        request = json.loads(self.rfile.read(length) or b"{}")
+        match = re.search(r"/models/([^/:]+):(generateContent|streamGenerateContent)", self.path)
+        if match is None:
+            self._reply(404, {"error": {"code": 404, "message": f"Unknown path {self.path}", "status": "NOT_FOUND"}})
+            return
+
+        prompt = " ".join(
+            part.get("text", "") for content in request.get("contents", []) for part in content.get("parts", [])
+        )
+        server.record(match.group(1), prompt)
+        time.sleep(server.delay())
+        if server.fail():
+            self._reply(503, {"error": {"code": 503, "message": "The model is overloaded.", "status": "UNAVAILABLE"}})
+            return
+
+        if match.group(2) == "streamGenerateContent":
+            self._stream(server.answer(prompt), server.chunk_delay_ms / 1000.0)
+            return
+        self._reply(200, {
+            "candidates": [{
+                "content": {"parts": [{"text": server.answer(prompt)}], "role": "model"},
+                "finishReason": "STOP",
+                "index": 0,
+            }],
+            "usageMetadata": {"promptTokenCount": len(prompt.split()), "candidatesTokenCount": 12},
+        })
+
+
+class FakeGeminiServer(ThreadingHTTPServer):
+    """In-process Gemini stand-in; use as a context manager in tests"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency_ms: float = 0.0,
+                 jitter_ms: float = 0.0, error_rate: float = 0.0, answers: Optional[List[str]] = None,
+                 chunk_delay_ms: float = 40.0, mcq: bool = False,
+                 duplicate_rate: float = 0.1, malformed_rate: float = 0.05):
+        super().__init__((host, port), _GeminiHandler)
+        self.latency_ms = latency_ms
+        self.chunk_delay_ms = chunk_delay_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.answers = answers or DEFAULT_QUESTIONS
+        self.mcq = mcq
+        self._mcq = McqFactory(duplicate_rate, malformed_rate)
+        self.prompts: List[str] = []
+        self.models: List[str] = []
+        self._lock = threading.Lock()
+        self._random = random.Random(0)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def endpoint(self) -> str:
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+    @property
+    def requests(self) -> int:
+        return len(self.prompts)
+
+    def record(self, model: str, prompt: str):
+        with self._lock:
+            self.models.append(model)
+            self.prompts.append(prompt)
+
+    def delay(self) -> float:
+        with self._lock:
+            jitter = self._random.uniform(0, self.jitter_ms) if self.jitter_ms else 0.0
+        return max(0.0, self.latency_ms + jitter) / 1000.0
+
+    def fail(self) -> bool:
+        with self._lock:
+            return self.error_rate > 0 and self._random.random() < self.error_rate
+
+    def answer(self, prompt: str) -> str:
+        if self.mcq:
+            return self.mcq_answer(prompt)
+        return self.answers[len(prompt) % len(self.answers)]
+
+    def mcq_answer(self, prompt: str) -> str:
+        return self._mcq.answer(prompt)
+
+    def start(self) -> "FakeGeminiServer":
+        self._thread = threading.Thread(target=self.serve_forever, name="fake-gemini", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local fake Gemini API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--chunk-delay-ms", type=float, default=40.0)
+    parser.add_argument("--mcq", action="store_true", help="answer with multiple-choice question batches")
+    args = parser.parse_args()
+
+    server = FakeGeminiServer(args.host, args.port, args.latency_ms, args.jitter_ms, args.error_rate,
+                              chunk_delay_ms=args.chunk_delay_ms, mcq=args.mcq)
+    print(f"🤖 Fake Gemini API listening on {server.endpoint}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
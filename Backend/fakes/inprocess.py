@@ -0,0 +1,339 @@
+# In-process stand-ins for the external services the backend calls:
+# google.generativeai, whisper, gTTS and smtplib. Each one draws its latency
+# from a log-normal distribution (a median and a spread) and fails at a
+# configurable rate, so load runs can exercise timeouts, the circuit breaker,
+# outbox retries and fallbacks with no network, GPU or mail relay. Profiles
+# travel through FAKE_<SERVICE>_* environment variables so Whisper's worker
+# processes see the same settings as the parent.
+#
+#   from fakes import inprocess
+#   inprocess.install({"genai": inprocess.LatencyProfile(800, 0.4, 0.01)})  # before importing backend
+import io
+import os
+import sys
+import math
+import time
+import types
+import wave
+import random
+import smtplib
+import threading
+import zlib
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from fakes.gemini_server import McqFactory
+
+SERVICES = ("genai", "whisper", "tts", "smtp")
+
+FOLLOW_UPS = [
+    "That sounds like a demanding project. Can you walk me through how you approached that problem?",
+    "Thanks for being candid. What would you do differently if you faced that situation again?",
+    "Interesting result. How did you measure whether that worked?",
+    "Teamwork clearly mattered there. What did you learn about working with your team from that experience?",
+    "You mentioned a tight deadline. How did you decide what to cut and what to keep?",
+    "What was the hardest technical decision in that project, and how did you make it?",
+    "How did you handle disagreement with a colleague about the right approach?",
+    "Tell me more about your role specifically. What did you own end to end?",
+    "If a new teammate joined that project tomorrow, what would you want them to know first?",
+    "What feedback did you get afterwards, and what did you change because of it?",
+]
+
+ANSWERS = [
+    "I led a team of five engineers building a payments platform, and we shipped it on time despite a late scope change.",
+    "My biggest strength is breaking ambiguous problems into small steps and checking each one with real data.",
+    "We had a production outage during a launch, so I coordinated the rollback and wrote the postmortem.",
+    "I would start by talking to the users, then prototype quickly and measure whether it actually helped.",
+    "Honestly I underestimated the migration, so now I always plan a dry run on a copy of production data.",
+    "I keep a short list of priorities each morning and protect two hours a day for focused work.",
+    "In five years I want to be leading a small team and still writing code for the hardest parts.",
+    "Yes, I learned to ask for help earlier instead of trying to solve everything alone.",
+]
+
+
+# ==================== LATENCY ====================
+class LatencyProfile:
+    """Log-normal latency around `median_ms` with shape `spread`, failing `error_rate` of calls"""
+
+    def __init__(self, median_ms: float = 0.0, spread: float = 0.0, error_rate: float = 0.0, seed: int = 0):
+        self.median_ms = max(0.0, median_ms)
+        self.spread = max(0.0, spread)
+        self.error_rate = min(max(0.0, error_rate), 1.0)
+        self.seed = seed
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def delay(self) -> float:
+        with self._lock:
+            factor = math.exp(self.spread * self._random.gauss(0.0, 1.0)) if self.spread else 1.0
+        return self.median_ms * factor / 1000.0
+
+    def fails(self) -> bool:
+        with self._lock:
+            return self.error_rate > 0 and self._random.random() < self.error_rate
+
+    def choice(self, items: List[str]) -> str:
+        with self._lock:
+            return self._random.choice(items)
+
+    def to_env(self, service: str):
+        prefix = f"FAKE_{service.upper()}_"
+        os.environ[prefix + "MEDIAN_MS"] = str(self.median_ms)
+        os.environ[prefix + "SPREAD"] = str(self.spread)
+        os.environ[prefix + "ERROR_RATE"] = str(self.error_rate)
+        os.environ[prefix + "SEED"] = str(self.seed)
+
+    @classmethod
+    def from_env(cls, service: str) -> "LatencyProfile":
+        prefix = f"FAKE_{service.upper()}_"
+        return cls(float(os.getenv(prefix + "MEDIAN_MS", "0")), float(os.getenv(prefix + "SPREAD", "0")),
+                   float(os.getenv(prefix + "ERROR_RATE", "0")), int(os.getenv(prefix + "SEED", "0")))
+
+    def to_dict(self) -> Dict[str, float]:
+        return {"median_ms": self.median_ms, "spread": self.spread, "error_rate": self.error_rate}
+
+
+_profiles: Dict[str, LatencyProfile] = {}
+_profiles_lock = threading.Lock()
+calls = {service: 0 for service in SERVICES}
+errors = {service: 0 for service in SERVICES}
+
+
+def profile(service: str) -> LatencyProfile:
+    """This process's profile for a service, read from the environment on first use"""
+    with _profiles_lock:
+        if service not in _profiles:
+            _profiles[service] = LatencyProfile.from_env(service)
+        return _profiles[service]
+
+
+def _call(service: str, timeout: Optional[float] = None, scale: float = 1.0):
+    """Spend one call's latency, then raise if this call is drawn to fail"""
+    current = profile(service)
+    _count(calls, service)
+    delay = current.delay() * scale
+    if timeout is not None and delay > timeout:
+        time.sleep(timeout)
+        _count(errors, service)
+        raise FakeDeadlineExceeded(f"504 Deadline of {timeout:.1f}s exceeded")
+    time.sleep(delay)
+    if current.fails():
+        _count(errors, service)
+        raise FakeServiceUnavailable(f"503 {service} is unavailable")
+
+
+def _count(counter: Dict[str, int], service: str):
+    with _profiles_lock:
+        counter[service] += 1
+
+
+class FakeServiceUnavailable(Exception):
+    pass
+
+
+class FakeDeadlineExceeded(Exception):
+    pass
+
+
+# ==================== GEMINI ====================
+class _Chunk:
+    __slots__ = ("text",)
+
+    def __init__(self, text: str):
+        self.text = text
+
+
+class _StreamedResponse:
+    def __init__(self, text: str, chunk_delay: float):
+        self.text = text
+        self._chunk_delay = chunk_delay
+
+    def __iter__(self):
+        words = self.text.split(" ")
+        for i in range(0, len(words), 3):
+            if i:
+                time.sleep(self._chunk_delay)
+            yield _Chunk(" ".join(words[i:i + 3]) + (" " if i + 3 < len(words) else ""))
+
+
+_mcq = McqFactory()
+
+
+class FakeGenerativeModel:
+    """google.generativeai.GenerativeModel with canned interview follow-ups and MCQ batches"""
+
+    def __init__(self, model_name: str = "gemini-fake", generation_config=None, **kwargs):
+        self.model_name = model_name
+        self.generation_config = generation_config
+
+    def generate_content(self, prompt, stream: bool = False, request_options: Optional[dict] = None, **kwargs):
+        timeout = (request_options or {}).get("timeout")
+        _call("genai", timeout)
+        text = str(prompt)
+        if "multiple choice" in text:
+            reply = _mcq.answer(text)
+        else:
+            reply = FOLLOW_UPS[zlib.crc32(text.encode("utf-8")) % len(FOLLOW_UPS)]
+        if stream:
+            return _StreamedResponse(reply, float(os.getenv("FAKE_GENAI_CHUNK_MS", "30")) / 1000.0)
+        return _Chunk(reply)
+
+
+def genai_module() -> types.ModuleType:
+    module = types.ModuleType("google.generativeai")
+    module.configure = lambda **kwargs: None
+    module.GenerativeModel = FakeGenerativeModel
+    return module
+
+
+# ==================== WHISPER ====================
+class FakeWhisperModel:
+    def __init__(self, name: str):
+        self.name = name
+
+    def transcribe(self, audio, **kwargs) -> Dict[str, str]:
+        _call("whisper")
+        return {"text": profile("whisper").choice(ANSWERS)}
+
+
+def whisper_module() -> types.ModuleType:
+    module = types.ModuleType("whisper")
+    module.load_model = FakeWhisperModel
+    return module
+
+
+def init_worker(model_name: str):
+    """Stands in for transcription._init_worker inside each ASR worker process"""
+    import transcription
+    sys.modules["whisper"] = whisper_module()
+    transcription._model_name = model_name
+    transcription._model = FakeWhisperModel(model_name)
+
+
+def transcribe_batch(clips: List[np.ndarray], language: str) -> List[str]:
+    """Stands in for transcription._transcribe_batch: one decode per batch, slightly longer per extra clip"""
+    _call("whisper", scale=1.0 + 0.2 * (len(clips) - 1))
+    return [profile("whisper").choice(ANSWERS) if clip.size else "" for clip in clips]
+
+
+# ==================== gTTS ====================
+def tone_wav(seconds: float, sample_rate: int = 16000) -> bytes:
+    """Syllable-like bursts of a voiced tone, enough for viseme extraction to chew on"""
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    envelope = np.clip(np.sin(2 * np.pi * 4 * t), 0, None)
+    pcm = (0.3 * envelope * np.sin(2 * np.pi * 180 * t) * 32767).astype(np.int16)
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as out:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(sample_rate)
+        out.writeframes(pcm.tobytes())
+    return buffer.getvalue()
+
+
+class FakeGTTS:
+    """gtts.gTTS writing WAV instead of MP3 (about 0.3 s per word), so no codec is needed"""
+
+    def __init__(self, text: str, lang: str = "en", tld: str = "com", **kwargs):
+        self.text = text
+
+    def write_to_fp(self, fp):
+        _call("tts", scale=max(1.0, len(self.text) / 100.0))
+        fp.write(tone_wav(min(30.0, 0.3 * max(1, len(self.text.split())))))
+
+
+# ==================== SMTP ====================
+class FakeMailbox:
+    """Every message the fake relay accepted, by recipient"""
+
+    def __init__(self):
+        self._messages: Dict[str, List[str]] = {}
+        self._lock = threading.Lock()
+
+    def deliver(self, recipient: str, body: str):
+        with self._lock:
+            self._messages.setdefault(recipient.lower(), []).append(body)
+
+    def latest(self, recipient: str) -> Optional[str]:
+        with self._lock:
+            messages = self._messages.get(recipient.lower())
+            return messages[-1] if messages else None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(messages) for messages in self._messages.values())
+
+
+mailbox = FakeMailbox()
+
+
+class FakeSMTP:
+    """smtplib.SMTP that delivers into `mailbox`; a failed send drops the connection"""
+
+    def __init__(self, host: str = "", port: int = 0, timeout: float = 30.0, **kwargs):
+        self.timeout = timeout
+        self._open = True
+
+    def starttls(self, *args, **kwargs):
+        return 220, b"ready"
+
+    def login(self, user: str, password: str):
+        return 235, b"ok"
+
+    def noop(self):
+        if not self._open:
+            raise smtplib.SMTPServerDisconnected("connection closed")
+        return 250, b"ok"
+
+    def send_message(self, message, *args, **kwargs):
+        if not self._open:
+            raise smtplib.SMTPServerDisconnected("connection closed")
+        try:
+            _call("smtp", self.timeout)
+        except (FakeServiceUnavailable, FakeDeadlineExceeded) as e:
+            self._open = False
+            raise smtplib.SMTPServerDisconnected(str(e))
+        parts = message.get_payload() if message.is_multipart() else [message]
+        body = "".join(part.get_payload(decode=True).decode("utf-8", "replace") for part in parts)
+        for recipient in message.get_all("To", []):
+            mailbox.deliver(recipient, body)
+        return {}
+
+    def quit(self):
+        self._open = False
+
+    def close(self):
+        self._open = False
+
+
+def smtplib_module() -> types.ModuleType:
+    module = types.ModuleType("smtplib")
+    module.__dict__.update({name: value for name, value in vars(smtplib).items() if not name.startswith("__")})
+    module.SMTP = FakeSMTP
+    return module
+
+
+# ==================== INSTALL ====================
+def install(profiles: Optional[Dict[str, LatencyProfile]] = None):
+    """Swap the fakes in; call before importing backend so its imports bind to them"""
+    for service, current in (profiles or {}).items():
+        current.to_env(service)
+        with _profiles_lock:
+            _profiles[service] = current
+
+    sys.modules["google.generativeai"] = genai_module()
+    sys.modules["whisper"] = whisper_module()
+
+    import voice
+    import email_outbox
+    import transcription
+    voice.gTTS = FakeGTTS
+    email_outbox.smtplib = smtplib_module()
+    transcription._init_worker = init_worker
+    transcription._transcribe_batch = transcribe_batch
+
+
+def stats() -> Dict[str, Dict[str, int]]:
+    """Calls and injected failures seen in this process (ASR ones happen in its workers)"""
+    return {service: {"calls": calls[service], "errors": errors[service]} for service in SERVICES}
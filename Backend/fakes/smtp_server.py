@@ -0,0 +1,126 @@
+# Local debugging SMTP server, a stand-in for the real mail relay in tests
+# and local runs. It speaks just enough SMTP for smtplib (EHLO/HELO, AUTH,
+# MAIL, RCPT, DATA, RSET, NOOP, QUIT), keeps every message in memory and can
+# print them, like the old `python -m smtpd -n -c DebuggingServer`.
+#
+#   cd Backend && python -m fakes.smtp_server --port 1025
+#   SMTP_SERVER=localhost SMTP_PORT=1025 SMTP_USE_TLS=false python backend.py
+import argparse
+import email
+import socketserver
+import threading
+from typing import List, Optional
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def _reply(self, line: str):
+        self.wfile.write((line + "\r\n").encode("utf-8"))
+
+    def handle(self):
+        server: "DebuggingSMTPServer" = self.server
+        self._reply("220 localhost debugging SMTP ready")
+        sender, recipients = None, []
+        while True:
+            raw = self.rfile.readline()
+            if not raw:
+                return
+            line = raw.decode("utf-8", errors="replace").rstrip("\r\n")
+            verb = line.split(" ", 1)[0].upper()
+
+            if verb == "EHLO":
+                self._reply("250-localhost")
+                self._reply("250-AUTH PLAIN")
+                self._reply("250 8BITMIME")
+            elif verb == "HELO":
+                self._reply("250 localhost")
+            elif verb == "AUTH":
+                self._reply("235 Authentication successful")
+            elif verb == "MAIL":
+                sender, recipients = line.split(":", 1)[1].strip().strip("<>"), []
+                self._reply("250 OK")
+            elif verb == "RCPT":
+                recipients.append(line.split(":", 1)[1].strip().strip("<>"))
+                self._reply("250 OK")
+            elif verb == "DATA":
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+                lines = []
+                while True:
+                    data_line = self.rfile.readline()
+                    if not data_line or data_line in (b".\r\n", b".\n"):
+                        break
+                    if data_line.startswith(b".."):
+                        data_line = data_line[1:]
+                    lines.append(data_line)
+                server.deliver(sender, recipients, b"".join(lines))
+                self._reply("250 OK: queued")
+            elif verb == "RSET":
+                sender, recipients = None, []
+                self._reply("250 OK")
+            elif verb == "NOOP":
+                self._reply("250 OK")
+            elif verb == "QUIT":
+                self._reply("221 Bye")
+                return
+            else:
+                self._reply("502 Command not implemented")
+
+
+class DebuggingSMTPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    """In-memory SMTP sink; use as a context manager in tests"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, echo: bool = False):
+        super().__init__((host, port), _SMTPHandler)
+        self.echo = echo
+        self.messages: List[email.message.Message] = []
+        self.connections = 0
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def process_request(self, request, client_address):
+        with self._lock:
+            self.connections += 1
+        super().process_request(request, client_address)
+
+    def deliver(self, sender: str, recipients: List[str], data: bytes):
+        message = email.message_from_bytes(data)
+        with self._lock:
+            self.messages.append(message)
+        if self.echo:
+            print(f"---------- MESSAGE FROM {sender} TO {', '.join(recipients)} ----------")
+            print(data.decode("utf-8", errors="replace"))
+
+    def start(self) -> "DebuggingSMTPServer":
+        self._thread = threading.Thread(target=self.serve_forever, name="debug-smtp", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local debugging SMTP server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1025)
+    args = parser.parse_args()
+
+    server = DebuggingSMTPServer(args.host, args.port, echo=True)
+    print(f"📧 Debugging SMTP server listening on {args.host}:{server.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
@@ -0,0 +1,265 @@
+import os
+import sys
+import time
+import asyncio
+import logging
+import threading
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger("backend")
+
+SLOW_REQUEST_MS = int(os.getenv("SLOW_REQUEST_MS", "1000"))
+FLIGHT_RECORDER_SIZE = int(os.getenv("FLIGHT_RECORDER_SIZE", "200"))
+PROFILE_MAX_SECONDS = int(os.getenv("PROFILE_MAX_SECONDS", "60"))
+
+# Leaf frames of threads parked waiting for work; left out of profiles unless asked for
+IDLE_FRAMES = frozenset({
+    "threading:Condition.wait",
+    "concurrent.futures.thread:_worker",
+    "selectors:EpollSelector.select",
+    "selectors:KqueueSelector.select",
+    "selectors:PollSelector.select",
+    "selectors:SelectSelector.select",
+})
+
+
+# ==================== REQUEST TRACES ====================
+class RequestTrace:
+    """Stage timings for one request, filled in by whatever runs on its behalf"""
+
+    __slots__ = ("method", "path", "started", "session_id", "stages")
+
+    def __init__(self, method: str, path: str):
+        self.method = method
+        self.path = path
+        self.started = time.perf_counter()
+        self.session_id: Optional[str] = None
+        self.stages: Dict[str, List[float]] = {}
+
+    def add(self, stage: str, seconds: float):
+        entry = self.stages.get(stage)
+        if entry is None:
+            self.stages[stage] = [seconds, 1]
+        else:
+            entry[0] += seconds
+            entry[1] += 1
+
+
+_trace: ContextVar[Optional[RequestTrace]] = ContextVar("flight_recorder_trace", default=None)
+
+
+def note(stage: str, seconds: float):
+    """Charge time to the current request's trace; a no-op outside a request"""
+    trace = _trace.get()
+    if trace is not None:
+        trace.add(stage, seconds)
+
+
+@contextmanager
+def timed(stage: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        note(stage, time.perf_counter() - started)
+
+
+def tag_session(session_id: Optional[str]):
+    """Attach the interview or exam session to the current request's trace"""
+    trace = _trace.get()
+    if trace is not None and session_id:
+        trace.session_id = session_id
+
+
+# ==================== FLIGHT RECORDER ====================
+class FlightRecorder:
+    """The last `capacity` requests that took longer than `threshold_ms`.
+
+    Timing is recorded for every request, but only slow ones are kept, each
+    with the time its stages took: pipeline stages, Gemini, Whisper, pooled
+    reads, writer commits and JWT decoding. Stages nest (generate includes
+    llm, which may include a db_read), so they overlap rather than sum to
+    the total. Work handed to a plain executor does not inherit the request
+    context and is only visible through the stage that awaited it.
+    """
+
+    def __init__(self, threshold_ms: int = SLOW_REQUEST_MS, capacity: int = FLIGHT_RECORDER_SIZE):
+        self.threshold = max(0, threshold_ms) / 1000.0
+        self._slow: deque = deque(maxlen=max(1, capacity))
+        self.requests = 0
+        self.slow = 0
+
+    def begin(self, method: str, path: str):
+        trace = RequestTrace(method, path)
+        return trace, _trace.set(trace)
+
+    def end(self, trace: RequestTrace, token, status: int, path_params: Optional[Dict[str, Any]] = None):
+        _trace.reset(token)
+        elapsed = time.perf_counter() - trace.started
+        self.requests += 1
+        if elapsed < self.threshold:
+            return
+        self.slow += 1
+        session_id = trace.session_id or (path_params or {}).get("session_id")
+        self._slow.append({
+            "at": time.time() - elapsed,
+            "method": trace.method,
+            "path": trace.path,
+            "status": status,
+            "duration_ms": round(elapsed * 1000, 1),
+            "session_id": session_id,
+            "stages": {
+                stage: {"ms": round(total * 1000, 1), "count": count}
+                for stage, (total, count) in sorted(trace.stages.items(), key=lambda item: -item[1][0])
+            },
+        })
+
+    def recent(self, limit: Optional[int] = None, path: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Slow requests, newest first, optionally only those under a path prefix"""
+        entries = [entry for entry in reversed(self._slow) if path is None or entry["path"].startswith(path)]
+        return entries[:limit] if limit is not None else entries
+
+    def clear(self):
+        self._slow.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "threshold_ms": int(self.threshold * 1000),
+            "capacity": self._slow.maxlen,
+            "held": len(self._slow),
+            "requests": self.requests,
+            "slow": self.slow,
+        }
+
+
+class FlightRecorderMiddleware:
+    """ASGI middleware that opens a trace per HTTP request and closes it after the last body chunk.
+
+    Plain ASGI rather than BaseHTTPMiddleware so streamed responses (SSE
+    turns, transcript exports) are timed to their end and the endpoint
+    runs in the task that holds the trace.
+    """
+
+    def __init__(self, app, recorder: FlightRecorder):
+        self.app = app
+        self.recorder = recorder
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace, token = self.recorder.begin(scope["method"], scope["path"])
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.recorder.end(trace, token, status, scope.get("path_params"))
+
+
+# ==================== SAMPLING PROFILER ====================
+class ProfilerBusy(Exception):
+    """Raised when a profile is requested while another one is running"""
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{frame.f_globals.get('__name__', '?')}:{getattr(code, 'co_qualname', code.co_name)}"
+
+
+class SamplingProfiler:
+    """Wall-clock sampler over every thread in this process, in collapsed-stack form.
+
+    A daemon thread wakes every `interval` seconds and walks
+    sys._current_frames(). No profile or trace hook is installed, so code
+    runs at full speed between ticks and the cost is one stack walk per
+    thread per tick. Output is one `thread;outer;...;inner count`
+    line per distinct stack, the input flamegraph.pl and speedscope take.
+    ASR and viseme worker processes are not sampled.
+    """
+
+    def __init__(self, interval: float = 0.01, include_idle: bool = False):
+        self.interval = max(0.001, interval)
+        self.include_idle = include_idle
+        self.samples = 0
+        self._stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _sample(self, own: int, names: Dict[int, str]):
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_name(frame))
+                frame = frame.f_back
+            if not stack or (not self.include_idle and stack[0] in IDLE_FRAMES):
+                continue
+            stack.append(names.get(ident, f"thread-{ident}").replace(";", ":").replace(" ", "_"))
+            stack.reverse()
+            self._stacks[";".join(stack)] += 1
+        self.samples += 1
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            self._sample(own, names)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="flight-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    @property
+    def distinct_stacks(self) -> int:
+        return len(self._stacks)
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self._stacks.most_common())
+
+
+class ProfilerSession:
+    """Runs at most one SamplingProfiler at a time, for a bounded window"""
+
+    def __init__(self, max_seconds: int = PROFILE_MAX_SECONDS):
+        self.max_seconds = max(1, max_seconds)
+        self.running: Optional[SamplingProfiler] = None
+        self.runs = 0
+
+    async def profile(self, seconds: float, interval: float = 0.01, include_idle: bool = False) -> SamplingProfiler:
+        if self.running is not None:
+            raise ProfilerBusy("A profile is already being recorded")
+        seconds = min(max(0.1, seconds), self.max_seconds)
+        profiler = SamplingProfiler(interval, include_idle)
+        self.running = profiler
+        profiler.start()
+        logger.info(f"🔬 Sampling profiler on for {seconds:g}s every {profiler.interval * 1000:g} ms")
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, profiler.stop)
+            self.running = None
+            self.runs += 1
+        logger.info(f"🔬 Sampling profiler off: {profiler.samples} samples, {profiler.distinct_stacks} stacks")
+        return profiler
+
+    def stats(self) -> Dict[str, Any]:
+        return {"running": self.running is not None, "runs": self.runs, "max_seconds": self.max_seconds}
@@ -0,0 +1,335 @@
+import os
+import json
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+from circuit_breaker import CircuitBreaker
+from flight_recorder import note
+from metrics import STAGE_SECONDS, TIMEOUTS
+from pipeline import env_int
+
+logger = logging.getLogger("backend")
+
+_llm_seconds = STAGE_SECONDS.labels("llm")
+_first_chunk_seconds = STAGE_SECONDS.labels("llm_first_chunk")
+
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.0-flash-exp")
+LLM_MAX_CONCURRENCY = env_int("LLM_MAX_CONCURRENCY", 16)
+# Latency budget for the LLM part of an interview turn; past it the turn falls back
+LLM_TURN_SLO_MS = env_int("LLM_TURN_SLO_MS", 5000)
+# Calls slower than this count against the breaker even when they succeed
+LLM_SLOW_CALL_MS = env_int("LLM_SLOW_CALL_MS", LLM_TURN_SLO_MS * 6 // 10)
+# Hedge delay before enough samples exist for a p95, and its floor
+LLM_HEDGE_DELAY_MS = env_int("LLM_HEDGE_DELAY_MS", 1500)
+LLM_HEDGE_MIN_DELAY_MS = env_int("LLM_HEDGE_MIN_DELAY_MS", 150)
+# At most this share of calls may send a hedge (percent)
+LLM_HEDGE_BUDGET_PCT = env_int("LLM_HEDGE_BUDGET_PCT", 10)
+
+
+def configure_gemini(api_key: str, endpoint: Optional[str] = None):
+    """Configure the SDK; an endpoint such as http://127.0.0.1:8765 switches to REST (see fakes/gemini_server.py)"""
+    import google.generativeai as genai
+    if endpoint:
+        genai.configure(api_key=api_key, transport="rest", client_options={"api_endpoint": endpoint})
+    else:
+        genai.configure(api_key=api_key)
+
+
+class LatencyWindow:
+    """Recent successful call latencies, for percentile estimates"""
+
+    def __init__(self, size: int = 200):
+        self._samples: deque = deque(maxlen=size)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def add(self, seconds: float):
+        self._samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class LLMClient:
+    """Shared Gemini client for every interview turn.
+
+    One GenerativeModel is built per (model, generation config) and reused.
+    Blocking SDK calls run on a dedicated pool sized to the concurrency cap,
+    each with a transport deadline so a call abandoned by its caller frees
+    its thread. Identical prompts already in flight are coalesced onto a
+    single request; it is cancelled once every caller has given up.
+
+    Tail latency is bounded two ways. A call still running after the
+    recent p95 gets one hedged duplicate (within a budget), and the first
+    answer wins. A circuit breaker trips on errors or slow calls, and while
+    it is open `generate` raises CircuitOpenError at once so callers can
+    use their local fallback.
+    """
+
+    def __init__(
+        self,
+        model_name: str = GEMINI_MODEL,
+        timeout_s: float = LLM_TURN_SLO_MS / 1000.0,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        hedge_delay_ms: int = LLM_HEDGE_DELAY_MS,
+        hedge_budget_pct: int = LLM_HEDGE_BUDGET_PCT,
+    ):
+        self.model_name = model_name
+        self.timeout = timeout_s
+        self.max_concurrency = max(1, max_concurrency)
+        self.hedge_delay = hedge_delay_ms / 1000.0
+        self.hedge_budget = max(0, hedge_budget_pct) / 100.0
+        self.breaker = CircuitBreaker("gemini", slow_call_s=LLM_SLOW_CALL_MS / 1000.0)
+        self.latencies = LatencyWindow()
+        self.executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="llm")
+        self._models: Dict[Tuple[str, str], Any] = {}
+        self._models_lock = threading.Lock()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._inflight: Dict[Tuple[str, str, str], list] = {}
+        self.active = 0
+        self.calls = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.streams = 0
+        self.requests = 0
+        self.coalesced = 0
+        self.cancelled = 0
+        self.timeouts = 0
+        self.errors = 0
+
+    def model(self, model_name: Optional[str] = None, generation_config: Optional[Dict[str, Any]] = None):
+        """The cached GenerativeModel for this configuration"""
+        import google.generativeai as genai
+        key = (model_name or self.model_name, json.dumps(generation_config or {}, sort_keys=True))
+        with self._models_lock:
+            model = self._models.get(key)
+            if model is None:
+                model = genai.GenerativeModel(key[0], generation_config=generation_config)
+                self._models[key] = model
+            return model
+
+    async def generate(
+        self,
+        prompt: str,
+        model_name: Optional[str] = None,
+        generation_config: Optional[Dict[str, Any]] = None,
+        timeout: Optional[float] = None,
+    ) -> str:
+        """Response text for a prompt.
+
+        Raises asyncio.TimeoutError after `timeout` seconds and
+        CircuitOpenError without calling out while the breaker is open.
+        """
+        key = (model_name or self.model_name, json.dumps(generation_config or {}, sort_keys=True), prompt)
+        entry = self._inflight.get(key)
+        if entry is None:
+            self.breaker.before_call()
+            task = asyncio.ensure_future(self._hedged(prompt, model_name, generation_config, timeout or self.timeout))
+            entry = [task, 0]
+            self._inflight[key] = entry
+            task.add_done_callback(lambda _: self._inflight.pop(key, None) if self._inflight.get(key) is entry else None)
+        else:
+            self.coalesced += 1
+
+        task = entry[0]
+        entry[1] += 1
+        timed_out = False
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), timeout or self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            TIMEOUTS.labels("llm").inc()
+            timed_out = True
+            raise
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0 and not task.done():
+                # Nobody is waiting for this answer any more
+                task.cancel()
+                self.cancelled += 1
+                if timed_out:
+                    self.breaker.record_failure()
+                else:
+                    # Dropped by the caller (e.g. a stale speculation), not a provider fault
+                    self.breaker.record_abandoned()
+
+    def _hedge_after(self) -> Optional[float]:
+        """Seconds to wait before hedging, or None when hedging is off or over budget"""
+        if self.hedge_budget <= 0 or self.hedges >= self.hedge_budget * self.calls:
+            return None
+        p95 = self.latencies.percentile(0.95) if len(self.latencies) >= 20 else None
+        return max(LLM_HEDGE_MIN_DELAY_MS / 1000.0, p95 if p95 is not None else self.hedge_delay)
+
+    async def _hedged(self, prompt: str, model_name: Optional[str],
+                      generation_config: Optional[Dict[str, Any]], timeout: float) -> str:
+        """One logical call: the primary request plus at most one hedge, outcome fed to the breaker"""
+        self.calls += 1
+        started = time.monotonic()
+        attempts = [asyncio.ensure_future(self._call(prompt, model_name, generation_config, timeout))]
+        try:
+            delay = self._hedge_after()
+            if delay is not None:
+                done, _ = await asyncio.wait(attempts, timeout=delay)
+                if not done and self._hedge_after() is not None:
+                    self.hedges += 1
+                    remaining = max(0.001, timeout - (time.monotonic() - started))
+                    attempts.append(asyncio.ensure_future(self._call(prompt, model_name, generation_config, remaining)))
+
+            pending = set(attempts)
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for attempt in done:
+                    if attempt.exception() is None:
+                        if attempt is not attempts[0]:
+                            self.hedge_wins += 1
+                        latency = time.monotonic() - started
+                        self.latencies.add(latency)
+                        _llm_seconds.observe(latency)
+                        note("llm", latency)
+                        self.breaker.record_success(latency)
+                        return attempt.result()
+                    error = attempt.exception()
+            raise error
+        except asyncio.CancelledError:
+            # Outcome is recorded by generate(), which knows why it was cancelled
+            raise
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        finally:
+            for attempt in attempts:
+                if not attempt.done():
+                    attempt.cancel()
+
+    async def _call(self, prompt: str, model_name: Optional[str],
+                    generation_config: Optional[Dict[str, Any]], timeout: float) -> str:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self._semaphore:
+            self.requests += 1
+            self.active += 1
+            try:
+                model = self.model(model_name, generation_config)
+                loop = asyncio.get_running_loop()
+                # A call cancelled while still queued on the pool never starts
+                return await loop.run_in_executor(self.executor, self._generate_blocking, model, prompt, timeout)
+            except Exception:
+                self.errors += 1
+                raise
+            finally:
+                self.active -= 1
+
+    async def stream(
+        self,
+        prompt: str,
+        model_name: Optional[str] = None,
+        generation_config: Optional[Dict[str, Any]] = None,
+        timeout: Optional[float] = None,
+    ) -> AsyncIterator[str]:
+        """Yield response text as it is generated.
+
+        `timeout` bounds the wait for each chunk. The breaker sees the time to
+        first chunk; streams are neither coalesced nor hedged. Close the
+        iterator (aclose) to abandon the call early.
+        """
+        self.breaker.before_call()
+        timeout = timeout or self.timeout
+        loop = asyncio.get_running_loop()
+        chunks: asyncio.Queue = asyncio.Queue()
+        stop = threading.Event()
+        finished = object()
+
+        def produce(model):
+            try:
+                response = model.generate_content(
+                    prompt, stream=True, request_options={"timeout": timeout, "retry": None}
+                )
+                for chunk in response:
+                    if stop.is_set():
+                        return
+                    loop.call_soon_threadsafe(chunks.put_nowait, chunk.text)
+                loop.call_soon_threadsafe(chunks.put_nowait, finished)
+            except Exception as e:
+                loop.call_soon_threadsafe(chunks.put_nowait, e)
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self._semaphore:
+            self.calls += 1
+            self.requests += 1
+            self.streams += 1
+            self.active += 1
+            started = time.monotonic()
+            outcome_recorded = False
+            try:
+                loop.run_in_executor(self.executor, produce, self.model(model_name, generation_config))
+                while True:
+                    try:
+                        item = await asyncio.wait_for(chunks.get(), timeout)
+                    except asyncio.TimeoutError:
+                        self.timeouts += 1
+                        TIMEOUTS.labels("llm").inc()
+                        raise
+                    if item is finished:
+                        break
+                    if isinstance(item, Exception):
+                        self.errors += 1
+                        raise item
+                    if not outcome_recorded:
+                        outcome_recorded = True
+                        first_chunk = time.monotonic() - started
+                        self.latencies.add(first_chunk)
+                        _first_chunk_seconds.observe(first_chunk)
+                        note("llm_first_chunk", first_chunk)
+                        self.breaker.record_success(first_chunk)
+                    yield item
+            except Exception:
+                if not outcome_recorded:
+                    outcome_recorded = True
+                    self.breaker.record_failure()
+                raise
+            finally:
+                stop.set()
+                self.active -= 1
+                if not outcome_recorded:
+                    self.breaker.record_abandoned()
+
+    @staticmethod
+    def _generate_blocking(model, prompt: str, timeout: float) -> str:
+        # No SDK-level retries: they would hold the thread past the caller's deadline
+        response = model.generate_content(prompt, request_options={"timeout": timeout, "retry": None})
+        return response.text if response is not None else ""
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
+
+    def stats(self) -> Dict[str, Any]:
+        p50 = self.latencies.percentile(0.5)
+        p95 = self.latencies.percentile(0.95)
+        return {
+            "models": len(self._models),
+            "active": self.active,
+            "inflight_prompts": len(self._inflight),
+            "calls": self.calls,
+            "requests": self.requests,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "streams": self.streams,
+            "latency_p50_ms": int(p50 * 1000) if p50 is not None else None,
+            "latency_p95_ms": int(p95 * 1000) if p95 is not None else None,
+            "breaker": self.breaker.stats(),
+            "coalesced": self.coalesced,
+            "cancelled": self.cancelled,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+        }
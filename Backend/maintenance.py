@@ -0,0 +1,170 @@
+import time
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from database import connect, fetch_one, run_write_async
+from pipeline import env_int
+
+logger = logging.getLogger("backend")
+
+
+class DatabaseMaintenance:
+    """Scheduled purge of rows nothing reads any more, plus space reclaim.
+
+    Every `interval_s` it clears verification tokens that expired more
+    than `token_grace_hours` ago, deletes interview sessions (with their
+    turns) idle longer than `session_retention_days` and settled outbox
+    mail older than `outbox_retention_days`. Deletes go through the writer
+    in batches of `batch_size` rows, each its own job, so live writes
+    interleave with a large purge instead of queueing behind it. Freed pages are handed
+    back with incremental_vacuum and PRAGMA optimize refreshes planner
+    statistics for the indexes the purge just churned.
+    """
+
+    def __init__(
+        self,
+        interval_s: int = env_int("DB_MAINTENANCE_INTERVAL_S", 3600),
+        initial_delay_s: int = env_int("DB_MAINTENANCE_DELAY_S", 300),
+        session_retention_days: int = env_int("SESSION_RETENTION_DAYS", 30),
+        outbox_retention_days: int = env_int("OUTBOX_RETENTION_DAYS", 7),
+        token_grace_hours: int = env_int("VERIFICATION_TOKEN_GRACE_HOURS", 24),
+        batch_size: int = env_int("DB_PURGE_BATCH", 1000),
+        vacuum_pages: int = env_int("DB_VACUUM_PAGES", 2000),
+    ):
+        self.interval = max(1, interval_s)
+        self.initial_delay = max(0, initial_delay_s)
+        self.session_retention = max(1, session_retention_days) * 86400
+        self.outbox_retention = max(1, outbox_retention_days) * 86400
+        self.token_grace = timedelta(hours=max(0, token_grace_hours))
+        self.batch_size = max(1, batch_size)
+        self.vacuum_pages = max(0, vacuum_pages)
+        self._task: Optional[asyncio.Task] = None
+        self.runs = 0
+        self.errors = 0
+        self.last_run_at: Optional[float] = None
+        self.last_duration_ms = 0.0
+        self.purged = {"verification_tokens": 0, "sessions": 0, "outbox": 0}
+        self.vacuumed_pages = 0
+
+    async def _in_batches(self, sql: str, params: tuple) -> int:
+        """Run a LIMIT-ed write until it touches fewer rows than a full batch"""
+        return await self._batched(lambda conn: conn.execute(sql, params + (self.batch_size,)).rowcount)
+
+    async def _batched(self, job) -> int:
+        """Repeat a writer job handling up to batch_size rows until it comes up short"""
+        total = 0
+        while True:
+            changed = await run_write_async(job)
+            total += changed
+            if changed < self.batch_size:
+                return total
+
+    async def _clear_expired_tokens(self) -> int:
+        # Expiry is stored as an ISO timestamp, which orders correctly as text
+        cutoff = (datetime.now() - self.token_grace).isoformat()
+        return await self._in_batches('''
+            UPDATE users SET verification_token = NULL, verification_token_expires = NULL
+            WHERE id IN (
+                SELECT id FROM users
+                WHERE verification_token IS NOT NULL AND verification_token_expires < ?
+                LIMIT ?
+            )
+        ''', (cutoff,))
+
+    async def _purge_sessions(self, now: float) -> int:
+        cutoff = now - self.session_retention
+
+        def job(conn):
+            stale = conn.execute(
+                "SELECT id, session_id FROM user_sessions WHERE last_activity < ? LIMIT ?", (cutoff, self.batch_size)
+            ).fetchall()
+            conn.executemany("DELETE FROM session_turns WHERE session_id = ?", [(row["session_id"],) for row in stale])
+            conn.executemany("DELETE FROM user_sessions WHERE id = ?", [(row["id"],) for row in stale])
+            return len(stale)
+
+        return await self._batched(job)
+
+    async def _purge_outbox(self, now: float) -> int:
+        return await self._in_batches('''
+            DELETE FROM email_outbox WHERE id IN (
+                SELECT id FROM email_outbox
+                WHERE status IN ('sent', 'failed') AND next_attempt_at < ?
+                LIMIT ?
+            )
+        ''', (now - self.outbox_retention,))
+
+    @staticmethod
+    def _incremental_vacuum(pages: int):
+        # The pragma frees one page per step and the sqlite3 module steps a
+        # statement once, so it runs through executescript on its own
+        # connection; that also keeps the writer's open transaction intact.
+        conn = connect()
+        try:
+            conn.executescript(f"PRAGMA incremental_vacuum({pages});")
+        finally:
+            conn.close()
+
+    async def _reclaim(self) -> int:
+        row = await fetch_one("PRAGMA freelist_count")
+        pages = min(row[0] if row else 0, self.vacuum_pages)
+        if pages:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self._incremental_vacuum, pages)
+        await run_write_async(lambda conn: conn.execute("PRAGMA optimize"))
+        return pages
+
+    async def run_once(self) -> Dict[str, int]:
+        """One full maintenance pass; returns rows purged per kind"""
+        started = time.perf_counter()
+        now = time.time()
+        purged = {
+            "verification_tokens": await self._clear_expired_tokens(),
+            "sessions": await self._purge_sessions(now),
+            "outbox": await self._purge_outbox(now),
+        }
+        vacuumed = await self._reclaim()
+        for kind, count in purged.items():
+            self.purged[kind] += count
+        self.vacuumed_pages += vacuumed
+        self.runs += 1
+        self.last_run_at = now
+        self.last_duration_ms = (time.perf_counter() - started) * 1000
+        if any(purged.values()) or vacuumed:
+            logger.info(f"🧹 Database maintenance: {purged}, {vacuumed} page(s) reclaimed "
+                        f"in {self.last_duration_ms:.0f} ms")
+        return purged
+
+    async def _run_forever(self):
+        await asyncio.sleep(self.initial_delay)
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"❌ Database maintenance failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run_forever())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "runs": self.runs,
+            "errors": self.errors,
+            "last_run_at": self.last_run_at,
+            "last_duration_ms": round(self.last_duration_ms, 1),
+            "purged": dict(self.purged),
+            "vacuumed_pages": self.vacuumed_pages,
+        }
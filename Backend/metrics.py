@@ -0,0 +1,261 @@
+import math
+import time
+import logging
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Sequence, Tuple, Union
+
+logger = logging.getLogger("backend")
+
+# The response class appends the utf-8 charset
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+# Seconds, from a pooled SQLite read up to an LLM call that hits its deadline
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+Samples = Union[float, Dict[Tuple[str, ...], float]]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+# ==================== SERIES ====================
+class HistogramSeries:
+    """Bucket counts for one label set; observe() is a bisect and a locked add"""
+
+    __slots__ = ("bounds", "counts", "sum", "_lock")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    @contextmanager
+    def time(self):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+    def snapshot(self) -> Tuple[List[int], float]:
+        with self._lock:
+            return list(self.counts), self.sum
+
+
+class CounterSeries:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+
+# ==================== METRICS ====================
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def collect(self) -> List[str]:
+        raise NotImplementedError
+
+
+class _Labelled(_Metric):
+    """A metric whose series are created on first use of a label set and then reused.
+
+    Hot paths should resolve `labels(...)` once and keep the series, so a
+    sample costs no dict lookup at all.
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._series: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _new_series(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {values}")
+        series = self._series.get(values)
+        if series is None:
+            with self._lock:
+                series = self._series.setdefault(values, self._new_series())
+        return series
+
+    def _items(self):
+        with self._lock:
+            return sorted(self._series.items())
+
+
+class Histogram(_Labelled):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(float(bound) for bound in buckets))
+
+    def _new_series(self) -> HistogramSeries:
+        return HistogramSeries(self.buckets)
+
+    def collect(self) -> List[str]:
+        lines = self.header()
+        for values, series in self._items():
+            counts, total = series.snapshot()
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, values, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, values)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, values)} {cumulative}")
+        return lines
+
+
+class Counter(_Labelled):
+    kind = "counter"
+
+    def _new_series(self) -> CounterSeries:
+        return CounterSeries()
+
+    def collect(self) -> List[str]:
+        lines = self.header()
+        for values, series in self._items():
+            lines.append(f"{self.name}{_labels(self.labelnames, values)} {_number(series.value)}")
+        return lines
+
+
+class Callback(_Metric):
+    """A counter or gauge read at scrape time from a component's own stats.
+
+    `fn` returns a number, or a dict of label-value tuples to numbers. Most
+    components already count their hits, misses and queue depths; reading
+    those keeps the request path free of a second set of counters.
+    """
+
+    def __init__(self, kind: str, name: str, documentation: str, fn: Callable[[], Samples],
+                 labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.kind = kind
+        self.fn = fn
+
+    def collect(self) -> List[str]:
+        samples = self.fn()
+        if not isinstance(samples, dict):
+            samples = {(): samples}
+        lines = self.header()
+        for values, value in sorted(samples.items()):
+            if value is not None:
+                lines.append(f"{self.name}{_labels(self.labelnames, values)} {_number(value)}")
+        return lines
+
+
+# ==================== REGISTRY ====================
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def expose(self) -> str:
+        """Every metric in the Prometheus text exposition format"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            try:
+                lines.extend(metric.collect())
+            except Exception as e:
+                # One broken callback must not blank the whole scrape
+                logger.warning(f"⚠️ Metric {metric.name} failed to collect: {e}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def histogram(name: str, documentation: str, labelnames: Sequence[str] = (),
+              buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets))
+
+
+def counter(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+
+def gauge_callback(name: str, documentation: str, fn: Callable[[], Samples],
+                   labelnames: Sequence[str] = ()) -> Callback:
+    return REGISTRY.register(Callback("gauge", name, documentation, fn, labelnames))
+
+
+def counter_callback(name: str, documentation: str, fn: Callable[[], Samples],
+                     labelnames: Sequence[str] = ()) -> Callback:
+    return REGISTRY.register(Callback("counter", name, documentation, fn, labelnames))
+
+
+# ==================== SHARED METRICS ====================
+# Defined here rather than by their users so modules low in the import
+# graph (database, pipeline) can record without importing backend.
+STAGE_SECONDS = histogram(
+    "arjuna_stage_duration_seconds",
+    "Time spent in one call to a dependency on the interview path",
+    ["stage"],
+)
+PIPELINE_SECONDS = histogram(
+    "arjuna_pipeline_stage_seconds",
+    "Admission to completion in an interview pipeline stage, queueing included",
+    ["stage"],
+)
+FALLBACKS = counter(
+    "arjuna_fallbacks_total",
+    "Turns answered with a scripted question because Gemini gave nothing usable",
+    ["path"],
+)
+TIMEOUTS = counter(
+    "arjuna_timeouts_total",
+    "Dependency calls abandoned at their deadline",
+    ["stage"],
+)
@@ -0,0 +1,387 @@
+import json
+import time
+import logging
+import sqlite3
+from datetime import datetime
+from typing import Callable, List, NamedTuple
+
+logger = logging.getLogger("backend")
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    apply: Callable[[sqlite3.Cursor], None]
+    # VACUUM and auto_vacuum changes cannot run inside a transaction
+    transactional: bool = True
+
+
+def _ensure_column(cursor, table: str, column: str, declaration: str):
+    """Add a column to an existing table if an older schema lacks it"""
+    columns = {row[1] for row in cursor.execute(f"PRAGMA table_info({table})")}
+    if column not in columns:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {declaration}")
+
+
+# ==================== MIGRATIONS ====================
+def _baseline(cursor):
+    """Every table as init_database created it before versioned migrations"""
+
+    # Users table with email verification
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            email TEXT UNIQUE NOT NULL,
+            name TEXT NOT NULL,
+            hashed_password TEXT NOT NULL,
+            is_verified BOOLEAN DEFAULT FALSE,
+            verification_token TEXT,
+            verification_token_expires TIMESTAMP,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_login TIMESTAMP
+        )
+    ''')
+
+    # Analytics table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS analytics (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            session_id TEXT NOT NULL,
+            total_questions INTEGER DEFAULT 0,
+            total_duration INTEGER DEFAULT 0,
+            avg_answer_length INTEGER DEFAULT 0,
+            strengths TEXT,
+            areas_for_improvement TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+    # Running sums behind the incrementally maintained analytics
+    _ensure_column(cursor, "analytics", "answers", "INTEGER DEFAULT 0")
+    _ensure_column(cursor, "analytics", "answer_words", "INTEGER DEFAULT 0")
+    _ensure_column(cursor, "analytics", "started_at", "REAL")
+    _ensure_column(cursor, "analytics", "last_turn_at", "REAL")
+    _ensure_column(cursor, "analytics", "updated_at", "REAL")
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_analytics_session ON analytics (session_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_analytics_user_recent ON analytics (user_id, last_turn_at)")
+
+    # Per-user rollup of analytics, updated with the same deltas
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS user_analytics (
+            user_id INTEGER PRIMARY KEY,
+            sessions INTEGER NOT NULL DEFAULT 0,
+            questions INTEGER NOT NULL DEFAULT 0,
+            answers INTEGER NOT NULL DEFAULT 0,
+            answer_words INTEGER NOT NULL DEFAULT 0,
+            total_duration INTEGER NOT NULL DEFAULT 0,
+            last_session_id TEXT,
+            last_activity REAL,
+            updated_at REAL,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+
+    # Session tracking table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS user_sessions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            session_id TEXT NOT NULL,
+            start_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            end_time TIMESTAMP,
+            is_active BOOLEAN DEFAULT TRUE,
+            conversation_history TEXT DEFAULT '[]',
+            question_index INTEGER DEFAULT 0,
+            has_greeted BOOLEAN DEFAULT FALSE,
+            state_version INTEGER DEFAULT 0,
+            last_activity REAL,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+    # Interview state columns added after the first release
+    _ensure_column(cursor, "user_sessions", "question_index", "INTEGER DEFAULT 0")
+    _ensure_column(cursor, "user_sessions", "has_greeted", "BOOLEAN DEFAULT FALSE")
+    _ensure_column(cursor, "user_sessions", "state_version", "INTEGER DEFAULT 0")
+    _ensure_column(cursor, "user_sessions", "last_activity", "REAL")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_user_sessions_session ON user_sessions (session_id)")
+
+    # Outbox for verification and other transactional email
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS email_outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            recipient TEXT NOT NULL,
+            subject TEXT NOT NULL,
+            html_body TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER DEFAULT 0,
+            next_attempt_at REAL NOT NULL,
+            claimed_at REAL,
+            last_error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            sent_at TIMESTAMP
+        )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_email_outbox_due ON email_outbox (status, next_attempt_at)")
+
+    # Adaptive exam question bank; irt_b is the item difficulty on the ability scale
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS question_bank (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            language TEXT NOT NULL,
+            difficulty TEXT NOT NULL,
+            topic TEXT NOT NULL DEFAULT 'general',
+            question TEXT NOT NULL,
+            options TEXT NOT NULL,
+            correct_answer TEXT NOT NULL,
+            explanation TEXT,
+            irt_a REAL NOT NULL DEFAULT 1.0,
+            irt_b REAL NOT NULL,
+            source TEXT NOT NULL DEFAULT 'seed',
+            fingerprint TEXT UNIQUE NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_question_bank_select ON question_bank (language, difficulty, topic, irt_b)")
+
+    # Adaptive exam sessions and their answers
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS exam_sessions (
+            session_id TEXT PRIMARY KEY,
+            user_id INTEGER,
+            language TEXT NOT NULL,
+            start_difficulty TEXT NOT NULL,
+            num_questions INTEGER NOT NULL,
+            ability REAL NOT NULL DEFAULT 0.0,
+            current_question_id INTEGER,
+            completed BOOLEAN DEFAULT FALSE,
+            started_at REAL NOT NULL,
+            finished_at REAL,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS exam_answers (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT NOT NULL,
+            question_number INTEGER NOT NULL,
+            question_id INTEGER NOT NULL,
+            user_answer TEXT,
+            is_correct BOOLEAN NOT NULL,
+            time_taken REAL,
+            ability_after REAL NOT NULL,
+            answered_at REAL NOT NULL,
+            UNIQUE (session_id, question_number),
+            FOREIGN KEY (question_id) REFERENCES question_bank (id)
+        )
+    ''')
+
+    # Proctoring detections, append-only; one row per run of repeated detections
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS proctor_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT NOT NULL,
+            detection_type TEXT NOT NULL,
+            severity TEXT NOT NULL,
+            description TEXT,
+            occurrences INTEGER NOT NULL DEFAULT 1,
+            first_seen REAL NOT NULL,
+            last_seen REAL NOT NULL
+        )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_proctor_events_session ON proctor_events (session_id, first_seen)")
+    # Running per-session totals, maintained in the same transaction as the events
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS proctor_aggregates (
+            session_id TEXT NOT NULL,
+            detection_type TEXT NOT NULL,
+            events INTEGER NOT NULL DEFAULT 0,
+            occurrences INTEGER NOT NULL DEFAULT 0,
+            max_severity INTEGER NOT NULL DEFAULT 0,
+            first_seen REAL NOT NULL,
+            last_seen REAL NOT NULL,
+            PRIMARY KEY (session_id, detection_type)
+        ) WITHOUT ROWID
+    ''')
+
+
+
+def _hot_path_indexes(cursor):
+    """Indexes for lookups that otherwise scan: tokens, per-user listings, purge predicates"""
+    # /verify-email looks users up by token; only unverified users carry one
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_users_verification_token
+        ON users (verification_token) WHERE verification_token IS NOT NULL
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_users_verification_expiry
+        ON users (verification_token_expires) WHERE verification_token IS NOT NULL
+    ''')
+    # Covers "a user's sessions, newest first" without touching the history blobs
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_user_sessions_user
+        ON user_sessions (user_id, start_time, session_id, is_active)
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_user_sessions_activity ON user_sessions (last_activity)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_exam_sessions_user ON exam_sessions (user_id, started_at)")
+
+
+def _unique_session_ids(cursor):
+    """One user_sessions row per session_id.
+
+    Duplicates come from the old INSERT OR REPLACE in /api/auto-greeting.
+    The row with the newest state survives and inherits the owner from
+    any duplicate that had one.
+    """
+    cursor.execute('''
+        UPDATE user_sessions SET user_id = (
+            SELECT d.user_id FROM user_sessions d
+            WHERE d.session_id = user_sessions.session_id AND d.user_id IS NOT NULL
+            ORDER BY d.id DESC LIMIT 1
+        )
+        WHERE user_id IS NULL
+    ''')
+    cursor.execute('''
+        DELETE FROM user_sessions WHERE id IN (
+            SELECT id FROM (
+                SELECT id, ROW_NUMBER() OVER (
+                    PARTITION BY session_id ORDER BY COALESCE(state_version, 0) DESC, id DESC
+                ) AS rank
+                FROM user_sessions
+            ) WHERE rank > 1
+        )
+    ''')
+    removed = cursor.rowcount
+    if removed:
+        logger.info(f"🧹 Removed {removed} duplicate user_sessions row(s)")
+    # Purges key off last_activity; older rows only have start_time
+    cursor.execute('''
+        UPDATE user_sessions SET last_activity = CAST(strftime('%s', start_time) AS REAL)
+        WHERE last_activity IS NULL
+    ''')
+    cursor.execute("DROP INDEX IF EXISTS idx_user_sessions_session")
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_user_sessions_session ON user_sessions (session_id)")
+
+
+def _incremental_vacuum(cursor):
+    """Let the maintenance job hand freed pages back to the OS a few at a time"""
+    if cursor.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        # Switching an existing database's vacuum mode takes one full VACUUM
+        cursor.execute("VACUUM")
+
+
+def _legacy_turn_time(turn: dict, fallback: float) -> float:
+    try:
+        return datetime.fromisoformat(turn["timestamp"]).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return fallback
+
+
+def _session_turns(cursor):
+    """Move transcripts out of the conversation_history blob into one row per turn"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS session_turns (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT NOT NULL,
+            seq INTEGER NOT NULL,
+            role TEXT NOT NULL,
+            content TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            elapsed_ms INTEGER,
+            UNIQUE (session_id, seq)
+        )
+    ''')
+    # Next seq to append at; reading it avoids a MAX(seq) per save
+    _ensure_column(cursor, "user_sessions", "turn_count", "INTEGER DEFAULT 0")
+
+    moved = 0
+    rows = cursor.execute('''
+        SELECT session_id, conversation_history, last_activity FROM user_sessions
+        WHERE conversation_history IS NOT NULL AND conversation_history NOT IN ('', '[]')
+    ''').fetchall()
+    for session_id, blob, last_activity in rows:
+        try:
+            history = json.loads(blob)
+        except ValueError:
+            history = []
+        turns, previous = [], None
+        for seq, turn in enumerate(t for t in history if isinstance(t, dict)):
+            at = _legacy_turn_time(turn, previous or last_activity or 0.0)
+            elapsed = int((at - previous) * 1000) if previous is not None else None
+            turns.append((session_id, seq, turn.get("role", "user"), turn.get("content", ""), at, elapsed))
+            previous = at
+        cursor.executemany('''
+            INSERT OR IGNORE INTO session_turns (session_id, seq, role, content, created_at, elapsed_ms)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', turns)
+        cursor.execute("UPDATE user_sessions SET turn_count = ? WHERE session_id = ?", (len(turns), session_id))
+        moved += len(turns)
+    cursor.execute("UPDATE user_sessions SET conversation_history = NULL")
+    if moved:
+        logger.info(f"🔧 Moved {moved} turn(s) from {len(rows)} transcript blob(s) into session_turns")
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "baseline schema", _baseline),
+    Migration(2, "hot-path indexes", _hot_path_indexes),
+    Migration(3, "unique user_sessions.session_id", _unique_session_ids),
+    Migration(4, "incremental auto-vacuum", _incremental_vacuum, transactional=False),
+    Migration(5, "append-only session turns", _session_turns),
+]
+
+
+# ==================== RUNNER ====================
+def _applied(cursor) -> set:
+    return {row[0] for row in cursor.execute("SELECT version FROM schema_migrations")}
+
+
+def run_migrations(conn: sqlite3.Connection, migrations: List[Migration] = MIGRATIONS) -> List[int]:
+    """Apply pending migrations in version order; returns the versions applied.
+
+    Each transactional migration runs with its bookkeeping row in one
+    BEGIN IMMEDIATE transaction, and the applied set is re-read under that
+    lock, so workers starting together apply each migration exactly once.
+    """
+    isolation_level = conn.isolation_level
+    conn.isolation_level = None  # transactions are managed explicitly below
+    cursor = conn.cursor()
+    applied_now = []
+    try:
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at REAL NOT NULL
+            )
+        ''')
+        for migration in sorted(migrations, key=lambda m: m.version):
+            if migration.version in _applied(cursor):
+                continue
+            logger.info(f"🔧 Applying migration {migration.version}: {migration.name}")
+            if migration.transactional:
+                cursor.execute("BEGIN IMMEDIATE")
+                try:
+                    if migration.version not in _applied(cursor):
+                        migration.apply(cursor)
+                        cursor.execute("INSERT INTO schema_migrations (version, name, applied_at) VALUES (?, ?, ?)",
+                                       (migration.version, migration.name, time.time()))
+                        applied_now.append(migration.version)
+                    cursor.execute("COMMIT")
+                except Exception:
+                    cursor.execute("ROLLBACK")
+                    raise
+            else:
+                # Idempotent by construction; INSERT OR IGNORE covers a concurrent run
+                migration.apply(cursor)
+                cursor.execute("INSERT OR IGNORE INTO schema_migrations (version, name, applied_at) VALUES (?, ?, ?)",
+                               (migration.version, migration.name, time.time()))
+                applied_now.append(migration.version)
+    finally:
+        conn.isolation_level = isolation_level
+    return applied_now
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    row = conn.execute("SELECT MAX(version) FROM schema_migrations").fetchone()
+    return row[0] or 0
@@ -0,0 +1,200 @@
+import os
+import math
+import time
+import asyncio
+import functools
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+from flight_recorder import note
+from metrics import PIPELINE_SECONDS
+
+logger = logging.getLogger("backend")
+
+
+def env_int(name: str, default: int) -> int:
+    """Read an integer knob from the environment"""
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+class StageOverloaded(Exception):
+    """Raised when a stage's bounded queue is full"""
+
+    def __init__(self, stage: str, retry_after: int = 1):
+        super().__init__(f"Stage '{stage}' is overloaded")
+        self.stage = stage
+        self.retry_after = retry_after
+
+
+def process_context():
+    """Start method for worker pools: forkserver where available, else spawn.
+
+    Pools start inside a server that already runs writer, stage, LLM and
+    SMTP threads; a plain fork could copy a lock one of them holds and
+    deadlock the child.
+    """
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+def executor_stats(executor: Executor) -> Dict[str, int]:
+    """Size and backlog of a plain executor that is not wrapped in a Stage"""
+    # The stdlib exposes no public queue depth; these attributes are stable across 3.x
+    work_queue = getattr(executor, "_work_queue", None)
+    pending = getattr(executor, "_pending_work_items", None)
+    return {
+        "workers": getattr(executor, "_max_workers", 0),
+        "queued": work_queue.qsize() if work_queue is not None else len(pending or ()),
+    }
+
+
+class Stage:
+    """One pipeline stage: a sized worker pool behind a bounded queue.
+
+    Blocking callables run on the stage's own pool (threads, or processes
+    for CPU-bound work); coroutine functions run on the event loop with
+    concurrency capped at `workers`. At most `workers + queue_size` items
+    may be admitted at once, anything beyond that is rejected immediately
+    with a Retry-After hint taken from recent latency.
+    """
+
+    def __init__(self, name: str, workers: int, queue_size: int, processes: bool = False):
+        self.name = name
+        self.workers = max(1, workers)
+        self.queue_size = max(0, queue_size)
+        self.processes = processes
+        if processes:
+            # Callables and arguments must be picklable; no per-call wrapper is possible
+            self.executor: Executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=process_context())
+        else:
+            self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f"stage-{name}")
+        self._semaphore = None
+        self._lock = threading.Lock()
+        self._latency = 0.0
+        self._seconds = PIPELINE_SECONDS.labels(name)
+        self.pending = 0
+        self.submitted = 0
+        self.active = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    @property
+    def capacity(self) -> int:
+        return self.workers + self.queue_size
+
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely free: one recent request latency"""
+        return max(1, math.ceil(self._latency))
+
+    def _admit(self):
+        # Only ever called from the event loop thread, so no lock is needed
+        if self.pending >= self.capacity:
+            self.rejected += 1
+            raise StageOverloaded(self.name, self.retry_after())
+        self.pending += 1
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run fn on this stage, waiting in the stage queue if all workers are busy"""
+        self._admit()
+        started = time.monotonic()
+        try:
+            if asyncio.iscoroutinefunction(fn):
+                if self._semaphore is None:
+                    self._semaphore = asyncio.Semaphore(self.workers)
+                async with self._semaphore:
+                    self.active += 1
+                    try:
+                        result = await fn(*args, **kwargs)
+                    finally:
+                        self.active -= 1
+            elif self.processes:
+                loop = asyncio.get_running_loop()
+                self.submitted += 1
+                try:
+                    result = await loop.run_in_executor(self.executor, functools.partial(fn, *args, **kwargs))
+                finally:
+                    self.submitted -= 1
+            else:
+                loop = asyncio.get_running_loop()
+                result = await loop.run_in_executor(self.executor, functools.partial(self._call, fn, *args, **kwargs))
+            self.completed += 1
+            return result
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.pending -= 1
+            elapsed = time.monotonic() - started
+            self._seconds.observe(elapsed)
+            note(self.name, elapsed)
+            # Smoothed admission-to-completion time, used for Retry-After
+            self._latency += 0.2 * (elapsed - self._latency)
+
+    def _call(self, fn: Callable, *args, **kwargs) -> Any:
+        with self._lock:
+            self.active += 1
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._lock:
+                self.active -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        # Process workers cannot report back, so their busy count is inferred
+        active = min(self.submitted, self.workers) if self.processes else self.active
+        return {
+            "kind": "process" if self.processes else "thread",
+            "workers": self.workers,
+            "capacity": self.capacity,
+            "active": active,
+            "queued": max(0, self.pending - active),
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "latency_ms": int(self._latency * 1000),
+        }
+
+    async def warm(self):
+        """Start every process worker now rather than on the first request"""
+        if self.processes:
+            loop = asyncio.get_running_loop()
+            await asyncio.gather(*[loop.run_in_executor(self.executor, os.getpid) for _ in range(self.workers)])
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
+
+
+class StagedPipeline:
+    """Registry of named stages that a request flows through"""
+
+    def __init__(self):
+        self.stages: Dict[str, Stage] = {}
+
+    def add_stage(self, name: str, workers: int, queue_size: int, processes: bool = False) -> Stage:
+        stage = Stage(name, workers, queue_size, processes)
+        self.stages[name] = stage
+        return stage
+
+    async def run(self, stage: str, fn: Callable, *args, **kwargs) -> Any:
+        return await self.stages[stage].run(fn, *args, **kwargs)
+
+    def spawn(self, stage: str, fn: Callable, *args, **kwargs) -> asyncio.Task:
+        """Start fn on a stage without waiting, so independent work can overlap"""
+        return asyncio.ensure_future(self.run(stage, fn, *args, **kwargs))
+
+    async def warm(self):
+        await asyncio.gather(*[stage.warm() for stage in self.stages.values()])
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {name: stage.stats() for name, stage in self.stages.items()}
+
+    def shutdown(self):
+        for stage in self.stages.values():
+            stage.shutdown()
@@ -0,0 +1,272 @@
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from database import fetch_all, run_write_async
+from pipeline import env_int
+
+logger = logging.getLogger("backend")
+
+SEVERITY_WEIGHTS = {"low": 1, "medium": 2, "high": 3}
+SEVERITY_NAMES = {weight: name for name, weight in SEVERITY_WEIGHTS.items()}
+MAX_DESCRIPTION = 500
+MAX_CHEATING_SCORE = 100
+
+
+class OpenRun:
+    """Repeated detections of one type in one session, not yet written"""
+
+    __slots__ = ("session_id", "detection_type", "severity", "description",
+                 "occurrences", "first_seen", "last_seen")
+
+    def __init__(self, session_id: str, detection_type: str, severity: int, description: str, seen: float):
+        self.session_id = session_id
+        self.detection_type = detection_type
+        self.severity = severity
+        self.description = description
+        self.occurrences = 1
+        self.first_seen = seen
+        self.last_seen = seen
+
+    def merge(self, severity: int, description: str, seen: float, occurrences: int = 1):
+        self.occurrences += occurrences
+        self.severity = max(self.severity, severity)
+        if description:
+            self.description = description
+        self.first_seen = min(self.first_seen, seen)
+        self.last_seen = max(self.last_seen, seen)
+
+
+class TokenBucket:
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, burst: float, now: float):
+        self.tokens = burst
+        self.updated = now
+
+
+class ProctoringIngestor:
+    """Buffered ingestion of proctoring detections.
+
+    Object detection reports the same phone or second face many times a
+    second, so a detection first joins the open run for its (session,
+    type) if one started less than `coalesce_ms` ago. Only a new run
+    spends a token from the session's bucket; past the bucket, new runs
+    are dropped and counted. Closed runs are written by a background
+    flusher every `flush_interval_ms`, or sooner once `flush_batch` runs
+    are buffered, in one writer transaction that also updates
+    proctor_aggregates, so summaries never scan proctor_events.
+    """
+
+    def __init__(
+        self,
+        flush_interval_ms: int = env_int("PROCTOR_FLUSH_INTERVAL_MS", 500),
+        flush_batch: int = env_int("PROCTOR_FLUSH_BATCH", 500),
+        coalesce_ms: int = env_int("PROCTOR_COALESCE_MS", 2000),
+        rate_per_s: int = env_int("PROCTOR_RATE_PER_S", 5),
+        burst: int = env_int("PROCTOR_BURST", 20),
+        max_buffered: int = env_int("PROCTOR_MAX_BUFFERED", 20000),
+        max_sessions: int = env_int("PROCTOR_MAX_SESSIONS", 10000),
+    ):
+        self.flush_interval = max(1, flush_interval_ms) / 1000.0
+        self.flush_batch = max(1, flush_batch)
+        self.coalesce = max(0, coalesce_ms) / 1000.0
+        self.rate = max(1, rate_per_s)
+        self.burst = max(1, burst)
+        self.max_buffered = max(1, max_buffered)
+        self.max_sessions = max(1, max_sessions)
+        self._open: Dict[Tuple[str, str], OpenRun] = {}
+        self._closed: List[OpenRun] = []
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._flusher: Optional[asyncio.Task] = None
+        self._flush_wakeup: Optional[asyncio.Event] = None
+        self.received = 0
+        self.coalesced = 0
+        self.rate_limited = 0
+        self.overflowed = 0
+        self.flushes = 0
+        self.flushed_runs = 0
+        self.flush_errors = 0
+
+    @property
+    def buffered(self) -> int:
+        return len(self._open) + len(self._closed)
+
+    def _take_token(self, session_id: str, now: float) -> bool:
+        bucket = self._buckets.get(session_id)
+        if bucket is None:
+            bucket = TokenBucket(self.burst, now)
+            self._buckets[session_id] = bucket
+            while len(self._buckets) > self.max_sessions:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(session_id)
+            bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated) * self.rate)
+            bucket.updated = now
+        if bucket.tokens < 1:
+            return False
+        bucket.tokens -= 1
+        return True
+
+    def ingest(self, session_id: str, detection_type: str, severity: str = "medium",
+               description: str = "", seen: Optional[float] = None) -> str:
+        """Buffer one detection; returns "accepted", "coalesced", "rate_limited" or "overflow" """
+        self.received += 1
+        now = time.time()
+        # Clamp client clocks: a future time would hold a run open, a stale one
+        # would start a new run on every event and defeat coalescing
+        seen = max(min(seen or now, now), now - self.coalesce)
+        detection_type = detection_type.strip().lower()[:64] or "unknown"
+        weight = SEVERITY_WEIGHTS.get(severity.strip().lower(), SEVERITY_WEIGHTS["medium"])
+        description = (description or "")[:MAX_DESCRIPTION]
+        key = (session_id, detection_type)
+
+        run = self._open.get(key)
+        if run is not None and seen - run.first_seen < self.coalesce:
+            run.merge(weight, description, seen)
+            self.coalesced += 1
+            return "coalesced"
+
+        if self.buffered >= self.max_buffered:
+            self.overflowed += 1
+            return "overflow"
+        if not self._take_token(session_id, now):
+            self.rate_limited += 1
+            return "rate_limited"
+
+        if run is not None:
+            self._closed.append(self._open.pop(key))
+        self._open[key] = OpenRun(session_id, detection_type, weight, description, seen)
+        if self.buffered >= self.flush_batch and self._flush_wakeup is not None:
+            self._flush_wakeup.set()
+        return "accepted"
+
+    def _take_closed(self, everything: bool) -> List[OpenRun]:
+        """Runs ready to write: closed ones plus open ones past the coalesce window"""
+        cutoff = time.time() - self.coalesce
+        ready, self._closed = self._closed, []
+        for key, run in list(self._open.items()):
+            if everything or run.first_seen <= cutoff:
+                ready.append(self._open.pop(key))
+        return ready
+
+    @staticmethod
+    def _write(conn, runs: List[OpenRun]):
+        conn.executemany('''
+            INSERT INTO proctor_events
+            (session_id, detection_type, severity, description, occurrences, first_seen, last_seen)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', [(run.session_id, run.detection_type, SEVERITY_NAMES[run.severity], run.description,
+               run.occurrences, run.first_seen, run.last_seen) for run in runs])
+        conn.executemany('''
+            INSERT INTO proctor_aggregates
+            (session_id, detection_type, events, occurrences, max_severity, first_seen, last_seen)
+            VALUES (?, ?, 1, ?, ?, ?, ?)
+            ON CONFLICT (session_id, detection_type) DO UPDATE SET
+                events = events + 1,
+                occurrences = occurrences + excluded.occurrences,
+                max_severity = MAX(max_severity, excluded.max_severity),
+                first_seen = MIN(first_seen, excluded.first_seen),
+                last_seen = MAX(last_seen, excluded.last_seen)
+        ''', [(run.session_id, run.detection_type, run.occurrences, run.severity,
+               run.first_seen, run.last_seen) for run in runs])
+
+    async def flush(self, everything: bool = False) -> int:
+        """Write ready runs in one group commit; returns how many were written"""
+        runs = self._take_closed(everything)
+        if not runs:
+            return 0
+        try:
+            await run_write_async(lambda conn: self._write(conn, runs))
+        except Exception as e:
+            self.flush_errors += 1
+            logger.error(f"❌ Failed to persist {len(runs)} proctoring event(s): {e}")
+            self._closed[:0] = runs
+            return 0
+        self.flushes += 1
+        self.flushed_runs += len(runs)
+        return len(runs)
+
+    async def _flush_forever(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_wakeup.clear()
+            # Past the batch size, write open runs too rather than let the buffer grow
+            await self.flush(everything=self.buffered >= self.flush_batch)
+
+    def start(self):
+        if self._flusher is None:
+            self._flush_wakeup = asyncio.Event()
+            self._flusher = asyncio.ensure_future(self._flush_forever())
+
+    async def stop(self):
+        if self._flusher is not None:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+        await self.flush(everything=True)
+
+    # ==================== AGGREGATES ====================
+    async def summary(self, session_id: str) -> Dict[str, Any]:
+        """Per-type totals for a session: stored aggregates plus what this worker still buffers"""
+        rows = await fetch_all('''
+            SELECT detection_type, events, occurrences, max_severity, first_seen, last_seen
+            FROM proctor_aggregates WHERE session_id = ?
+        ''', (session_id,))
+        by_type: Dict[str, Dict[str, Any]] = {
+            row["detection_type"]: {
+                "events": row["events"],
+                "occurrences": row["occurrences"],
+                "max_severity": row["max_severity"],
+                "first_seen": row["first_seen"],
+                "last_seen": row["last_seen"],
+            }
+            for row in rows
+        }
+        for run in self._closed + list(self._open.values()):
+            if run.session_id != session_id:
+                continue
+            entry = by_type.setdefault(run.detection_type, {
+                "events": 0, "occurrences": 0, "max_severity": 0,
+                "first_seen": run.first_seen, "last_seen": run.last_seen,
+            })
+            entry["events"] += 1
+            entry["occurrences"] += run.occurrences
+            entry["max_severity"] = max(entry["max_severity"], run.severity)
+            entry["first_seen"] = min(entry["first_seen"], run.first_seen)
+            entry["last_seen"] = max(entry["last_seen"], run.last_seen)
+
+        score = sum(entry["events"] * entry["max_severity"] for entry in by_type.values())
+        for entry in by_type.values():
+            entry["severity"] = SEVERITY_NAMES.get(entry.pop("max_severity"), "low")
+        return {
+            "session_id": session_id,
+            "events": sum(entry["events"] for entry in by_type.values()),
+            "occurrences": sum(entry["occurrences"] for entry in by_type.values()),
+            "by_type": by_type,
+            "cheating_score": min(score, MAX_CHEATING_SCORE),
+        }
+
+    async def cheating_score(self, session_id: str) -> int:
+        return (await self.summary(session_id))["cheating_score"]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "buffered": self.buffered,
+            "sessions": len(self._buckets),
+            "received": self.received,
+            "coalesced": self.coalesced,
+            "rate_limited": self.rate_limited,
+            "overflowed": self.overflowed,
+            "flushes": self.flushes,
+            "flushed_runs": self.flushed_runs,
+            "flush_errors": self.flush_errors,
+        }
@@ -0,0 +1,52 @@
+import re
+from typing import List
+
+from pipeline import env_int
+
+# Sentence end: terminal punctuation, optional closing quote/bracket, then whitespace
+_BOUNDARY = re.compile(r'[.!?]+["\')\]]*\s+')
+# Tokens that end in a period without ending the sentence
+_ABBREVIATIONS = {"mr.", "mrs.", "ms.", "dr.", "prof.", "sr.", "jr.", "vs.", "etc.", "e.g.", "i.e.", "st."}
+
+
+def clean_question(text: str) -> str:
+    """Strip the quoting, numbering and labels Gemini sometimes wraps a question in"""
+    question = text.strip()
+    question = re.sub(r'^["\']+|["\']+$', '', question)
+    question = re.sub(r'^\d+\.\s*', '', question)
+    question = re.sub(r'^Question:\s*', '', question, flags=re.IGNORECASE)
+    return question
+
+
+class SentenceSplitter:
+    """Cut streamed text into sentences as soon as each one is complete.
+
+    Fragments shorter than `min_chars` are held back and joined to the next
+    sentence, so a lone "Great." does not become its own TTS request.
+    """
+
+    def __init__(self, min_chars: int = env_int("STREAM_MIN_SENTENCE_CHARS", 24)):
+        self.min_chars = min_chars
+        self._buffer = ""
+
+    def feed(self, text: str) -> List[str]:
+        """Add streamed text; returns the sentences it completed"""
+        self._buffer += text
+        sentences = []
+        start = 0
+        for match in _BOUNDARY.finditer(self._buffer):
+            end = match.end()
+            candidate = self._buffer[start:end].strip()
+            last_word = candidate.rsplit(None, 1)[-1].lower() if candidate else ""
+            if last_word in _ABBREVIATIONS or len(candidate) < self.min_chars:
+                continue
+            sentences.append(candidate)
+            start = end
+        self._buffer = self._buffer[start:]
+        return sentences
+
+    def flush(self) -> List[str]:
+        """Whatever is left once the stream has ended"""
+        rest = self._buffer.strip()
+        self._buffer = ""
+        return [rest] if rest else []
@@ -0,0 +1,482 @@
+import os
+import sys
+import time
+import asyncio
+import logging
+import threading
+from collections import OrderedDict, deque
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from database import fetch_all, fetch_one, run_write_async
+from pipeline import env_int
+
+logger = logging.getLogger("backend")
+
+
+class Turn:
+    __slots__ = ("role", "content", "timestamp", "elapsed_ms")
+
+    def __init__(self, role: str, content: str, timestamp: float, elapsed_ms: Optional[int] = None):
+        self.role = role
+        self.content = content
+        self.timestamp = timestamp
+        # Time since the previous turn: the candidate's thinking time or the interviewer's reply time
+        self.elapsed_ms = elapsed_ms
+
+    def size(self) -> int:
+        return sys.getsizeof(self) + sys.getsizeof(self.content)
+
+    def to_dict(self) -> Dict[str, str]:
+        return {"role": self.role, "content": self.content}
+
+    def to_record(self) -> Dict[str, Any]:
+        return {"role": self.role, "content": self.content,
+                "created_at": self.timestamp, "elapsed_ms": self.elapsed_ms}
+
+
+class SessionRecord:
+    """Interview state for one session with a capped ring buffer of recent turns"""
+
+    __slots__ = ("session_id", "turns", "question_index", "has_greeted",
+                 "created_at", "last_activity", "turn_count", "turn_bytes",
+                 "pending", "fresh", "version")
+
+    def __init__(self, session_id: str, max_turns: int):
+        now = time.time()
+        self.session_id = session_id
+        self.turns = deque(maxlen=max_turns)
+        self.question_index = 0
+        self.has_greeted = False
+        self.created_at = now
+        self.last_activity = now
+        self.turn_count = 0
+        self.turn_bytes = 0
+        # Write-behind state: turns not yet persisted, whether the stored
+        # history must be replaced rather than appended to, and the stored
+        # state_version this record was last synced with
+        self.pending: List[Turn] = []
+        self.fresh = True
+        self.version = 0
+
+    def add_turn(self, role: str, content: str, timestamp: Optional[float] = None) -> int:
+        """Append a turn, dropping the oldest when full; returns the change in bytes"""
+        timestamp = timestamp or time.time()
+        elapsed_ms = int((timestamp - self.turns[-1].timestamp) * 1000) if self.turns else None
+        turn = Turn(role, content, timestamp, elapsed_ms)
+        delta = turn.size()
+        if len(self.turns) == self.turns.maxlen:
+            delta -= self.turns[0].size()
+        self.turns.append(turn)
+        self.turn_count += 1
+        self.turn_bytes += delta
+        self.last_activity = max(self.last_activity, turn.timestamp)
+        return delta
+
+    def size(self) -> int:
+        return sys.getsizeof(self) + sys.getsizeof(self.turns) + self.turn_bytes
+
+
+# ==================== BACKENDS ====================
+class MemorySessionBackend:
+    """No shared persistence: sessions live and die with this worker"""
+
+    name = "memory"
+    persistent = False
+
+    async def version(self, session_id: str) -> Optional[int]:
+        return None
+
+    async def load(self, session_id: str, max_turns: int) -> Optional[Dict[str, Any]]:
+        return None
+
+    async def save(self, snapshots: List[Dict[str, Any]]) -> List[int]:
+        return [0 for _ in snapshots]
+
+
+class SQLiteSessionBackend:
+    """Interview state in user_sessions, shared by every worker on the database.
+
+    Each save bumps the row's state_version, so a worker holding an older
+    copy of a session notices with one indexed lookup and reloads it.
+    Turns are appended to session_turns at the seq kept in turn_count, so
+    saving a turn costs the same on the fiftieth answer as on the first.
+    """
+
+    name = "sqlite"
+    persistent = True
+
+    async def version(self, session_id: str) -> Optional[int]:
+        row = await fetch_one(
+            "SELECT state_version AS version FROM user_sessions WHERE session_id = ?", (session_id,)
+        )
+        return row['version'] if row is not None else None
+
+    async def load(self, session_id: str, max_turns: int) -> Optional[Dict[str, Any]]:
+        row = await fetch_one('''
+            SELECT question_index, has_greeted, state_version, last_activity, turn_count
+            FROM user_sessions WHERE session_id = ?
+        ''', (session_id,))
+        if row is None:
+            return None
+        turns = await fetch_all('''
+            SELECT role, content, created_at FROM session_turns
+            WHERE session_id = ? AND seq >= ? ORDER BY seq
+        ''', (session_id, (row['turn_count'] or 0) - max_turns))
+        return {
+            "turns": [dict(turn) for turn in turns],
+            "question_index": row['question_index'] or 0,
+            "has_greeted": bool(row['has_greeted']),
+            "version": row['state_version'] or 0,
+            "last_activity": row['last_activity'],
+        }
+
+    async def save(self, snapshots: List[Dict[str, Any]]) -> List[int]:
+        """Write a batch of snapshots in one writer transaction; returns the new versions"""
+        return await run_write_async(lambda conn: [self._save_one(conn, snap) for snap in snapshots])
+
+    @staticmethod
+    def _save_one(conn, snap: Dict[str, Any]) -> int:
+        session_id = snap["session_id"]
+        row = conn.execute(
+            "SELECT state_version, turn_count FROM user_sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        seq = 0
+        if row is not None and snap["fresh"]:
+            # A restarted interview under the same id starts a new transcript
+            conn.execute("DELETE FROM session_turns WHERE session_id = ?", (session_id,))
+        elif row is not None:
+            seq = row['turn_count'] or 0
+        conn.executemany('''
+            INSERT INTO session_turns (session_id, seq, role, content, created_at, elapsed_ms)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', [(session_id, seq + i, turn["role"], turn["content"], turn["created_at"], turn["elapsed_ms"])
+              for i, turn in enumerate(snap["turns"])])
+        turn_count = seq + len(snap["turns"])
+
+        if row is None:
+            conn.execute('''
+                INSERT INTO user_sessions
+                (session_id, conversation_history, question_index, has_greeted, state_version, last_activity, turn_count)
+                VALUES (?, NULL, ?, ?, 1, ?, ?)
+            ''', (session_id, snap["question_index"], snap["has_greeted"], snap["last_activity"], turn_count))
+            return 1
+
+        version = (row['state_version'] or 0) + 1
+        conn.execute('''
+            UPDATE user_sessions
+            SET question_index = ?, has_greeted = ?, state_version = ?, last_activity = ?, turn_count = ?
+            WHERE session_id = ?
+        ''', (snap["question_index"], snap["has_greeted"], version, snap["last_activity"], turn_count, session_id))
+        return version
+
+
+SESSION_BACKENDS = {
+    "memory": MemorySessionBackend,
+    "sqlite": SQLiteSessionBackend,
+}
+
+
+def session_backend_from_env():
+    name = os.getenv("SESSION_BACKEND", "sqlite").lower()
+    if name not in SESSION_BACKENDS:
+        raise ValueError(f"Unknown SESSION_BACKEND {name!r}, expected one of {sorted(SESSION_BACKENDS)}")
+    return SESSION_BACKENDS[name]()
+
+
+# ==================== STORE ====================
+class SessionStore:
+    """Bounded interview session store with idle-TTL and capacity eviction.
+
+    Records are kept in least-recently-active order, so both eviction
+    rules only ever look at the front of the map. A background reaper
+    drops idle sessions every `reap_interval_s`.
+
+    With a persistent backend the store is a write-behind cache: changes
+    mark the record dirty and a flusher saves dirty records in batches.
+    `ensure()` rehydrates a session this worker has not seen (or whose
+    stored copy is newer), so any worker can serve any turn.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = env_int("SESSION_MAX_SESSIONS", 5000),
+        idle_ttl_s: int = env_int("SESSION_IDLE_TTL_S", 3600),
+        max_turns: int = env_int("SESSION_MAX_TURNS", 40),
+        reap_interval_s: int = env_int("SESSION_REAP_INTERVAL_S", 60),
+        flush_interval_ms: int = env_int("SESSION_FLUSH_INTERVAL_MS", 200),
+        flush_batch: int = env_int("SESSION_FLUSH_BATCH", 64),
+        backend=None,
+    ):
+        self.max_sessions = max(1, max_sessions)
+        self.idle_ttl = max(1, idle_ttl_s)
+        self.max_turns = max(1, max_turns)
+        self.reap_interval = max(1, reap_interval_s)
+        self.flush_interval = max(1, flush_interval_ms) / 1000.0
+        self.flush_batch = max(1, flush_batch)
+        self.backend = backend if backend is not None else session_backend_from_env()
+        self._records: "OrderedDict[str, SessionRecord]" = OrderedDict()
+        self._dirty: "OrderedDict[str, SessionRecord]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._reaper: Optional[asyncio.Task] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self._flush_wakeup: Optional[asyncio.Event] = None
+        self._bytes = 0
+        self.evicted_idle = 0
+        self.evicted_capacity = 0
+        self.rehydrated = 0
+        self.stale_reloads = 0
+        self.flushes = 0
+        self.flushed_sessions = 0
+        self.flush_errors = 0
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._records
+
+    def get(self, session_id: str) -> Optional[SessionRecord]:
+        return self._records.get(session_id)
+
+    def create(self, session_id: str) -> SessionRecord:
+        """Start a fresh record, replacing any existing one"""
+        with self._lock:
+            self._dirty.pop(session_id, None)
+            record = SessionRecord(session_id, self.max_turns)
+            self._install(record)
+            self.mark_dirty(session_id)
+            return record
+
+    def _install(self, record: SessionRecord):
+        self._discard(record.session_id)
+        self._records[record.session_id] = record
+        self._bytes += record.size()
+        while len(self._records) > self.max_sessions:
+            oldest = next(iter(self._records))
+            self._discard(oldest)
+            self.evicted_capacity += 1
+
+    def get_or_create(self, session_id: str) -> SessionRecord:
+        record = self._records.get(session_id)
+        return record if record is not None else self.create(session_id)
+
+    def add_turn(self, session_id: str, role: str, content: str) -> SessionRecord:
+        with self._lock:
+            record = self.get_or_create(session_id)
+            self._bytes += record.add_turn(role, content)
+            self._records.move_to_end(session_id)
+            if self.backend.persistent:
+                record.pending.append(record.turns[-1])
+            self.mark_dirty(session_id)
+            return record
+
+    def mark_dirty(self, session_id: str):
+        """Queue a record for the next write-behind flush"""
+        if not self.backend.persistent:
+            return
+        with self._lock:
+            record = self._records.get(session_id)
+            if record is None:
+                return
+            self._dirty[session_id] = record
+            if len(self._dirty) >= self.flush_batch and self._flush_wakeup is not None:
+                self._flush_wakeup.set()
+
+    def touch(self, session_id: str):
+        with self._lock:
+            record = self._records.get(session_id)
+            if record is not None:
+                record.last_activity = time.time()
+                self._records.move_to_end(session_id)
+
+    def remove(self, session_id: str):
+        with self._lock:
+            self._discard(session_id)
+
+    def _discard(self, session_id: str):
+        # Dirty records stay referenced from _dirty, so eviction never loses unflushed turns
+        record = self._records.pop(session_id, None)
+        if record is not None:
+            self._bytes -= record.size()
+
+    def evict_idle(self, now: Optional[float] = None) -> int:
+        """Drop every session idle for longer than the TTL"""
+        cutoff = (now or time.time()) - self.idle_ttl
+        evicted = 0
+        with self._lock:
+            while self._records:
+                session_id, record = next(iter(self._records.items()))
+                if record.last_activity > cutoff:
+                    break
+                self._discard(session_id)
+                evicted += 1
+        self.evicted_idle += evicted
+        return evicted
+
+    # ==================== REHYDRATION ====================
+    async def ensure(self, session_id: str) -> Optional[SessionRecord]:
+        """Return the current record, loading it from the backend on a miss or when stale"""
+        record = self._records.get(session_id)
+        if not self.backend.persistent:
+            return record
+
+        with self._lock:
+            dirty = self._dirty.get(session_id)
+            if dirty is not None:
+                # This worker holds unflushed changes, so its copy is the newest
+                if record is not dirty:
+                    self._install(dirty)
+                return dirty
+
+        stored_version = await self.backend.version(session_id)
+        if stored_version is None or (record is not None and stored_version <= record.version):
+            return record
+
+        state = await self.backend.load(session_id, self.max_turns)
+        with self._lock:
+            if session_id in self._dirty or state is None:
+                # Written locally while we were reading; keep the local copy
+                return self._records.get(session_id)
+            loaded = SessionRecord(session_id, self.max_turns)
+            for turn in state["turns"]:
+                loaded.add_turn(turn["role"], turn["content"], turn["created_at"])
+            loaded.question_index = state["question_index"]
+            loaded.has_greeted = state["has_greeted"]
+            loaded.version = state["version"]
+            loaded.fresh = False
+            loaded.last_activity = time.time()
+            self._install(loaded)
+        if record is None:
+            self.rehydrated += 1
+        else:
+            self.stale_reloads += 1
+        return loaded
+
+    # ==================== WRITE-BEHIND ====================
+    @staticmethod
+    def _snapshot(record: SessionRecord) -> Dict[str, Any]:
+        snapshot = {
+            "session_id": record.session_id,
+            "turns": [turn.to_record() for turn in record.pending],
+            "question_index": record.question_index,
+            "has_greeted": record.has_greeted,
+            "last_activity": record.last_activity,
+            "fresh": record.fresh,
+            "_pending": record.pending,
+        }
+        record.pending = []
+        record.fresh = False
+        return snapshot
+
+    async def flush(self) -> int:
+        """Persist every dirty record in one backend batch; returns the number saved"""
+        with self._lock:
+            if not self._dirty:
+                return 0
+            records = list(self._dirty.values())
+            self._dirty.clear()
+            snapshots = [self._snapshot(record) for record in records]
+
+        try:
+            versions = await self.backend.save(snapshots)
+        except Exception as e:
+            self.flush_errors += 1
+            logger.error(f"❌ Failed to persist {len(records)} interview session(s): {e}")
+            with self._lock:
+                for record, snapshot in zip(records, snapshots):
+                    record.pending[:0] = snapshot["_pending"]
+                    record.fresh = record.fresh or snapshot["fresh"]
+                    self._dirty.setdefault(record.session_id, record)
+            return 0
+
+        for record, version in zip(records, versions):
+            record.version = max(record.version, version)
+        self.flushes += 1
+        self.flushed_sessions += len(records)
+        return len(records)
+
+    async def _flush_forever(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_wakeup.clear()
+            await self.flush()
+
+    # ==================== BACKGROUND TASKS ====================
+    def start(self):
+        if self._reaper is None:
+            self._reaper = asyncio.ensure_future(self._reap_forever())
+        if self.backend.persistent and self._flusher is None:
+            self._flush_wakeup = asyncio.Event()
+            self._flusher = asyncio.ensure_future(self._flush_forever())
+
+    async def stop(self):
+        for task in (self._reaper, self._flusher):
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._reaper = None
+        self._flusher = None
+        # Last flush so a clean shutdown never drops buffered turns
+        await self.flush()
+
+    async def _reap_forever(self):
+        while True:
+            await asyncio.sleep(self.reap_interval)
+            evicted = self.evict_idle()
+            if evicted:
+                logger.info(f"🧹 Reaped {evicted} idle interview session(s), {len(self._records)} live")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.backend.name,
+            "live_sessions": len(self._records),
+            "max_sessions": self.max_sessions,
+            "approx_bytes": self._bytes,
+            "evicted_idle": self.evicted_idle,
+            "evicted_capacity": self.evicted_capacity,
+            "dirty_sessions": len(self._dirty),
+            "flushes": self.flushes,
+            "flushed_sessions": self.flushed_sessions,
+            "flush_errors": self.flush_errors,
+            "rehydrated": self.rehydrated,
+            "stale_reloads": self.stale_reloads,
+        }
+
+    def recent_turns(self, session_id: str) -> List[Turn]:
+        record = self._records.get(session_id)
+        return list(record.turns) if record is not None else []
+
+
+# ==================== TRANSCRIPTS ====================
+TRANSCRIPT_PAGE_MAX = 500
+
+
+async def transcript_page(session_id: str, after_seq: int = -1, limit: int = 100) -> List[Dict[str, Any]]:
+    """Turns after `after_seq` in order; pass the last seq back to get the next page.
+
+    Keyset pagination seeks straight to (session_id, seq) on the unique
+    index, so page N costs the same as page 1.
+    """
+    rows = await fetch_all('''
+        SELECT seq, role, content, created_at, elapsed_ms FROM session_turns
+        WHERE session_id = ? AND seq > ? ORDER BY seq LIMIT ?
+    ''', (session_id, after_seq, max(1, min(limit, TRANSCRIPT_PAGE_MAX))))
+    return [dict(row) for row in rows]
+
+
+async def iter_transcript(session_id: str, page_size: int = 200) -> AsyncIterator[Dict[str, Any]]:
+    """Every turn of a session, read lazily one page at a time"""
+    after_seq = -1
+    while True:
+        page = await transcript_page(session_id, after_seq, page_size)
+        for turn in page:
+            yield turn
+        if len(page) < page_size:
+            return
+        after_seq = page[-1]["seq"]
@@ -0,0 +1,160 @@
+import re
+import time
+import asyncio
+import difflib
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from pipeline import env_int
+
+logger = logging.getLogger("backend")
+
+# Rendered follow-up: (question, audio, visemes)
+Prefetched = Tuple[str, bytes, List[Dict[str, Any]]]
+
+
+def _words(text: str) -> List[str]:
+    return re.findall(r"[a-z0-9']+", text.lower())
+
+
+class Speculation:
+    __slots__ = ("session_id", "turn", "text", "words", "task", "started_at")
+
+    def __init__(self, session_id: str, turn: int, text: str, task: asyncio.Task):
+        self.session_id = session_id
+        self.turn = turn
+        self.text = text
+        self.words = _words(text)
+        self.task = task
+        self.started_at = time.monotonic()
+
+
+class SpeculativePrefetcher:
+    """Precompute the next question and its audio from partial transcripts.
+
+    While an answer is still streaming in, `speculate` runs the follow-up
+    generation and TTS for the current partial, keyed by (session, turn).
+    When the final transcript arrives, `claim` serves that result if the
+    transcript matches the partial closely enough (word-level similarity
+    of at least `match_pct`); otherwise the speculation is cancelled and
+    the caller takes the normal path. Each session has at most one live
+    speculation, and a newer partial that differs replaces it, up to
+    `max_per_turn` speculations per answer. A long answer drifts past the
+    match threshold every fifth or so of its length, and each speculation
+    is a full Gemini, TTS and viseme job sharing capacity with real turns.
+    """
+
+    def __init__(
+        self,
+        generate: Callable[[str, str], Awaitable[Optional[str]]],
+        render: Callable[[str], Awaitable[Tuple[bytes, List[Dict[str, Any]]]]],
+        min_words: int = env_int("SPECULATE_MIN_WORDS", 6),
+        match_pct: int = env_int("SPECULATE_MATCH_PCT", 90),
+        max_per_turn: int = env_int("SPECULATE_MAX_PER_TURN", 3),
+        enabled: bool = env_int("SPECULATE_ENABLED", 1) == 1,
+    ):
+        self._generate = generate
+        self._render = render
+        self.min_words = max(1, min_words)
+        self.match_ratio = match_pct / 100.0
+        self.max_per_turn = max(1, max_per_turn)
+        self.enabled = enabled
+        self._live: Dict[str, Speculation] = {}
+        # (turn, speculations started in it) per session
+        self._spent: Dict[str, Tuple[int, int]] = {}
+        self.started = 0
+        self.superseded = 0
+        self.capped = 0
+        self.hits = 0
+        self.misses = 0
+        self.failed = 0
+
+    def _similar(self, words: List[str], other: List[str]) -> bool:
+        return difflib.SequenceMatcher(None, words, other, autojunk=False).ratio() >= self.match_ratio
+
+    def speculate(self, session_id: str, turn: int, partial: str) -> bool:
+        """Start (or keep) a speculation for this partial; returns True if a new one started"""
+        if not self.enabled:
+            return False
+        words = _words(partial)
+        if len(words) < self.min_words:
+            return False
+
+        current = self._live.get(session_id)
+        if current is not None:
+            if current.turn == turn and self._similar(current.words, words):
+                return False
+        spent_turn, spent = self._spent.get(session_id, (turn, 0))
+        spent = spent if spent_turn == turn else 0
+        if spent >= self.max_per_turn:
+            # Out of budget for this answer; the final transcript takes the normal path
+            self.capped += 1
+            return False
+        if current is not None:
+            self._cancel(current)
+            self.superseded += 1
+
+        task = asyncio.ensure_future(self._run(partial, session_id))
+        self._live[session_id] = Speculation(session_id, turn, partial, task)
+        self._spent[session_id] = (turn, spent + 1)
+        self.started += 1
+        return True
+
+    async def _run(self, partial: str, session_id: str) -> Optional[Prefetched]:
+        question = await self._generate(partial, session_id)
+        if not question:
+            return None
+        audio, visemes = await self._render(question)
+        return question, audio, visemes
+
+    async def claim(self, session_id: str, turn: int, final: str) -> Optional[Prefetched]:
+        """The prefetched follow-up if it was speculated from (nearly) this transcript"""
+        self._spent.pop(session_id, None)
+        current = self._live.pop(session_id, None)
+        if current is None:
+            return None
+        if current.turn != turn or not self._similar(current.words, _words(final)):
+            self._cancel(current)
+            self.misses += 1
+            return None
+
+        try:
+            result = await current.task
+        except Exception as e:
+            logger.warning(f"⚠️ Speculative follow-up failed for {session_id}: {e}")
+            result = None
+        if result is None:
+            self.failed += 1
+            return None
+        self.hits += 1
+        logger.info(f"⚡ Served speculative follow-up for {session_id} "
+                    f"({int((time.monotonic() - current.started_at) * 1000)} ms after speculation began)")
+        return result
+
+    def discard(self, session_id: str):
+        self._spent.pop(session_id, None)
+        current = self._live.pop(session_id, None)
+        if current is not None:
+            self._cancel(current)
+
+    @staticmethod
+    def _cancel(speculation: Speculation):
+        if not speculation.task.done():
+            speculation.task.cancel()
+        elif not speculation.task.cancelled():
+            # Retrieve the outcome so a failed speculation is not reported as unhandled
+            speculation.task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        claims = self.hits + self.misses + self.failed
+        return {
+            "enabled": self.enabled,
+            "live": len(self._live),
+            "started": self.started,
+            "superseded": self.superseded,
+            "capped": self.capped,
+            "hits": self.hits,
+            "misses": self.misses,
+            "failed": self.failed,
+            "hit_rate": round(self.hits / claims, 4) if claims else 0.0,
+        }
@@ -0,0 +1,179 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, List, Optional
+
+import numpy as np
+
+from pipeline import env_int
+
+logger = logging.getLogger("backend")
+
+SAMPLE_RATE = 16000
+FRAME_SAMPLES = SAMPLE_RATE * 30 // 1000  # 30 ms VAD frames
+
+
+class StreamingTranscriber:
+    """Incremental transcription of one answer while it is being spoken.
+
+    Audio arrives as 16 kHz mono PCM16 chunks. A simple energy VAD watches
+    the uncommitted tail; every pause of `pause_ms` commits the speech
+    before it and sends that segment for transcription straight away, so
+    by the time the candidate stops talking only the last phrase is left.
+    While speech continues, the newest `window_s` seconds are re-decoded
+    every `partial_interval_ms` to produce a live partial hypothesis.
+    """
+
+    def __init__(
+        self,
+        transcribe: Callable[[np.ndarray], Awaitable[str]],
+        on_partial: Optional[Callable[[str], Awaitable[None]]] = None,
+        pause_ms: int = env_int("STREAM_ASR_PAUSE_MS", 300),
+        window_s: int = env_int("STREAM_ASR_WINDOW_S", 10),
+        partial_interval_ms: int = env_int("STREAM_ASR_PARTIAL_MS", 1000),
+        max_segment_s: int = env_int("STREAM_ASR_MAX_SEGMENT_S", 20),
+        energy_threshold: float = 0.01,
+    ):
+        self.transcribe = transcribe
+        self.on_partial = on_partial
+        self.pause_frames = max(1, pause_ms * SAMPLE_RATE // 1000 // FRAME_SAMPLES)
+        self.window_samples = window_s * SAMPLE_RATE
+        self.partial_interval = partial_interval_ms * SAMPLE_RATE // 1000
+        self.max_segment_samples = max_segment_s * SAMPLE_RATE
+        self.energy_threshold = energy_threshold
+
+        self._reset_state()
+
+    # ==================== INPUT ====================
+    def _append(self, data: bytes):
+        data = self._remainder + data
+        usable = len(data) - (len(data) % 2)
+        self._remainder = data[usable:]
+        if usable:
+            pcm = np.frombuffer(data[:usable], dtype="<i2").astype(np.float32) / 32768.0
+            self._chunks.append(pcm)
+
+    def _materialize(self) -> np.ndarray:
+        if self._chunks:
+            self._audio = np.concatenate([self._audio] + self._chunks)
+            self._chunks = []
+        return self._audio
+
+    async def feed(self, data: bytes):
+        """Add a chunk of PCM16 audio and commit any finished phrases"""
+        self._append(data)
+        audio = self._materialize()
+
+        # Energy VAD over whole frames that have not been scanned yet
+        n_frames = (audio.size - self._scanned_upto) // FRAME_SAMPLES
+        if n_frames > 0:
+            frames = audio[self._scanned_upto:self._scanned_upto + n_frames * FRAME_SAMPLES].reshape(n_frames, FRAME_SAMPLES)
+            voiced = np.sqrt(np.mean(frames * frames, axis=1)) > self.energy_threshold
+            for i, is_voiced in enumerate(voiced):
+                frame_end = self._scanned_upto + (i + 1) * FRAME_SAMPLES
+                if is_voiced:
+                    self._heard_speech = True
+                    self._silent_frames = 0
+                    self._last_speech_end = frame_end
+                else:
+                    self._silent_frames += 1
+                    if self._heard_speech and self._silent_frames == self.pause_frames:
+                        self._commit(self._last_speech_end, frame_end)
+                    elif not self._heard_speech:
+                        # Skip leading silence but keep a short lead-in before the next word
+                        self._committed_upto = max(self._committed_upto, frame_end - 3 * FRAME_SAMPLES)
+            self._scanned_upto += n_frames * FRAME_SAMPLES
+
+        # Never let one unbroken stretch of speech grow past the segment cap
+        if self._heard_speech and audio.size - self._committed_upto >= self.max_segment_samples:
+            self._commit(audio.size, audio.size)
+
+        if self.on_partial and audio.size - self._last_partial_at >= self.partial_interval:
+            self._last_partial_at = audio.size
+            if self._partial_task is None or self._partial_task.done():
+                self._partial_task = asyncio.ensure_future(self._emit_partial())
+
+        self._compact()
+
+    def _compact(self):
+        # Committed audio is never read again, so keep the buffer to the open tail
+        drop = self._committed_upto
+        if drop < SAMPLE_RATE:
+            return
+        self._audio = self._audio[drop:]
+        self._committed_upto = 0
+        self._scanned_upto -= drop
+        self._last_speech_end = max(0, self._last_speech_end - drop)
+        self._last_partial_at = max(0, self._last_partial_at - drop)
+
+    # ==================== SEGMENTS ====================
+    def _commit(self, speech_end: int, resume_at: int):
+        segment = self._audio[self._committed_upto:speech_end]
+        self._committed_upto = resume_at
+        self._heard_speech = False
+        if segment.size:
+            self._segments.append(asyncio.ensure_future(self.transcribe(segment)))
+
+    async def _committed_text(self, done_only: bool = False) -> str:
+        parts = []
+        for task in self._segments:
+            if done_only and not task.done():
+                break
+            try:
+                text = await task
+            except Exception as e:
+                text = ""
+                if not done_only:
+                    # Only the final pass counts losses; partials just skip the gap
+                    logger.error(f"❌ Streaming segment transcription failed: {e}")
+                    self.lost_segments += 1
+                    self.last_error = e
+            if text:
+                parts.append(text)
+        return " ".join(parts)
+
+    async def _emit_partial(self):
+        try:
+            start = max(self._committed_upto, self._audio.size - self.window_samples)
+            tail = self._audio[start:]
+            tail_text = await self.transcribe(tail) if self._heard_speech and tail.size else ""
+            committed = await self._committed_text(done_only=True)
+            await self.on_partial(" ".join(t for t in (committed, tail_text) if t))
+        except Exception as e:
+            logger.warning(f"⚠️ Partial transcript skipped: {e}")
+
+    async def finish(self) -> str:
+        """Commit the last phrase and return the full transcript.
+
+        Segments whose transcription failed are left out; `lost_segments`
+        and `last_error` say how many and why, so the caller can tell the
+        client the transcript is incomplete.
+        """
+        self._materialize()
+        if self._partial_task is not None and not self._partial_task.done():
+            self._partial_task.cancel()
+        if self._heard_speech:
+            self._commit(self._last_speech_end or self._audio.size, self._audio.size)
+        return await self._committed_text()
+
+    def reset(self):
+        """Drop all audio so the same connection can record the next answer"""
+        for task in self._segments:
+            task.cancel()
+        if self._partial_task is not None:
+            self._partial_task.cancel()
+        self._reset_state()
+
+    def _reset_state(self):
+        self._chunks: List[np.ndarray] = []
+        self._audio = np.zeros(0, dtype=np.float32)
+        self._remainder = b""
+        self._committed_upto = 0      # samples already handed to a segment
+        self._scanned_upto = 0        # samples already run through the VAD
+        self._last_speech_end = 0     # end of the most recent voiced frame
+        self._silent_frames = 0
+        self._heard_speech = False
+        self._last_partial_at = 0
+        self._partial_task: Optional[asyncio.Task] = None
+        self._segments: List[asyncio.Task] = []
+        self.lost_segments = 0
+        self.last_error: Optional[Exception] = None
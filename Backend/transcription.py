@@ -0,0 +1,186 @@
+import os
+import asyncio
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from flight_recorder import note
+from metrics import STAGE_SECONDS
+from pipeline import env_int, process_context
+
+logger = logging.getLogger("backend")
+
+_asr_seconds = STAGE_SECONDS.labels("asr")
+
+SAMPLE_RATE = 16000
+# Whisper decodes fixed 30 s windows, so only clips that fit in one window can share a batch
+BATCHABLE_SAMPLES = 30 * SAMPLE_RATE
+
+# ==================== WORKER PROCESS ====================
+# Populated once per worker process by the pool initializer
+_model = None
+_model_name = None
+
+def _init_worker(model_name: str):
+    """Load the Whisper model once when a worker process starts"""
+    global _model, _model_name
+    import whisper
+    _model_name = model_name
+    _model = whisper.load_model(model_name)
+
+def _worker_ready() -> str:
+    return _model_name
+
+def _transcribe_batch(clips: List[np.ndarray], language: str) -> List[str]:
+    """Transcribe a micro-batch of clips inside a worker process"""
+    import torch
+    import whisper
+
+    texts = [""] * len(clips)
+    short_ids = [i for i, clip in enumerate(clips) if 0 < clip.size <= BATCHABLE_SAMPLES]
+    long_ids = [i for i, clip in enumerate(clips) if clip.size > BATCHABLE_SAMPLES]
+
+    if short_ids:
+        n_mels = getattr(_model.dims, "n_mels", 80)
+        mels = torch.stack([
+            whisper.log_mel_spectrogram(whisper.pad_or_trim(clips[i]), n_mels=n_mels)
+            for i in short_ids
+        ]).to(_model.device)
+        options = whisper.DecodingOptions(language=language, fp16=False, without_timestamps=True)
+        for i, result in zip(short_ids, whisper.decode(_model, mels, options)):
+            texts[i] = result.text.strip()
+
+    for i in long_ids:
+        texts[i] = _model.transcribe(clips[i], language=language, fp16=False).get("text", "").strip()
+
+    return texts
+
+# ==================== SERVICE ====================
+class TranscriptionService:
+    """Shared Whisper service with dynamic cross-session micro-batching.
+
+    The model is loaded once per worker process when the pool starts.
+    Requests from every session land on one queue; the batcher drains up
+    to `max_batch` clips, waiting at most `max_wait_ms` for stragglers,
+    and hands each batch to a free worker.
+    """
+
+    def __init__(
+        self,
+        model_name: str = os.getenv("WHISPER_MODEL", "base"),
+        processes: int = env_int("ASR_PROCESSES", 1),
+        max_batch: int = env_int("ASR_MAX_BATCH", 8),
+        max_wait_ms: int = env_int("ASR_MAX_WAIT_MS", 40),
+        language: str = os.getenv("ASR_LANGUAGE", "en"),
+    ):
+        self.model_name = model_name
+        self.processes = max(1, processes)
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0, max_wait_ms) / 1000.0
+        self.language = language
+        self.pool: Optional[ProcessPoolExecutor] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._batcher: Optional[asyncio.Task] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self.batches = 0
+        self.clips = 0
+
+    async def start(self):
+        """Spin up the worker processes and wait until every model is loaded"""
+        if self.pool is not None:
+            return
+        self.pool = ProcessPoolExecutor(
+            max_workers=self.processes,
+            mp_context=process_context(),
+            initializer=_init_worker,
+            initargs=(self.model_name,)
+        )
+        self._queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self.processes)
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        await asyncio.gather(*[loop.run_in_executor(self.pool, _worker_ready) for _ in range(self.processes)])
+        logger.info(f"✅ Whisper '{self.model_name}' warm in {self.processes} process(es) ({time.perf_counter() - started:.1f}s)")
+        self._batcher = asyncio.ensure_future(self._run_batcher())
+
+    async def stop(self):
+        if self._batcher is not None:
+            self._batcher.cancel()
+            self._batcher = None
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
+
+    async def transcribe(self, pcm: np.ndarray) -> str:
+        """Queue one clip of 16 kHz mono PCM and wait for its text"""
+        if pcm.size == 0:
+            return ""
+        if self.pool is None:
+            await self.start()
+        started = time.perf_counter()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((pcm, future))
+        text = await future
+        # Batching wait included: that is what the turn pays
+        elapsed = time.perf_counter() - started
+        _asr_seconds.observe(elapsed)
+        note("asr", elapsed)
+        return text
+
+    async def _next_batch(self) -> List[Tuple[np.ndarray, asyncio.Future]]:
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        return [(pcm, future) for pcm, future in batch if not future.cancelled()]
+
+    async def _run_batcher(self):
+        while True:
+            await self._slots.acquire()
+            try:
+                batch = await self._next_batch()
+            except asyncio.CancelledError:
+                self._slots.release()
+                raise
+            if not batch:
+                self._slots.release()
+                continue
+            asyncio.ensure_future(self._dispatch(batch))
+
+    async def _dispatch(self, batch: List[Tuple[np.ndarray, asyncio.Future]]):
+        try:
+            loop = asyncio.get_running_loop()
+            texts = await loop.run_in_executor(self.pool, _transcribe_batch, [pcm for pcm, _ in batch], self.language)
+            self.batches += 1
+            self.clips += len(batch)
+            for (_, future), text in zip(batch, texts):
+                if not future.done():
+                    future.set_result(text)
+        except Exception as e:
+            logger.error(f"❌ Whisper batch of {len(batch)} failed: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            self._slots.release()
+
+    def stats(self):
+        return {
+            "model": self.model_name,
+            "processes": self.processes,
+            "max_batch": self.max_batch,
+            "max_wait_ms": int(self.max_wait * 1000),
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "batches": self.batches,
+            "clips": self.clips,
+            "avg_batch_size": round(self.clips / self.batches, 2) if self.batches else 0.0,
+        }
@@ -0,0 +1,186 @@
+import os
+import json
+import hashlib
+import logging
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Optional, Set
+
+from metrics import STAGE_SECONDS
+from pipeline import env_int
+
+logger = logging.getLogger("backend")
+
+_tts_seconds = STAGE_SECONDS.labels("tts")
+
+
+class TTSCache:
+    """Content-addressed TTS audio cache: bounded memory LRU over a disk store.
+
+    Entries are keyed by a hash of (text, voice, language, format), so the
+    same prompt is synthesized once and then served from memory, or from
+    disk after a restart. Concurrent misses on one key share a single
+    synthesis call.
+
+    Only pinned text is cached: the fixed prompts handed to `prewarm`.
+    Everything else (generated questions, speculative follow-ups) is said
+    once, so it is synthesized straight through and never stored, which
+    keeps the disk store as small as the prompt set and the LRU free of
+    one-off entries.
+    """
+
+    def __init__(
+        self,
+        synthesize: Callable[..., bytes],
+        cache_dir: str = os.getenv("TTS_CACHE_DIR", "tts_cache"),
+        max_entries: int = env_int("TTS_CACHE_MAX_ENTRIES", 512),
+        max_bytes: int = env_int("TTS_CACHE_MAX_BYTES", 64 * 1024 * 1024),
+        fmt: str = "mp3",
+    ):
+        self._synthesize = synthesize
+        self.cache_dir = cache_dir
+        self.max_entries = max(1, max_entries)
+        self.max_bytes = max(1, max_bytes)
+        self.fmt = fmt
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, threading.Lock] = {}
+        self._pinned: Set[str] = set()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.errors = 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def key(self, text: str, voice: str, lang: str) -> str:
+        payload = json.dumps([text, voice, lang, self.fmt], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.{self.fmt}")
+
+    def pin(self, texts: Iterable[str], lang: str = "en", voice: str = "com"):
+        """Mark text as worth caching"""
+        keys = {self.key(text, voice, lang) for text in texts}
+        with self._lock:
+            self._pinned |= keys
+
+    def _call(self, text: str, lang: str, voice: str) -> bytes:
+        started = time.perf_counter()
+        audio = self._synthesize(text, lang=lang, tld=voice)
+        _tts_seconds.observe(time.perf_counter() - started)
+        return audio
+
+    # ==================== MEMORY TIER ====================
+    def _memory_get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            audio = self._memory.get(key)
+            if audio is not None:
+                self._memory.move_to_end(key)
+            return audio
+
+    def _memory_put(self, key: str, audio: bytes):
+        if len(audio) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._memory.pop(key, None)
+            if previous is not None:
+                self._memory_bytes -= len(previous)
+            self._memory[key] = audio
+            self._memory_bytes += len(audio)
+            while len(self._memory) > self.max_entries or self._memory_bytes > self.max_bytes:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_bytes -= len(evicted)
+
+    # ==================== DISK TIER ====================
+    def _disk_get(self, key: str) -> Optional[bytes]:
+        try:
+            with open(self._path(key), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _disk_put(self, key: str, audio: bytes):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temp file first so readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(audio)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    # ==================== LOOKUP ====================
+    def synthesize(self, text: str, lang: str = "en", voice: str = "com") -> bytes:
+        """Return audio for text, synthesizing only on a miss in both tiers; unpinned text skips both"""
+        key = self.key(text, voice, lang)
+        if key not in self._pinned:
+            self.bypassed += 1
+            return self._call(text, lang, voice)
+        audio = self._memory_get(key)
+        if audio is not None:
+            self.memory_hits += 1
+            return audio
+
+        with self._lock:
+            key_lock = self._inflight.setdefault(key, threading.Lock())
+        with key_lock:
+            try:
+                audio = self._memory_get(key)
+                if audio is not None:
+                    self.memory_hits += 1
+                    return audio
+
+                audio = self._disk_get(key)
+                if audio is not None:
+                    self.disk_hits += 1
+                    self._memory_put(key, audio)
+                    return audio
+
+                self.misses += 1
+                audio = self._call(text, lang, voice)
+                self._memory_put(key, audio)
+                try:
+                    self._disk_put(key, audio)
+                except OSError as e:
+                    logger.warning(f"⚠️ TTS cache disk write failed: {e}")
+                return audio
+            finally:
+                with self._lock:
+                    self._inflight.pop(key, None)
+
+    def prewarm(self, texts: Iterable[str], lang: str = "en", voice: str = "com") -> int:
+        """Pin every static prompt and make sure it is cached; returns how many are ready"""
+        texts = list(texts)
+        self.pin(texts, lang=lang, voice=voice)
+        ready = 0
+        for text in texts:
+            try:
+                self.synthesize(text, lang=lang, voice=voice)
+                ready += 1
+            except Exception as e:
+                self.errors += 1
+                logger.warning(f"⚠️ TTS prewarm failed for '{text[:40]}': {e}")
+        logger.info(f"✅ TTS cache prewarmed {ready} prompt(s)")
+        return ready
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "entries": len(self._memory),
+            "memory_bytes": self._memory_bytes,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "errors": self.errors,
+            "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+        }
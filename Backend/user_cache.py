@@ -0,0 +1,89 @@
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from pipeline import env_int
+
+
+class UserPrincipalCache:
+    """Bounded TTL cache of verified user principals keyed by token subject.
+
+    Only verified users are cached, so the hot auth path skips the users
+    table until the entry expires or one of the invalidation hooks fires.
+    The cache is per process; the TTL bounds staleness across workers.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: int = env_int("USER_CACHE_TTL_S", 60),
+        max_entries: int = env_int("USER_CACHE_MAX_ENTRIES", 10000),
+    ):
+        self.ttl = max(0, ttl_seconds)
+        self.max_entries = max(1, max_entries)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, subject: str) -> Optional[Any]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(subject)
+            if entry is None:
+                self.misses += 1
+                return None
+            principal, expires_at = entry
+            if expires_at <= now:
+                del self._entries[subject]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(subject)
+            self.hits += 1
+            return principal
+
+    def put(self, subject: str, principal: Any):
+        if self.ttl == 0:
+            return
+        with self._lock:
+            self._entries[subject] = (principal, time.monotonic() + self.ttl)
+            self._entries.move_to_end(subject)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, subject: str):
+        with self._lock:
+            if self._entries.pop(subject, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+
+    # ==================== INVALIDATION HOOKS ====================
+    def on_user_verified(self, email: str):
+        self.invalidate(email)
+
+    def on_password_changed(self, email: str):
+        self.invalidate(email)
+
+    def on_user_deleted(self, email: str):
+        self.invalidate(email)
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "expirations": self.expirations,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
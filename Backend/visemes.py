@@ -0,0 +1,182 @@
+import io
+import re
+import logging
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger("backend")
+
+# Viseme ids understood by the avatar (see rhubarbToMorph in Interview.jsx)
+VISEME_MORPHS = {
+    "X": "viseme_sil", "A": "viseme_aa", "B": "viseme_PP", "C": "viseme_CH",
+    "D": "viseme_DD", "E": "viseme_E", "F": "viseme_FF", "G": "viseme_kk",
+    "H": "viseme_TH", "I": "viseme_I", "O": "viseme_O", "U": "viseme_U",
+    "R": "viseme_RR", "S": "viseme_SS", "N": "viseme_nn",
+}
+
+HOP_MS = 10
+WINDOW_MS = 25
+MIN_EVENT_MS = 60
+
+# Grapheme -> viseme, longest match first
+DIGRAPHS = {
+    "ch": "C", "sh": "C", "th": "H", "ph": "F", "ng": "N", "ck": "G", "qu": "G",
+    "ee": "I", "ea": "I", "oo": "U", "ou": "O", "ow": "O", "oa": "O", "ai": "E", "ay": "E",
+}
+LETTERS = {
+    "a": "A", "e": "E", "i": "I", "o": "O", "u": "U", "y": "I",
+    "b": "B", "p": "B", "m": "B", "f": "F", "v": "F",
+    "c": "G", "g": "G", "k": "G", "q": "G", "x": "G",
+    "d": "D", "t": "D", "l": "N", "n": "N",
+    "r": "R", "w": "U", "s": "S", "z": "S", "j": "C", "h": "E",
+}
+
+
+# ==================== AUDIO ====================
+def decode_pcm(audio: bytes) -> Tuple[np.ndarray, int]:
+    """Decode encoded audio (MP3/WAV/OGG) to mono float32 in-process"""
+    import soundfile
+    samples, sample_rate = soundfile.read(io.BytesIO(audio), dtype="float32", always_2d=True)
+    return samples.mean(axis=1), sample_rate
+
+
+def frame_features(pcm: np.ndarray, sample_rate: int) -> Dict[str, np.ndarray]:
+    """Per-frame energy and spectral features in one vectorized pass"""
+    hop = max(1, sample_rate * HOP_MS // 1000)
+    window = max(hop, sample_rate * WINDOW_MS // 1000)
+    if pcm.size < window:
+        pcm = np.pad(pcm, (0, window - pcm.size))
+
+    frames = np.lib.stride_tricks.sliding_window_view(pcm, window)[::hop]
+    rms = np.sqrt(np.mean(frames * frames, axis=1))
+    zcr = np.mean(np.abs(np.diff(np.signbit(frames), axis=1)), axis=1)
+
+    n_fft = 1 << (window - 1).bit_length()
+    spectrum = np.abs(np.fft.rfft(frames * np.hanning(window), n=n_fft, axis=1)) ** 2
+    freqs = np.fft.rfftfreq(n_fft, 1.0 / sample_rate)
+    total = spectrum.sum(axis=1) + 1e-12
+
+    return {
+        "rms": rms,
+        "zcr": zcr,
+        "centroid": (spectrum * freqs).sum(axis=1) / total,
+        "low": spectrum[:, freqs < 500].sum(axis=1) / total,
+        "high": spectrum[:, freqs >= 4000].sum(axis=1) / total,
+    }
+
+
+# ==================== CLASSIFICATION ====================
+def classify_frames(features: Dict[str, np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    """Label each frame with a viseme id from its acoustics; also returns normalized energy"""
+    rms = features["rms"]
+    reference = np.percentile(rms, 95) if rms.size else 0.0
+    energy = np.clip(rms / reference, 0.0, 1.0) if reference > 0 else np.zeros_like(rms)
+    centroid = features["centroid"]
+    zcr = features["zcr"]
+    low = features["low"]
+    high = features["high"]
+
+    silent = energy < 0.08
+    conditions = [
+        silent,
+        (high > 0.35) & (zcr > 0.25),              # sibilants: s, z, sh
+        (high > 0.2) & (energy < 0.35),            # soft fricatives: f, v, th
+        (energy < 0.25) & (low > 0.6),             # nasal hum / lip closure
+        (energy < 0.3),                            # short consonant releases
+        (centroid < 700) & (low > 0.7),            # rounded back vowels
+        (centroid < 1000),                         # open-mid rounded vowels
+        (centroid > 2200),                         # spread front vowels
+        (centroid > 1600),
+    ]
+    choices = ["X", "S", "F", "N", "D", "U", "O", "I", "E"]
+    labels = np.select(conditions, choices, default="A")
+
+    # A dip between two voiced frames reads as a bilabial closure (p, b, m)
+    if labels.size > 2:
+        dip = (energy[1:-1] < 0.2) & (energy[:-2] > 0.35) & (energy[2:] > 0.35)
+        labels[1:-1][dip] = "B"
+    return labels, energy
+
+
+def text_to_visemes(text: str) -> List[str]:
+    """Rough grapheme-to-viseme sequence for aligning against the audio"""
+    sequence = []
+    for word in re.findall(r"[a-z]+", text.lower()):
+        i = 0
+        while i < len(word):
+            pair = word[i:i + 2]
+            if pair in DIGRAPHS:
+                viseme = DIGRAPHS[pair]
+                i += 2
+            else:
+                viseme = LETTERS.get(word[i])
+                i += 1
+            if viseme and (not sequence or sequence[-1] != viseme):
+                sequence.append(viseme)
+    return sequence
+
+
+def align_text(labels: np.ndarray, text: str) -> np.ndarray:
+    """Spread the text's viseme sequence evenly over the voiced frames"""
+    sequence = text_to_visemes(text)
+    voiced = np.flatnonzero(labels != "X")
+    if not sequence or voiced.size == 0:
+        return labels
+    positions = (np.arange(voiced.size) * len(sequence)) // voiced.size
+    aligned = labels.copy()
+    aligned[voiced] = np.asarray(sequence)[positions]
+    return aligned
+
+
+# ==================== EVENTS ====================
+def labels_to_events(labels: np.ndarray, energy: np.ndarray) -> List[Dict[str, Any]]:
+    """Run-length encode frame labels into timed viseme events"""
+    if labels.size == 0:
+        return []
+    boundaries = np.flatnonzero(labels[1:] != labels[:-1]) + 1
+    starts = np.concatenate(([0], boundaries))
+    ends = np.concatenate((boundaries, [labels.size]))
+
+    min_frames = max(1, MIN_EVENT_MS // HOP_MS)
+    events: List[Dict[str, Any]] = []
+    for start, end in zip(starts, ends):
+        viseme = str(labels[start])
+        if events and (end - start < min_frames or events[-1]["viseme_id"] == viseme):
+            # Too short to read on the avatar; fold it into the previous shape
+            events[-1]["_end"] = end
+            continue
+        events.append({"viseme_id": viseme, "_start": start, "_end": end})
+
+    result = []
+    for event in events:
+        start, end = event["_start"], event["_end"]
+        viseme = event["viseme_id"]
+        result.append({
+            "type": "viseme",
+            "viseme_id": viseme,
+            "morph": VISEME_MORPHS[viseme],
+            "start": int(start * HOP_MS),
+            "duration": int((end - start) * HOP_MS),
+            "intensity": 0.0 if viseme == "X" else round(float(np.clip(energy[start:end].mean(), 0.3, 1.0)), 2),
+        })
+    return result
+
+
+def visemes_from_pcm(pcm: np.ndarray, sample_rate: int, text: Optional[str] = None) -> List[Dict[str, Any]]:
+    labels, energy = classify_frames(frame_features(pcm, sample_rate))
+    if text:
+        labels = align_text(labels, text)
+    return labels_to_events(labels, energy)
+
+
+def extract_visemes(audio: bytes, text: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Lip-sync events for synthesized speech, optionally aligned to its text"""
+    if not audio:
+        return []
+    try:
+        pcm, sample_rate = decode_pcm(audio)
+        return visemes_from_pcm(pcm, sample_rate, text)
+    except Exception as e:
+        logger.error(f"❌ Viseme extraction failed: {e}")
+        return []
@@ -0,0 +1,41 @@
+import os
+import io
+import logging
+from typing import Optional
+
+import numpy as np
+from gtts import gTTS
+from pydub import AudioSegment
+
+logger = logging.getLogger("backend")
+
+SAMPLE_RATE = 16000
+TTS_LANGUAGE = os.getenv("TTS_LANGUAGE", "en")
+TTS_VOICE = os.getenv("TTS_VOICE", "com")
+
+# ==================== DECODE ====================
+def decode_audio(data: bytes, filename: str = "recording.webm") -> np.ndarray:
+    """Decode an uploaded recording to 16 kHz mono float32 PCM"""
+    fmt = os.path.splitext(filename or "")[1].lstrip(".").lower() or None
+    segment = AudioSegment.from_file(io.BytesIO(data), format=fmt)
+    segment = segment.set_frame_rate(SAMPLE_RATE).set_channels(1).set_sample_width(2)
+    samples = np.frombuffer(segment.raw_data, dtype=np.int16)
+    return samples.astype(np.float32) / 32768.0
+
+def decode_upload(fileobj, filename: str = "recording.webm") -> Optional[np.ndarray]:
+    """Read an upload's spooled file and decode it; None when it is empty.
+
+    Reading here, on a decode worker, keeps a burst of uploads off the
+    shared request threadpool that other endpoints depend on.
+    """
+    data = fileobj.read()
+    if not data:
+        return None
+    return decode_audio(data, filename)
+
+# ==================== SYNTHESIZE ====================
+def synthesize_speech(text: str, lang: str = TTS_LANGUAGE, tld: str = TTS_VOICE) -> bytes:
+    """Synthesize text to MP3 bytes with gTTS"""
+    buffer = io.BytesIO()
+    gTTS(text=text, lang=lang, tld=tld).write_to_fp(buffer)
+    return buffer.getvalue()